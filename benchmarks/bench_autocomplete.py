@@ -0,0 +1,67 @@
+"""
+bench_autocomplete.py
+Per-keystroke suggestions from the PrefixIndex over synthetic foods (description + brand owner):
+build time, then latency of every prefix of typed names, cold and memoized, versus a Python
+scan with str.startswith over each food's words on a slice of the corpus.
+
+Usage: python benchmarks/bench_autocomplete.py [foods]
+"""
+
+import gc
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from autocomplete import PrefixIndex, normalize_prefix
+from trigram_index import fuzzy_text
+from synthetic_foods import make_foods
+
+CHUNK = 50000
+SCAN = 20000 #foods scanned for the Python reference
+
+
+def report(name, timings):
+    timings = sorted(timings)
+    print(f"{name}: {len(timings)} lookups | median {statistics.median(timings) * 1000:.3f} ms | "
+          f"p95 {timings[int(len(timings) * 0.95)] * 1000:.3f} ms | max {timings[-1] * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    rng = random.Random(5)
+    index = PrefixIndex()
+    texts = []
+    start = time.perf_counter()
+    for first in range(0, count, CHUNK):
+        foods = make_foods(min(CHUNK, count - first), seed=first, start_id=first + 1)
+        texts.extend(normalize_prefix(fuzzy_text(food)) for food in foods[:SCAN - len(texts)])
+        index.add_foods(foods)
+    buffered = time.perf_counter() - start
+    start = time.perf_counter()
+    index.suggest("warm up")
+    print(f"{count:,} foods generated and buffered in {buffered:.1f} s, sorted in {time.perf_counter() - start:.1f} s ({index!r})")
+
+    typed = [text.split()[rng.randrange(min(2, len(text.split())))] for text in rng.sample(texts, 40)]
+    prefixes = [word[:n] for word in typed for n in range(1, len(word) + 1)]
+    gc.collect() #a collection of the build's garbage would otherwise land inside a timed lookup
+    for name in ("cold", "memoized"):
+        if name == "memoized":
+            [index.suggest(prefix) for prefix in prefixes]
+        timings = []
+        for prefix in prefixes:
+            if name == "cold":
+                index._memo.invalidate()
+            start = time.perf_counter()
+            index.suggest(prefix)
+            timings.append(time.perf_counter() - start)
+        report(name, timings)
+
+    start = time.perf_counter()
+    [text for text in texts if any(word.startswith(prefixes[0]) for word in text.split())]
+    scan = time.perf_counter() - start
+    print(f"python startswith scan: {scan * 1000:.0f} ms for {len(texts):,} foods (~{scan * count / len(texts):.1f} s at {count:,})")
+    print(f"e.g. {typed[0][:3]!r} -> {index.suggest(typed[0][:3], 3)}")
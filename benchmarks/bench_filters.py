@@ -0,0 +1,70 @@
+"""
+bench_filters.py
+Dietary filter bitmaps over synthetic foods: flag computation and SQLite write per food, load on
+reopen, AND/OR of whole-catalog bitmaps, and filtering a text search's candidates by bitmap versus
+re-evaluating the filters on each candidate record in Python.
+
+Usage: python benchmarks/bench_filters.py [foods]
+"""
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from filter_index import FILTERS, FilterIndex
+from synthetic_foods import make_foods
+
+CHUNK = 50000
+CANDIDATES = 10000 #text-search matches filtered per query
+QUERIES = [[("vegan",)], [("low fat",), ("high protein",)], [("gluten free",), ("low fat", "high protein")],
+           [("vegan",), ("gluten free",), ("high protein",)]]
+
+
+def timed(fn, repeat = 20):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return result, statistics.median(timings)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    rng = random.Random(3)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "filters.db")
+        index = FilterIndex(path)
+        sample = []
+        elapsed = 0.0
+        for first in range(0, count, CHUNK):
+            foods = make_foods(min(CHUNK, count - first), seed=first, start_id=first + 1)
+            sample.extend(foods[:CANDIDATES - len(sample)])
+            start = time.perf_counter()
+            index.add_foods(foods)
+            elapsed += time.perf_counter() - start
+        print(f"{count:,} foods flagged and stored in {elapsed:.1f} s ({elapsed / count * 1e6:.1f} us/food)")
+        index.close()
+        start = time.perf_counter()
+        index = FilterIndex(path)
+        print(f"reopened (flags loaded, bitmaps rebuilt) in {time.perf_counter() - start:.2f} s")
+
+        candidates = [food["fdcId"] for food in sample]
+        rng.shuffle(candidates)
+        records = {food["fdcId"]: food for food in sample}
+        for groups in QUERIES:
+            matched, whole = timed(lambda: index.count(groups))
+            kept, bitmap = timed(lambda: index.keep(candidates, groups))
+            predicates = [[FILTERS[name] for name in group] for group in groups]
+            scanned, python = timed(lambda: [i for i in candidates if all(any(p(records[i]) for p in group) for group in predicates)], 3)
+            assert kept == scanned
+            name = " AND ".join(" OR ".join(group) for group in groups)
+            print(f"{name}: {matched:,} foods, AND/OR of bitmaps + count {whole * 1000:.2f} ms | "
+                  f"{len(candidates):,} candidates -> {len(kept):,}: bitmap {bitmap * 1000:.2f} ms, python {python * 1000:.0f} ms")
+        index.close()
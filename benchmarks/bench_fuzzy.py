@@ -0,0 +1,68 @@
+"""
+bench_fuzzy.py
+Typo-tolerant lookups with the TrigramIndex over synthetic foods (description + brand owner):
+build time, then latency of misspelled queries (dropped letter, joined words, doubled
+letter), versus a Python scan computing trigram similarity on a slice of the corpus.
+
+Usage: python benchmarks/bench_fuzzy.py [foods]
+"""
+
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from trigram_index import TrigramIndex, fuzzy_text, similarity
+from synthetic_foods import make_foods
+
+CHUNK = 50000
+SCAN = 20000 #foods scanned for the Python reference
+
+
+def misspell(rng, text):
+    words = text.lower().split()[:2]
+    word = words[0]
+    match rng.randrange(3):
+        case 0 if len(word) > 4:
+            i = rng.randrange(1, len(word) - 1)
+            return word[:i] + word[i + 1:] + " " + " ".join(words[1:])
+        case 1 if len(words) > 1:
+            return "".join(words)
+        case _:
+            i = rng.randrange(len(word))
+            return word[:i] + word[i] + word[i:] + " " + " ".join(words[1:])
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    rng = random.Random(11)
+    index = TrigramIndex()
+    texts = []
+    start = time.perf_counter()
+    for first in range(0, count, CHUNK):
+        foods = make_foods(min(CHUNK, count - first), seed=first, start_id=first + 1)
+        texts.extend(fuzzy_text(food) for food in foods[:SCAN - len(texts)])
+        index.add_foods(foods)
+    generated = time.perf_counter() - start
+    start = time.perf_counter()
+    index.search_ids("warm up")
+    print(f"{count:,} foods generated and buffered in {generated:.1f} s, indexed in {time.perf_counter() - start:.1f} s")
+
+    queries = [misspell(rng, text) for text in rng.sample(texts, 50)]
+    timings, found = [], 0
+    for query in queries:
+        start = time.perf_counter()
+        hits = index.search(query, limit=20)
+        timings.append(time.perf_counter() - start)
+        found += bool(hits)
+    print(f"{len(queries)} misspelled queries | median {statistics.median(timings) * 1000:.1f} ms | "
+          f"p95 {sorted(timings)[int(len(timings) * 0.95)] * 1000:.1f} ms | max {max(timings) * 1000:.1f} ms | {found} with matches")
+
+    start = time.perf_counter()
+    [similarity(queries[0], text) for text in texts]
+    scan = time.perf_counter() - start
+    print(f"python similarity scan: {scan * 1000:.0f} ms for {len(texts):,} foods (~{scan * count / len(texts):.1f} s at {count:,})")
+    print(f"e.g. {queries[0]!r} -> {index.search(queries[0], limit=3)}")
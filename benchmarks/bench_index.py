@@ -0,0 +1,55 @@
+"""
+bench_index.py
+Local keyword search with the persistent FoodIndex: ingest throughput and query latency
+for common and rare queries, versus a linear scan over the same records (what
+get_relevant does per search today, minus scoring).
+
+Usage: python benchmarks/bench_index.py [foods]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from food_index import FoodIndex
+from text_analyzer import food_text, tokenize
+from synthetic_foods import make_foods, vocabulary
+
+
+def linear_scan(foods, query):
+    words = set(tokenize(query))
+    return [food["fdcId"] for food in foods if words <= set(tokenize(food_text(food)))]
+
+
+def timed(func, *args, repeat = 5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func(*args)
+    return (time.perf_counter() - start) / repeat, result
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    foods = make_foods(count)
+    words = vocabulary()
+    with tempfile.TemporaryDirectory() as tmp:
+        index = FoodIndex(os.path.join(tmp, "index.db"))
+        start = time.perf_counter()
+        for i in range(0, count, 5000):
+            index.add_many(foods[i:i + 5000])
+        ingest = time.perf_counter() - start
+        print(f"{count} foods indexed in {ingest:.1f} s ({count / ingest:,.0f} foods/s), "
+              f"{os.path.getsize(os.path.join(tmp, 'index.db')) / 2 ** 20:.1f} MiB")
+
+        for query in (words[0], f"{words[0]} {words[1]}", words[-1], f"{words[5]} {words[-3]}"):
+            scan, expected = timed(linear_scan, foods, query, repeat=1)
+            ids, found = timed(index.search_ids, query)
+            records, _ = timed(index.search, query, 1000)
+            assert sorted(found) == sorted(expected)
+            print(f"{query!r:<28} {len(found):7} hits | index ids {ids * 1000:8.2f} ms | "
+                  f"top 1000 records {records * 1000:8.2f} ms | linear scan {scan * 1000:9.1f} ms")
+        index.close()
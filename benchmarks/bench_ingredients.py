@@ -0,0 +1,78 @@
+"""
+bench_ingredients.py
+Ingredient and allergen inverted index over synthetic foods: parsing and SQLite write per food,
+whole-catalog "contains"/"excludes" queries from posting lists versus parsing every record in
+Python, and filtering a text search's candidates by the index versus re-parsing each candidate.
+
+Usage: python benchmarks/bench_ingredients.py [foods]
+"""
+
+import gc
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from ingredient_index import IngredientIndex, food_terms, resolve, split_ingredient_clauses
+from synthetic_foods import make_foods
+
+CHUNK = 50000
+CANDIDATES = 10000 #text-search matches filtered per query
+QUERIES = ["contains peanut", "excludes soy and dairy", "contains peanut excludes soy", "contains greek excludes dairy",
+           "contains tree nut"]
+
+
+def timed(fn, repeat = 10):
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return result, statistics.median(timings)
+
+
+def scan(foods, includes, excludes) -> list:
+    """The same query answered by parsing every record"""
+    includes, excludes = [set(resolve(item)) for item in includes], [set(resolve(item)) for item in excludes]
+    ids = []
+    for food in foods:
+        terms = food_terms(food)
+        if terms and all(item <= terms for item in includes) and not any(item <= terms for item in excludes):
+            ids.append(food["fdcId"])
+    return ids
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    rng = random.Random(3)
+    with tempfile.TemporaryDirectory() as tmp:
+        index = IngredientIndex(os.path.join(tmp, "ingredients.db"))
+        foods = []
+        elapsed = 0.0
+        for first in range(0, count, CHUNK):
+            chunk = make_foods(min(CHUNK, count - first), seed=first, start_id=first + 1)
+            foods.extend(chunk)
+            start = time.perf_counter()
+            index.add_foods(chunk)
+            elapsed += time.perf_counter() - start
+        print(f"{count:,} foods parsed and indexed in {elapsed:.1f} s ({elapsed / count * 1e6:.1f} us/food)")
+
+        sample = rng.sample(foods, min(CANDIDATES, count))
+        candidates = [food["fdcId"] for food in sample]
+        for query in QUERIES:
+            _, includes, excludes = split_ingredient_clauses(query)
+            ids, posting = timed(lambda: index.query(includes, excludes))
+            scanned, python = timed(lambda: scan(foods, includes, excludes), 1)
+            assert ids == scanned
+            kept, keep = timed(lambda: index.keep(candidates, includes, excludes))
+            rescanned, reparse = timed(lambda: scan(sample, includes, excludes), 3)
+            assert sorted(kept) == sorted(rescanned)
+            print(f"{query}: {len(ids):,} foods, postings {posting * 1000:.0f} ms, python scan {python * 1000:.0f} ms | "
+                  f"{len(candidates):,} candidates -> {len(kept):,}: index {keep * 1000:.1f} ms, re-parse {reparse * 1000:.0f} ms")
+        index.close()
@@ -0,0 +1,35 @@
+"""
+bench_prefetch.py
+Time to open the top search hit after a short pause (the user reading the results),
+with and without FCManager's speculative detail prefetch, against a stand-in with latency.
+
+Usage: python benchmarks/bench_prefetch.py [latency_seconds]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from foodcentral_manager import FCManager
+from standin_server import StandInConfig, start_server
+
+
+def open_top_hit(fc, query, think_time = 0.5):
+    results = fc.searchDB(query)
+    time.sleep(think_time)
+    start = time.perf_counter()
+    fc.get_item(results[0].fdc_id)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.2
+    server, url = start_server(config=StandInConfig(latency=latency, synthetic=50))
+    for label, top in (("no prefetch", 0), ("prefetch top 3", 3)):
+        fc = FCManager(url=url, rate_limiter=None, prefetch_top=top)
+        elapsed = open_top_hit(fc, "mix")
+        print(f"{label:<16} open top hit {elapsed * 1000:8.1f} ms | speculative requests {fc.prefetched}")
+        fc.close()
+    server.shutdown()
@@ -0,0 +1,62 @@
+"""
+bench_projection.py
+Compares full FDC records against abridged, nutrient-projected ones:
+bytes transferred, parse time (JSON decode + create_food_item) and peak memory.
+
+Usage: python benchmarks/bench_projection.py [foods]
+"""
+
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from foodcentral_manager import FCManager, FOODS_BATCH_LIMIT, ANALYZER_NUTRIENTS
+from standin_server import start_server
+
+
+def fetch_bodies(fc, ids, projection):
+    """Downloads the raw /foods bodies for ids, returns (bodies, bytes transferred)"""
+    bodies = []
+    for i in range(0, len(ids), FOODS_BATCH_LIMIT):
+        chunk = ids[i:i + FOODS_BATCH_LIMIT]
+        params = {"api_key": fc.key, "fdcIds": ",".join(str(x) for x in chunk), **projection}
+        bodies.append(fc._get("/foods", params).content)
+    return bodies, sum(len(body) for body in bodies)
+
+
+def parse(fc, bodies):
+    """Decodes the bodies and builds FoodItem objects, returns the items"""
+    return [fc.create_food_item(food) for body in bodies for food in json.loads(body)]
+
+
+def bench(fc, ids, label, projection):
+    bodies, transferred = fetch_bodies(fc, ids, projection)
+
+    start = time.perf_counter()
+    parse(fc, bodies)
+    parse_time = time.perf_counter() - start
+
+    tracemalloc.start()
+    items = parse(fc, bodies)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    print(f"{label:<28} {transferred / 1024:9.1f} KiB | parse {parse_time * 1000:8.2f} ms | "
+          f"peak {peak / 1024:9.1f} KiB | {len(items)} items")
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    server, url = start_server()
+    fc = FCManager(url=url, rate_limiter=None)
+    ids = list(range(100000, 100000 + count))
+    print(f"{count} foods from {url}")
+    bench(fc, ids, "full", {})
+    bench(fc, ids, "abridged", FCManager.projection_params(abridged=True))
+    bench(fc, ids, "abridged + analyzer nutrients", FCManager.projection_params(True, ANALYZER_NUTRIENTS))
+    fc.close()
+    server.shutdown()
@@ -0,0 +1,64 @@
+"""
+bench_ranking.py
+BM25 scoring cost per document as the corpus grows. Foods are added to CorpusStats in
+chunks; at each checkpoint the same sample of documents is scored for a few queries.
+Because document frequencies are kept up to date on add, the cost per scored document
+should stay flat from thousands to millions of records.
+
+Usage: python benchmarks/bench_ranking.py [max_foods]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from text_analyzer import ANALYZER, food_text
+from ranking import BM25, CorpusStats
+from synthetic_foods import make_foods, vocabulary
+
+tokenize = ANALYZER.analyze #unmemoized: at a million foods the memo would only churn
+CHUNK = 50000
+SAMPLE = 2000
+
+
+def checkpoints(limit):
+    size = 10000
+    while size < limit:
+        yield size
+        size *= 10
+    yield limit
+
+
+if __name__ == "__main__":
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    words = vocabulary()
+    queries = [words[0], f"{words[0]} {words[1]}", f"{words[3]} {words[-1]} {words[7]}"]
+    stats = CorpusStats()
+    bm25 = BM25(stats)
+    sample = None
+    added = 0
+    adding = 0.0
+
+    for target in checkpoints(limit):
+        while added < target:
+            count = min(CHUNK, target - added)
+            docs = [(food["fdcId"], tokenize(food_text(food))) for food in make_foods(count, seed=added, start_id=added + 1)]
+            if sample is None:
+                sample = [tokens for _, tokens in docs[:SAMPLE]]
+            start = time.perf_counter()
+            for doc_id, tokens in docs:
+                stats.add(doc_id, tokens)
+            adding += time.perf_counter() - start
+            added += count
+
+        timings = []
+        for query in queries:
+            query_tokens = tokenize(query)
+            start = time.perf_counter()
+            for _ in range(5):
+                bm25.score_many(query_tokens, sample)
+            timings.append((time.perf_counter() - start) / (5 * len(sample)))
+        print(f"{added:>9,} foods | stats add {adding / added * 1e6:5.2f} us/food | "
+              + " | ".join(f"{len(q.split())}-term {t * 1e6:5.2f} us/doc" for q, t in zip(queries, timings)))
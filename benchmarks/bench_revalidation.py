@@ -0,0 +1,68 @@
+"""
+bench_revalidation.py
+Cost of refreshing an expired response cache: re-downloading every record versus
+revalidating with If-None-Match (FCManager.refresh_items), where unchanged records
+come back as bodiless 304s.
+
+Usage: python benchmarks/bench_revalidation.py [foods]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from foodcentral_manager import FCManager
+from response_cache import ResponseCache
+from standin_server import start_server
+
+
+class CountingSession:
+    """Wraps session.get to total the response bytes received"""
+
+    def __init__(self, fc):
+        self.received = 0
+        self._get = fc.session.get
+        fc.session.get = self.get
+
+    def get(self, *args, **kwargs):
+        response = self._get(*args, **kwargs)
+        self.received += len(response.content)
+        return response
+
+
+def expire_all(cache):
+    cache._conn.execute("UPDATE responses SET expires = 0")
+    cache._conn.commit()
+
+
+def bench(label, refresh, fc, counter, ids):
+    expire_all(fc.cache)
+    counter.received = 0
+    start = time.perf_counter()
+    refresh(fc, ids)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<22} {elapsed * 1000:8.1f} ms | {counter.received / 1024:9.1f} KiB received")
+
+
+def refetch(fc, ids):
+    fc.cache.invalidate()
+    for fdc_id in ids:
+        fc.get_item(fdc_id)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    server, url = start_server()
+    fc = FCManager(url=url, rate_limiter=None, cache=ResponseCache(":memory:"))
+    counter = CountingSession(fc)
+    ids = list(range(100000, 100000 + count))
+    for fdc_id in ids:
+        fc.get_item(fdc_id)
+    print(f"{count} cached foods from {url}")
+    bench("re-download", refetch, fc, counter, ids)
+    bench("refresh_items (304)", lambda fc, ids: fc.refresh_items(ids), fc, counter, ids)
+    print(f"304 responses: {server.not_modified}, cache revalidations: {fc.cache.revalidations}")
+    fc.close()
+    server.shutdown()
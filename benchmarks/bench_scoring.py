@@ -0,0 +1,79 @@
+"""
+bench_scoring.py
+Re-ranking candidate sets of 100, 10k and 1M foods: the pre-BM25 computeTFIDF loop (one
+term dict rebuilt per document), BM25 scored document by document in Python, and BM25
+scored with one sparse product over the candidates' TermMatrix rows (score_matrix).
+The one-off cost of adding each food to the TermMatrix is reported separately.
+
+Usage: python benchmarks/bench_scoring.py [sizes...]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from text_analyzer import ANALYZER, food_text
+from ranking import BM25, TermMatrix
+from synthetic_foods import make_foods, vocabulary
+
+tokenize = ANALYZER.analyze #unmemoized: at a million foods the memo would only churn
+CHUNK = 50000
+LEGACY_MAX = 10000 #the legacy loop takes minutes at 1M
+
+
+def legacy_tf(text, query):
+    """computeTFIDF as get_relevant used it before BM25"""
+    words = text.lower().split()
+    counts = {}
+    for word in words:
+        counts[word] = counts[word] + 1 if word in counts else 0
+    return sum(counts[word] / len(text) for word in query.split() if word in counts)
+
+
+def candidates(count):
+    """Returns (texts, token lists) for count synthetic foods, tokens interned to keep 1M in memory"""
+    texts, docs = [], []
+    for start in range(0, count, CHUNK):
+        for food in make_foods(min(CHUNK, count - start), seed=start, start_id=start + 1):
+            text = food_text(food)
+            texts.append(text if count <= LEGACY_MAX else None)
+            docs.append([sys.intern(token) for token in tokenize(text)])
+    return texts, docs
+
+
+def timed(func, *args, repeat = 3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100, 10000, 1000000]
+    words = vocabulary()
+    query = f"{words[0]} {words[4]} {words[-1]}"
+    query_tokens = tokenize(query)
+    for count in sizes:
+        texts, docs = candidates(count)
+        ids = list(range(count))
+        matrix = TermMatrix()
+        start = time.perf_counter()
+        for doc_id, tokens in zip(ids, docs):
+            matrix.add(doc_id, tokens)
+        matrix.counts(ids[:1], query_tokens) #flush the pending rows
+        adding = time.perf_counter() - start
+        bm25 = BM25(matrix)
+
+        line = f"{count:>9,} docs | add {adding / count * 1e6:4.1f} us/doc once |"
+        if texts[0] is not None:
+            legacy, _ = timed(lambda: [legacy_tf(text, query) for text in texts])
+            line += f" legacy tf loop {legacy * 1000:8.2f} ms |"
+        python, expected = timed(bm25.score_many, query_tokens, docs)
+        vector, scores = timed(bm25.score_matrix, query_tokens, matrix, ids)
+        assert max(abs(a - b) for a, b in zip(scores.tolist(), expected)) < 1e-9
+        print(line + f" BM25 python {python * 1000:8.2f} ms | BM25 sparse {vector * 1000:7.2f} ms ({python / vector:.1f}x)")
@@ -0,0 +1,56 @@
+"""
+bench_session.py
+Compares per-lookup latency of bare requests.get calls against FCManager's
+pooled keep-alive session, using the local stand-in server.
+
+Usage: python benchmarks/bench_session.py [lookups]
+"""
+
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from foodcentral_manager import FCManager
+from standin_server import start_server
+
+
+def summarize(label, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<22} mean {statistics.mean(samples)*1000:7.3f} ms | "
+          f"p50 {statistics.median(samples)*1000:7.3f} ms | p95 {p95*1000:7.3f} ms")
+
+
+def bench_bare(url, lookups):
+    samples = []
+    for i in range(lookups):
+        start = time.perf_counter()
+        requests.get(f"{url}/food/{534358 + i}?api_key=DEMO_KEY").json()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_pooled(url, lookups):
+    fc = FCManager(url=url, rate_limiter=None)
+    fc._get("/food/534358", {"api_key": fc.key})  # warm the pool
+    samples = []
+    for i in range(lookups):
+        start = time.perf_counter()
+        fc._get(f"/food/{534358 + i}", {"api_key": fc.key}).json()
+        samples.append(time.perf_counter() - start)
+    fc.close()
+    return samples
+
+
+if __name__ == "__main__":
+    lookups = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    server, url = start_server()
+    print(f"{lookups} lookups against {url}")
+    summarize("before (requests.get)", bench_bare(url, lookups))
+    summarize("after (pooled session)", bench_pooled(url, lookups))
+    server.shutdown()
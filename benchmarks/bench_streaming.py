@@ -0,0 +1,51 @@
+"""
+bench_streaming.py
+Peak memory and time of decoding one large search page with response.json()
+versus FCManager.stream_search, which decodes the foods array record by record.
+
+Usage: python benchmarks/bench_streaming.py [page_size]
+"""
+
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from foodcentral_manager import FCManager
+from standin_server import StandInConfig, start_server_process
+
+
+def whole_page(fc, page_size):
+    data = fc._get("/foods/search", {"api_key": fc.key, "query": "mix", "pageSize": page_size}).json()
+    count = 0
+    for food in data["foods"]:
+        fc.create_food_item(food)
+        count += 1
+    return count
+
+
+def streamed(fc, page_size):
+    return sum(1 for _ in fc.stream_search("mix", page_size=page_size))
+
+
+def bench(label, func, fc, page_size):
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = func(fc, page_size)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{label:<16} {elapsed * 1000:8.1f} ms | peak {peak / 1024:9.1f} KiB | {count} foods")
+
+
+if __name__ == "__main__":
+    page_size = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    server, url = start_server_process(config=StandInConfig(synthetic=page_size))
+    fc = FCManager(url=url, rate_limiter=None)
+    fc._get("/foods/search", {"api_key": fc.key, "query": "warm-up"})
+    bench("response.json()", whole_page, fc, page_size)
+    bench("stream_search", streamed, fc, page_size)
+    fc.close()
+    server.terminate()
@@ -0,0 +1,63 @@
+"""
+record_fixtures.py
+Records the fixture corpus replayed by standin_server.py from the live APIs.
+
+Fetches each FDC id below in full format and each barcode from OpenFoodFacts,
+then writes benchmarks/fixtures/fdc_foods.json and off_products.json.
+Run it again (with network access) to refresh the fixtures.
+
+Usage: python benchmarks/record_fixtures.py [api_key]
+"""
+
+import json
+import sys
+
+import requests
+
+from standin_server import FIXTURES
+
+
+FDC_URL = "https://api.nal.usda.gov/fdc/v1"
+OFF_URL = "https://world.openfoodfacts.org"
+
+FDC_IDS = [2056470, 1951279, 2112630, 2070380, 2029551, 534358, 2101234, 2085472, 2089376, 2043987, 2079341, 2514744, 1750340]
+OFF_CODES = ["034000002405", "016000275287", "611269991000", "049000028928", "044000032029", "077034085228",
+             "818290010094", "070470003023", "051500255162", "076371011055", "041570054161"]
+OFF_FIELDS = ["code", "product_name", "brands", "url", "ingredients_text", "categories", "nutriments"]
+
+
+def record_fdc(session, api_key):
+    foods = []
+    for i in range(0, len(FDC_IDS), 20):
+        params = {"api_key": api_key, "fdcIds": ",".join(str(x) for x in FDC_IDS[i:i + 20])}
+        response = session.get(f"{FDC_URL}/foods", params=params, timeout=30)
+        response.raise_for_status()
+        foods.extend(response.json())
+    return foods
+
+
+def record_off(session):
+    products = []
+    for code in OFF_CODES:
+        response = session.get(f"{OFF_URL}/api/v0/product/{code}.json", params={"fields": ",".join(OFF_FIELDS)}, timeout=30)
+        response.raise_for_status()
+        data = response.json()
+        if data.get("status") == 1:
+            products.append({field: data["product"].get(field) for field in OFF_FIELDS})
+        else:
+            print(f"OpenFoodFacts has no product {code}, skipped")
+    return products
+
+
+def write_fixture(name, data):
+    with open(FIXTURES / name, "w") as file:
+        json.dump(data, file, indent=1)
+    print(f"Wrote {len(data)} records to {FIXTURES / name}")
+
+
+if __name__ == "__main__":
+    api_key = sys.argv[1] if len(sys.argv) > 1 else "DEMO_KEY"
+    FIXTURES.mkdir(exist_ok=True)
+    with requests.Session() as session:
+        write_fixture("fdc_foods.json", record_fdc(session, api_key))
+        write_fixture("off_products.json", record_off(session))
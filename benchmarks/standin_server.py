@@ -0,0 +1,389 @@
+"""
+standin_server.py
+Offline stand-in for the FoodData Central and OpenFoodFacts APIs.
+
+Replays the recorded responses in benchmarks/fixtures over HTTP/1.1 keep-alive so
+FCManager and the library.py fetchers can be benchmarked and load-tested without
+touching the network. Latency, error injection and per-key rate limits are configurable.
+Responses carry an ETag and Last-Modified, and matching conditional requests get a 304.
+
+    FoodData Central (base url http://host:port/fdc/v1)
+        /food/{fdcId}     format=abridged|full, nutrients=
+        /foods            fdcIds=, format=, nutrients=
+        /foods/search     query=, pageNumber=, pageSize=   (query "*" matches everything)
+    OpenFoodFacts (base url http://host:port)
+        /api/v0/product/{barcode}.json
+        /cgi/search.pl    search_terms=, page=, page_size=
+
+Usage: python benchmarks/standin_server.py [--port 8008] [--latency 0.05] [--error-rate 0.1] [--rate-limit 1000]
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import random
+import re
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+
+SAMPLE_FOOD = {
+    "fdcId": 534358,
+    "dataType": "Branded",
+    "description": "NUT 'N BERRY MIX",
+    "brandOwner": "Kar Nut Products Company",
+    "gtinUpc": "077034085228",
+    "ingredients": "PEANUTS, RAISINS, SUNFLOWER KERNELS, ALMONDS, CASHEWS",
+    "brandedFoodCategory": "Popcorn, Peanuts, Seeds & Related Snacks",
+    "foodNutrients": [
+        {"nutrientId": 1003, "nutrientName": "Protein", "nutrientNumber": "203", "unitName": "G", "value": 17.5},
+        {"nutrientId": 1004, "nutrientName": "Total lipid (fat)", "nutrientNumber": "204", "unitName": "G", "value": 35.0},
+        {"nutrientId": 1005, "nutrientName": "Carbohydrate, by difference", "nutrientNumber": "205", "unitName": "G", "value": 40.0},
+        {"nutrientId": 1008, "nutrientName": "Energy", "nutrientNumber": "208", "unitName": "KCAL", "value": 550},
+    ],
+}
+
+#(number, name, unit) of the nutrients a synthesized full-format branded record carries
+FULL_NUTRIENTS = [
+    ("203", "Protein", "g"), ("204", "Total lipid (fat)", "g"), ("205", "Carbohydrate, by difference", "g"),
+    ("208", "Energy", "kcal"), ("269", "Sugars, total including NLEA", "g"), ("291", "Fiber, total dietary", "g"),
+    ("307", "Sodium, Na", "mg"), ("301", "Calcium, Ca", "mg"), ("303", "Iron, Fe", "mg"), ("306", "Potassium, K", "mg"),
+    ("318", "Vitamin A, IU", "IU"), ("401", "Vitamin C, total ascorbic acid", "mg"), ("601", "Cholesterol", "mg"),
+    ("605", "Fatty acids, total trans", "g"), ("606", "Fatty acids, total saturated", "g"),
+    ("645", "Fatty acids, total monounsaturated", "g"), ("646", "Fatty acids, total polyunsaturated", "g"),
+    ("539", "Sugars, added", "g"), ("304", "Magnesium, Mg", "mg"), ("305", "Phosphorus, P", "mg"),
+    ("309", "Zinc, Zn", "mg"), ("404", "Thiamin", "mg"), ("405", "Riboflavin", "mg"), ("406", "Niacin", "mg"),
+    ("415", "Vitamin B-6", "mg"), ("417", "Folate, total", "ug"), ("418", "Vitamin B-12", "ug"),
+    ("324", "Vitamin D (D2 + D3), International Units", "IU"), ("323", "Vitamin E (alpha-tocopherol)", "mg"),
+    ("430", "Vitamin K (phylloquinone)", "ug"),
+]
+
+
+def make_full_food(fdc_id):
+    """Returns a synthetic branded record in /food full format (nested nutrients, label fields, portions, update log)"""
+    nutrients = []
+    for rank, (number, name, unit) in enumerate(FULL_NUTRIENTS):
+        nutrients.append({
+            "type": "FoodNutrient", "id": fdc_id * 100 + rank,
+            "nutrient": {"id": 1000 + int(number), "number": number, "name": name, "rank": rank * 100, "unitName": unit},
+            "foodNutrientDerivation": {"code": "LCCS", "description": "Calculated from value per serving size measure",
+                                       "foodNutrientSource": {"id": 9, "code": "12", "description": "Manufacturer's analytical; partial documentation"}},
+            "amount": round((fdc_id % 97 + rank) * 1.5, 2),
+        })
+    return {
+        "fdcId": fdc_id, "dataType": "Branded", "foodClass": "Branded", "dataSource": "LI",
+        "description": SAMPLE_FOOD["description"], "brandOwner": SAMPLE_FOOD["brandOwner"], "brandName": "KAR'S",
+        "gtinUpc": SAMPLE_FOOD["gtinUpc"], "ingredients": SAMPLE_FOOD["ingredients"],
+        "brandedFoodCategory": SAMPLE_FOOD["brandedFoodCategory"], "marketCountry": "United States",
+        "modifiedDate": "8/18/2018", "availableDate": "8/18/2018", "publicationDate": "4/1/2019",
+        "servingSize": 28.0, "servingSizeUnit": "g", "householdServingFullText": "1 OZ",
+        "labelNutrients": {k: {"value": v} for k, v in [("fat", 10.0), ("saturatedFat", 1.5), ("transFat", 0.0),
+                           ("cholesterol", 0.0), ("sodium", 5.0), ("carbohydrates", 11.0), ("fiber", 2.0),
+                           ("sugars", 6.0), ("protein", 5.0), ("calcium", 20.0), ("iron", 0.9), ("calories", 154)]},
+        "foodNutrients": nutrients,
+        "foodAttributes": [{"id": fdc_id, "name": "Added Package Weight", "value": "5", "foodAttributeType": {"id": 1, "name": "Attribute"}}],
+        "foodPortions": [],
+        "foodUpdateLog": [{"fdcId": fdc_id, "dataType": "Branded", "description": SAMPLE_FOOD["description"],
+                           "brandOwner": SAMPLE_FOOD["brandOwner"], "gtinUpc": SAMPLE_FOOD["gtinUpc"],
+                           "ingredients": SAMPLE_FOOD["ingredients"], "publicationDate": "4/1/2019"}],
+    }
+
+
+def search_result(food):
+    """Returns a full-format record in the flat shape /foods/search uses for its results"""
+    result = {k: v for k, v in food.items() if k not in ("foodNutrients", "foodPortions", "foodUpdateLog", "labelNutrients")}
+    result["foodNutrients"] = [{"nutrientId": n["nutrient"]["id"], "nutrientName": n["nutrient"]["name"],
+                                "nutrientNumber": n["nutrient"]["number"], "unitName": n["nutrient"]["unitName"].upper(),
+                                "value": n["amount"]} for n in food["foodNutrients"]]
+    return result
+
+
+def project_food(food, params):
+    """Applies the format=abridged and nutrients= parameters to a full-format record"""
+    wanted = set(",".join(params.get("nutrients", [])).split(",")) - {""}
+    nutrients = [n for n in food["foodNutrients"] if not wanted or n["nutrient"]["number"] in wanted]
+    if params.get("format", ["full"])[0] != "abridged":
+        return dict(food, foodNutrients=nutrients)
+    abridged = {k: food[k] for k in ("fdcId", "description", "dataType", "publicationDate", "brandOwner", "gtinUpc") if k in food}
+    abridged["foodNutrients"] = [{"number": n["nutrient"]["number"], "name": n["nutrient"]["name"],
+                                  "amount": n["amount"], "unitName": n["nutrient"]["unitName"]} for n in nutrients]
+    return abridged
+
+
+class StandInConfig:
+    """Behaviour knobs for the stand-in server"""
+
+    def __init__(self, latency = 0.0, jitter = 0.0, error_rate = 0.0, error_status = 503, rate_limit = None,
+                 rate_period = 3600.0, synthetic = 0, synthesize_missing = True, seed = None):
+        """
+        Args:
+            latency (float): Seconds added before every response.
+            jitter (float): Extra random delay, uniform in [0, jitter] seconds.
+            error_rate (float): Fraction of requests answered with error_status.
+            error_status (int): Status code of injected errors.
+            rate_limit (int): FDC requests allowed per api_key per rate_period (None = unlimited).
+            rate_period (float): Length of the rate limit window in seconds.
+            synthetic (int): Synthetic branded records added to the search corpus.
+            synthesize_missing (bool): Answer fdcIds not in the corpus with a synthetic record instead of 404.
+            seed (int): Seed for jitter and error injection.
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rate_limit = rate_limit
+        self.rate_period = rate_period
+        self.synthetic = synthetic
+        self.synthesize_missing = synthesize_missing
+        self.seed = seed
+
+
+def load_fixture(name):
+    with open(FIXTURES / name, "r") as file:
+        return json.load(file)
+
+
+class FixtureCorpus:
+    """Recorded FDC foods and OFF products, optionally grown with synthetic branded records"""
+
+    SYNTHETIC_BASE = 9000000 #fdcIds of synthetic records start here
+
+    def __init__(self, synthetic = 0):
+        self.foods = {food["fdcId"]: food for food in load_fixture("fdc_foods.json")}
+        for i in range(synthetic):
+            self.foods[self.SYNTHETIC_BASE + i] = make_full_food(self.SYNTHETIC_BASE + i)
+        self.products = {product["code"]: product for product in load_fixture("off_products.json")}
+        self._words = {fdc_id: self.search_words(food) for fdc_id, food in self.foods.items()}
+
+    @staticmethod
+    def search_words(food) -> set:
+        """Lower-cased words a search query is matched against"""
+        text = " ".join(str(food.get(k, "")) for k in ("description", "brandOwner", "ingredients", "gtinUpc"))
+        return set(re.findall(r"\w+", text.lower()))
+
+    def food(self, fdc_id, synthesize_missing = True):
+        """Returns the record for fdc_id, a synthetic one or None if it is not in the corpus"""
+        if fdc_id in self.foods:
+            return self.foods[fdc_id]
+        return make_full_food(fdc_id) if synthesize_missing else None
+
+    def search(self, query) -> list:
+        """Returns the fdcIds whose text contains every word of query ("*" matches everything)"""
+        if query.strip() == "*":
+            return list(self.foods)
+        words = set(re.findall(r"\w+", query.lower()))
+        return [fdc_id for fdc_id, food_words in self._words.items() if words <= food_words]
+
+    def search_products(self, terms) -> list:
+        words = set(re.findall(r"\w+", terms.lower()))
+        return [p for p in self.products.values()
+                if words <= set(re.findall(r"\w+", f"{p['product_name']} {p['brands']} {p.get('ingredients_text', '')}".lower()))]
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Answers the FDC and OFF endpoints from the server's FixtureCorpus"""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+    def do_GET(self):
+        config = self.server.config
+        parsed = urlparse(self.path)
+        params = parse_qs(parsed.query)
+        path = parsed.path.rstrip("/")
+        self.extra_headers = {}
+
+        delay = config.latency + (self.server.random.uniform(0, config.jitter) if config.jitter else 0)
+        if delay:
+            time.sleep(delay)
+
+        if config.rate_limit is not None and path.startswith("/fdc/"):
+            remaining = self.server.take_quota(params.get("api_key", [""])[0])
+            self.extra_headers["X-RateLimit-Limit"] = str(config.rate_limit)
+            self.extra_headers["X-RateLimit-Remaining"] = str(max(remaining, 0))
+            if remaining < 0:
+                self.extra_headers["Retry-After"] = str(int(self.server.quota_reset_in()) + 1)
+                return self.send_json(429, {"error": {"code": "OVER_RATE_LIMIT", "message": "API rate limit exceeded"}})
+
+        if config.error_rate and self.server.random.random() < config.error_rate:
+            return self.send_json(config.error_status, {"error": "injected failure"})
+
+        if path.startswith("/fdc/v1/"):
+            self.handle_fdc(path[len("/fdc/v1"):], params)
+        elif path.startswith("/api/v0/product/"):
+            self.handle_off_product(path.rsplit("/", 1)[1].removesuffix(".json"))
+        elif path == "/cgi/search.pl":
+            self.handle_off_search(params)
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def handle_fdc(self, path, params):
+        corpus = self.server.corpus
+        synthesize = self.server.config.synthesize_missing
+        if path == "/foods":
+            ids = [int(i) for i in ",".join(params.get("fdcIds", [])).split(",") if i]
+            foods = [corpus.food(i, synthesize) for i in ids]
+            self.send_json(200, [project_food(food, params) for food in foods if food is not None])
+        elif path == "/foods/search":
+            query = params.get("query", [""])[0]
+            page_size = int(params.get("pageSize", ["50"])[0])
+            page_number = int(params.get("pageNumber", ["1"])[0])
+            hits = corpus.search(query)
+            page = hits[(page_number - 1) * page_size:page_number * page_size]
+            self.send_json(200, {"totalHits": len(hits), "currentPage": page_number,
+                                 "totalPages": -(-len(hits) // page_size),
+                                 "foodSearchCriteria": {"query": query, "pageNumber": page_number, "pageSize": page_size},
+                                 "foods": [search_result(corpus.foods[i]) for i in page]})
+        elif path.startswith("/food/") and path[len("/food/"):].isdigit():
+            food = corpus.food(int(path[len("/food/"):]), synthesize)
+            if food is None:
+                self.send_json(404, {"error": "not found"})
+            else:
+                self.send_json(200, project_food(food, params))
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def handle_off_product(self, code):
+        product = self.server.corpus.products.get(code)
+        if product is None:
+            self.send_json(200, {"code": code, "status": 0, "status_verbose": "product not found"})
+        else:
+            self.send_json(200, {"code": code, "status": 1, "status_verbose": "product found", "product": product})
+
+    def handle_off_search(self, params):
+        products = self.server.corpus.search_products(params.get("search_terms", [""])[0])
+        page_size = int(params.get("page_size", ["20"])[0])
+        page = int(params.get("page", ["1"])[0])
+        self.send_json(200, {"count": len(products), "page": page, "page_size": page_size,
+                             "products": products[(page - 1) * page_size:page * page_size]})
+
+    def send_json(self, status, data):
+        """Sends data as JSON; 200 responses carry an ETag and Last-Modified and honour conditional requests"""
+        body = json.dumps(data).encode()
+        if status == 200:
+            etag = f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+            self.extra_headers["ETag"] = etag
+            self.extra_headers["Last-Modified"] = self.server.last_modified
+            if self.not_modified(etag):
+                self.server.not_modified += 1
+                status, body = 304, b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in self.extra_headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def not_modified(self, etag) -> bool:
+        """True if the request's If-None-Match / If-Modified-Since validators still match"""
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since is None:
+            return False
+        try:
+            return parsedate_to_datetime(if_modified_since) >= parsedate_to_datetime(self.server.last_modified)
+        except (TypeError, ValueError):
+            return False
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the corpus, the config and per-key request counts"""
+
+    daemon_threads = True
+
+    def __init__(self, address, handler, config):
+        super().__init__(address, handler)
+        self.config = config
+        self.corpus = FixtureCorpus(config.synthetic)
+        self.random = random.Random(config.seed)
+        self._quota_lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._used = {} #api_key -> requests in the current window
+        self.last_modified = formatdate(time.time(), usegmt=True) #Last-Modified of every record
+        self.not_modified = 0 #conditional requests answered with 304
+        host, port = self.server_address[:2]
+        self.off_url = f"http://{host}:{port}"
+        self.fdc_url = f"{self.off_url}/fdc/v1"
+
+    def take_quota(self, api_key) -> int:
+        """Counts one request for api_key, returns the requests left in the window (negative when over the limit)"""
+        with self._quota_lock:
+            if time.monotonic() - self._window_start >= self.config.rate_period:
+                self._window_start = time.monotonic()
+                self._used.clear()
+            self._used[api_key] = self._used.get(api_key, 0) + 1
+            return self.config.rate_limit - self._used[api_key]
+
+    def quota_reset_in(self) -> float:
+        """Seconds until the rate limit window resets"""
+        return max(0.0, self.config.rate_period - (time.monotonic() - self._window_start))
+
+
+def start_server(host = "127.0.0.1", port = 0, config = None, handler = StandInHandler):
+    """
+    Starts the stand-in server on a daemon thread and returns (server, fdc_url).
+    server.off_url is the OpenFoodFacts base url.
+    """
+    server = StandInServer((host, port), handler, config or StandInConfig())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, server.fdc_url
+
+
+def _serve_in_child(host, port, config, conn):
+    server, url = start_server(host, port, config)
+    conn.send((url, server.off_url))
+    threading.Event().wait()
+
+
+def start_server_process(host = "127.0.0.1", port = 0, config = None):
+    """
+    Starts the stand-in server in a child process and returns (process, fdc_url).
+    Use this when measuring client memory, so server allocations are not counted.
+    process.off_url is the OpenFoodFacts base url.
+    """
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_serve_in_child, args=(host, port, config, child), daemon=True)
+    process.start()
+    url, process.off_url = parent.recv()
+    return process, url
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline stand-in for FoodData Central and OpenFoodFacts")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8008)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added before every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random delay of up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with --error-status")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--rate-limit", type=int, default=None, help="FDC requests per api_key per --rate-period")
+    parser.add_argument("--rate-period", type=float, default=3600.0)
+    parser.add_argument("--synthetic", type=int, default=0, help="synthetic branded records added to the search corpus")
+    parser.add_argument("--strict", action="store_true", help="404 for fdcIds not in the corpus")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = StandInConfig(args.latency, args.jitter, args.error_rate, args.error_status, args.rate_limit,
+                           args.rate_period, args.synthetic, not args.strict, args.seed)
+    server, url = start_server(args.host, args.port, config)
+    print(f"Stand-in FoodData Central running at {url}")
+    print(f"Stand-in OpenFoodFacts running at {server.off_url} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,44 @@
+"""
+synthetic_foods.py
+Generates search-shaped FDC food records with a realistic vocabulary for index and ranking benchmarks.
+Words are drawn from the fixture corpus with a Zipf-like skew, so common words
+("sugar", "salt") have long postings and rare ones short postings.
+"""
+
+import random
+import re
+
+from standin_server import load_fixture
+
+
+def vocabulary() -> list:
+    """Returns the distinct words of the fixture descriptions, ingredients and brands"""
+    words = []
+    for food in load_fixture("fdc_foods.json"):
+        text = " ".join(str(food.get(k, "")) for k in ("description", "ingredients", "brandOwner", "brandedFoodCategory"))
+        words.extend(re.findall(r"[a-z]{3,}", text.lower()))
+    return sorted(set(words))
+
+
+def make_foods(count, seed = 7, start_id = 1):
+    """Returns count branded records in /foods/search shape with generated text"""
+    rng = random.Random(seed)
+    words = vocabulary()
+    rng.shuffle(words)
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    foods = []
+    for i in range(count):
+        description = " ".join(rng.choices(words, weights, k=rng.randint(2, 5))).upper()
+        ingredients = ", ".join(rng.choices(words, weights, k=rng.randint(3, 12))).upper()
+        foods.append({
+            "fdcId": start_id + i, "dataType": "Branded", "description": description,
+            "brandOwner": rng.choice(words).title() + " Foods", "gtinUpc": f"{rng.randrange(10 ** 11, 10 ** 12)}",
+            "ingredients": ingredients, "brandedFoodCategory": rng.choice(words).title(),
+            "foodNutrients": [
+                {"nutrientId": 1003, "nutrientName": "Protein", "nutrientNumber": "203", "unitName": "G", "value": rng.randint(0, 30)},
+                {"nutrientId": 1004, "nutrientName": "Total lipid (fat)", "nutrientNumber": "204", "unitName": "G", "value": rng.randint(0, 40)},
+                {"nutrientId": 1005, "nutrientName": "Carbohydrate, by difference", "nutrientNumber": "205", "unitName": "G", "value": rng.randint(0, 80)},
+                {"nutrientId": 1008, "nutrientName": "Energy", "nutrientNumber": "208", "unitName": "KCAL", "value": rng.randint(0, 600)},
+            ],
+        })
+    return foods
@@ -0,0 +1,97 @@
+"""
+async_fc_manager.py
+asyncio counterpart of FCManager.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from foodcentral_manager import FCManager, FDC_URL
+
+
+class AsyncFCManager:
+    """
+    Coroutine versions of FCManager's lookups.
+
+    Each call runs FCManager's request on a worker pool sized to max_concurrency,
+    guarded by an asyncio.Semaphore, so one event loop can keep hundreds of
+    lookups in flight over the same pooled keep-alive connections.
+    Results are built by FCManager.create_food_item, so callers get the same
+    FoodItem subclasses as the blocking manager.
+    """
+
+    def __init__(self, key = "DEMO_KEY", url = FDC_URL, max_concurrency = 100, **pool_options):
+        """
+        Args:
+            key (str): API key.
+            url (str): Base url of the API.
+            max_concurrency (int): Maximum number of lookups in flight at once.
+            pool_options: Passed to FCManager (pool_connections, pool_maxsize, timeout).
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be positive.")
+        pool_options.setdefault("pool_maxsize", max_concurrency)
+        self._fc = FCManager(key, url, **pool_options)
+        self._max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="fc-async")
+
+    @property
+    def manager(self) -> FCManager:
+        """The blocking FCManager doing the requests"""
+        return self._fc
+
+    @property
+    def key(self):
+        return self._fc.key
+
+    @property
+    def max_concurrency(self) -> int:
+        return self._max_concurrency
+
+    async def _run(self, func, *args):
+        """Runs a blocking FCManager call on the worker pool once a concurrency slot is free"""
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+
+    async def validate_key(self, key) -> bool:
+        """Returns True if the API accepts key"""
+        return await self._run(self._fc.validate_key, key)
+
+    async def set_key(self, key) -> bool:
+        """Validates key and uses it for later calls if valid"""
+        if await self.validate_key(key):
+            self._fc.key = key
+            return True
+        return False
+
+    async def get_item(self, fdcID, abridged = False, nutrients = None):
+        """Given the Food Central Database ID, returns dictionary of details of that item"""
+        return await self._run(self._fc.get_item, fdcID, abridged, nutrients)
+
+    async def get_items(self, fdcIDs, abridged = False, nutrients = None):
+        """Given a list of Food Central Database IDs, returns a list of FoodItem objects in the same order"""
+        return await self._run(self._fc.get_items, fdcIDs, abridged, nutrients)
+
+    async def searchDB(self, query: str, key = 0):
+        """Coroutine version of FCManager.searchDB"""
+        return await self._run(self._fc.searchDB, query, key)
+
+    def create_food_item(self, food_data):
+        """creates a FoodItem object from food central database"""
+        return self._fc.create_food_item(food_data)
+
+    def close(self):
+        """Shuts down the worker pool and closes pooled connections"""
+        self._executor.shutdown(wait=False)
+        self._fc.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    def __repr__(self):
+        return f"AsyncFCManager(url={self._fc.url!r}, max_concurrency={self._max_concurrency})"
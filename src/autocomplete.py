@@ -0,0 +1,305 @@
+"""
+autocomplete.py
+Prefix index over local food names and brands that suggests known foods while a query is typed
+("kit" -> KIT KAT, "hers" -> foods by Hershey), most popular first.
+"""
+
+import json
+import os
+import threading
+from bisect import bisect_left
+from pathlib import Path
+
+import numpy as np
+
+from lru_cache import LRUCache
+from trigram_index import FUZZY_FIELDS, NON_ALNUM_RE, fuzzy_text
+from text_analyzer import fold
+
+
+MAX_WORDS = 6 #a food is reachable from the start of each of its first MAX_WORDS words
+TIE_LENGTH = 1024 #ties rank by word position, then by text length below this
+BLOCKS = (1024, 32768) #entry counts of the blocks whose best entries are kept, small to large
+HEAD = 32 #best entries kept per block; long slices are ranked from these
+
+
+def normalize_prefix(text: str) -> str:
+    """Returns typed text folded to lower-case ASCII words separated by single spaces (a trailing space is kept)"""
+    return NON_ALNUM_RE.sub(" ", fold(text)).lstrip()
+
+
+def label(food: dict) -> str:
+    """Returns the text a suggestion is shown as: "description (brand owner)" """
+    description, brand = food.get("description") or "", food.get("brandOwner") or ""
+    return f"{description} ({brand})" if brand else description
+
+
+def prefix_keys(text: str) -> list:
+    """Returns the (key, tie) pairs a text is found under: the text from each of its first MAX_WORDS words"""
+    words = NON_ALNUM_RE.sub(" ", fold(text)).split()
+    keys = (" ".join(words[position:]) for position in range(min(len(words), MAX_WORDS)))
+    return [(key, position * TIE_LENGTH + min(len(key), TIE_LENGTH - 1)) for position, key in enumerate(keys)]
+
+
+def _upper(prefix: str) -> str:
+    """Returns the smallest string after every string starting with prefix"""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class _Tier:
+    """Immutable sorted run of (key, row, order) entries"""
+
+    def __init__(self, keys, rows, orders):
+        self.keys = keys #sorted normalized keys
+        self.rows = rows #row of each key, int64
+        self.orders = orders #tie << 32 | row: smaller first, no two foods equal
+        self.heads = [] #per block size: positions of the HEAD smallest orders of each whole block
+        for size in BLOCKS:
+            blocks = len(keys) // size
+            best = np.argpartition(orders[:blocks * size].reshape(blocks, size), HEAD - 1, axis=1)[:, :HEAD]
+            self.heads.append(best + np.arange(blocks)[:, None] * size)
+
+    @classmethod
+    def build(cls, entries):
+        entries.sort()
+        rows = np.array([entry[1] for entry in entries], dtype=np.int64)
+        return cls([entry[0] for entry in entries], rows, np.array([entry[2] for entry in entries], dtype=np.int64) << 32 | rows)
+
+    @classmethod
+    def merge(cls, older, newer):
+        """Merges two runs; sorting the concatenation is linear since both halves are already sorted"""
+        keys = older.keys + newer.keys
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        return cls([keys[i] for i in order], np.concatenate((older.rows, newer.rows))[order],
+                   np.concatenate((older.orders, newer.orders))[order])
+
+    def span(self, prefix):
+        """Returns the slice of entries whose key starts with prefix"""
+        return slice(bisect_left(self.keys, prefix), bisect_left(self.keys, _upper(prefix)))
+
+    def positions(self, span, wanted):
+        """
+        Returns positions in span that include its wanted entries with the smallest orders: every
+        entry when wanted is None or above HEAD, else the heads of the largest whole blocks inside the
+        span, with the parts left at either end covered by smaller blocks and finally read directly.
+        """
+        if wanted is None or wanted > HEAD:
+            return np.arange(span.start, span.stop)
+        return np.concatenate(self._cover(span.start, span.stop, len(BLOCKS) - 1))
+
+    def _cover(self, start, stop, level):
+        if level < 0:
+            return [np.arange(start, stop)]
+        size = BLOCKS[level]
+        first, last = -(-start // size), stop // size
+        if last <= first:
+            return self._cover(start, stop, level - 1)
+        return self._cover(start, first * size, level - 1) + [self.heads[level][first:last].ravel()] + self._cover(last * size, stop, level - 1)
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class PrefixIndex:
+    """
+    In-memory sorted prefix index from food names and brands to fdcIds.
+
+    Each food is stored under the text starting at each of its first MAX_WORDS words, so a
+    prefix is one binary search per sorted run and its matches are a contiguous slice. Matches
+    rank most popular first, then by match at an earlier word, then by shorter text. A long slice
+    (a one-letter prefix) is ranked from the best entries kept per block of the run plus the foods
+    ever selected, so it costs about as much as a short one. Results are memoized per prefix
+    until the index or a popularity changes.
+
+    Popularity is the number of times a food was selected; with a path it is kept on disk as
+    JSON. Added foods are buffered and sorted into a new run on the next lookup; runs are
+    merged once a newer run is at least half the size of the one before it. An index loaded in
+    the background answers lookups once the load is done.
+    """
+
+    def __init__(self, path = None, cache_size = 4096):
+        """
+        Args:
+            path (str): JSON file popularity counts are kept in (None keeps them in memory only).
+            cache_size (int): prefixes whose suggestions are memoized.
+        """
+        self._path = Path(path) if path is not None else None
+        self._lock = threading.Lock()
+        self._counts = self._load() #fdcId -> times selected
+        self._ids = [] #row -> fdcId
+        self._labels = [] #row -> suggestion text
+        self._rows = {} #fdcId -> current row
+        self._alive = np.zeros(0, dtype=bool)
+        self._popularity = np.zeros(0, dtype=np.int64)
+        self._popular = set() #rows selected at least once
+        self._tiers = []
+        self._pending = [] #(key, row, tie) not yet in a run
+        self._memo = LRUCache(max_entries=cache_size)
+        self._loaded = threading.Event()
+        self._loaded.set()
+        self.hits = 0 #lookups with at least one suggestion
+        self.misses = 0
+
+    @classmethod
+    def from_food_index(cls, index, path = None, background = False):
+        """
+        Returns a PrefixIndex over every food stored in a FoodIndex. With background, it is
+        returned at once and filled by a daemon thread; lookups wait for the fill to finish.
+        """
+        prefix_index = cls(path)
+        foods = (dict(zip(("fdcId",) + FUZZY_FIELDS, row)) for row in index.iter_field_values(*FUZZY_FIELDS))
+        if background:
+            prefix_index._loaded.clear()
+            threading.Thread(target=prefix_index._fill, args=(foods,), name="prefix-load", daemon=True).start()
+        else:
+            prefix_index.add_foods(foods)
+        return prefix_index
+
+    def _fill(self, foods, batch = 50000):
+        """Adds the foods not added meanwhile (those are newer), then marks the index loaded"""
+        try:
+            chunk = []
+            for food in foods:
+                chunk.append(food)
+                if len(chunk) >= batch:
+                    self.add_foods(chunk, replace=False)
+                    chunk = []
+            self.add_foods(chunk, replace=False)
+        finally:
+            self._loaded.set()
+
+    def wait_loaded(self, timeout = None) -> bool:
+        """Blocks until a background load is done. Returns False on timeout."""
+        return self._loaded.wait(timeout)
+
+    @property
+    def path(self):
+        return self._path
+
+    def _load(self) -> dict:
+        if self._path is None or not self._path.exists():
+            return {}
+        try:
+            with open(self._path, "r") as file:
+                return {int(fdc_id): count for fdc_id, count in json.load(file).items()}
+        except (json.JSONDecodeError, OSError, ValueError, AttributeError):
+            return {}
+
+    def _save(self):
+        """Writes the counts to a temporary file renamed over the old one, so a crash never leaves half a file"""
+        if self._path is not None:
+            temp = self._path.with_name(self._path.name + ".tmp")
+            with open(temp, "w") as file:
+                json.dump(self._counts, file)
+            os.replace(temp, self._path)
+
+    def add_foods(self, foods, replace = True) -> int:
+        """
+        Buffers food records (description and brand owner) for suggestion; replace=False skips
+        foods already added. Returns the number added.
+        """
+        count = 0
+        with self._lock:
+            for food in foods:
+                if not isinstance(food, dict) or food.get("fdcId") is None:
+                    continue
+                fdc_id, text = food["fdcId"], label(food)
+                row = self._rows.get(fdc_id)
+                if row is not None:
+                    if self._labels[row] == text or not replace:
+                        continue
+                    self._grow()
+                    self._alive[row] = False #replaced by the new text
+                row = len(self._ids)
+                self._rows[fdc_id] = row
+                self._ids.append(fdc_id)
+                self._labels.append(text)
+                self._pending.extend((key, row, tie) for key, tie in prefix_keys(fuzzy_text(food)))
+                if fdc_id in self._counts:
+                    self._popular.add(row)
+                count += 1
+        return count
+
+    def _grow(self):
+        """Extends the per-row arrays to every row added so far. Caller holds the lock."""
+        added = self._ids[len(self._alive):]
+        if added:
+            self._alive = np.concatenate((self._alive, np.ones(len(added), dtype=bool)))
+            self._popularity = np.concatenate((self._popularity, np.fromiter((self._counts.get(i, 0) for i in added), dtype=np.int64)))
+
+    def _flush(self):
+        """Sorts the pending keys into a new run, merging runs of similar size. Caller holds the lock."""
+        self._grow()
+        if not self._pending:
+            return
+        self._tiers.append(_Tier.build(self._pending))
+        self._pending = []
+        while len(self._tiers) > 1 and 2 * len(self._tiers[-1]) >= len(self._tiers[-2]):
+            newer = self._tiers.pop()
+            self._tiers[-1] = _Tier.merge(self._tiers[-1], newer)
+        self._memo.invalidate()
+
+    def suggest(self, prefix: str, k = 5) -> list:
+        """Returns up to k (fdcId, label) pairs of foods with a word starting with prefix, best first"""
+        key = normalize_prefix(prefix)
+        if not key.strip():
+            return []
+        self._loaded.wait()
+        with self._lock:
+            self._flush()
+            suggestions = self._memo.get((key, k))
+            if suggestions is None:
+                suggestions = self._rank(key, k)
+                self._memo.put((key, k), suggestions)
+            if suggestions:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return list(suggestions)
+
+    def _rank(self, key, k):
+        """Returns the k best distinct foods among the keys starting with key. Caller holds the lock."""
+        wanted = 4 * k #a food can match at several of its words
+        for exhaustive in (False, True):
+            positions = [(tier, tier.positions(tier.span(key), None if exhaustive else wanted)) for tier in self._tiers]
+            rows = [tier.rows[p] for tier, p in positions]
+            orders = [tier.orders[p] for tier, p in positions]
+            #block heads only hold the best static orders, so foods moved up by popularity are added explicitly
+            popular = [(row, tie << 32 | row) for row in self._popular for text, tie in prefix_keys(self._labels[row]) if text.startswith(key)]
+            rows.append(np.array([row for row, _ in popular], dtype=np.int64))
+            orders.append(np.array([order for _, order in popular], dtype=np.int64))
+            rows, orders = np.concatenate(rows), np.concatenate(orders)
+            live = self._alive[rows]
+            rows, orders = rows[live], orders[live]
+            rank = self._popularity[rows] * (1 << 45) - orders
+            best = np.argpartition(-rank, wanted - 1)[:wanted] if len(rows) > wanted and not exhaustive else np.arange(len(rows))
+            best = best[np.argsort(-rank[best], kind="stable")]
+            chosen = list(dict.fromkeys(rows[best].tolist()))[:k]
+            if len(chosen) == k:
+                break
+        return tuple((self._ids[row], self._labels[row]) for row in chosen)
+
+    def select(self, fdc_id):
+        """Records that a food was chosen, moving it up in later suggestions"""
+        fdc_id = int(fdc_id) #"534358" and 534358 are one food
+        with self._lock:
+            self._counts[fdc_id] = self._counts.get(fdc_id, 0) + 1
+            row = self._rows.get(fdc_id)
+            if row is not None:
+                self._grow()
+                self._popularity[row] += 1
+                self._popular.add(row)
+            self._memo.invalidate()
+            self._save()
+
+    def popularity(self, fdc_id) -> int:
+        return self._counts.get(int(fdc_id), 0)
+
+    def __contains__(self, fdc_id):
+        return fdc_id in self._rows
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __repr__(self):
+        return f"PrefixIndex(foods={len(self._rows)}, runs={len(self._tiers)})"
@@ -1,19 +1,54 @@
 # Database_Manager
 from abc import ABC, abstractmethod
+import json
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from response_cache import ResponseCache
+from resilience import endpoint_name
+from single_flight import SingleFlight
 
 class DBManager(ABC):
     """
     Base class for all external database managers.
     Primarily manages GET calls to APIs
     Requires: requests library
+
+    Every manager owns one pooled requests.Session, so repeated lookups reuse
+    open keep-alive connections instead of paying a new TCP/TLS handshake.
+    An optional ResponseCache serves repeat lookups from disk, and an optional
+    RateLimiter paces requests under the API quota and retries 429 responses.
+    An optional Resilience retries failing requests and fails fast while an endpoint's
+    circuit is open. Concurrent identical requests are coalesced into one (see single_flight).
     """
 
-    def __init__(self, url, key, default_key):
+    def __init__(self, url, key, default_key, pool_connections = 4, pool_maxsize = 10, timeout = (3.05, 15), cache = None,
+                 rate_limiter = None, resilience = None):
+        """
+        Args:
+            url (str): Base url of the API.
+            key (str): API key.
+            default_key (str): Key used when the user does not supply one.
+            pool_connections (int): Number of per-host connection pools kept open.
+            pool_maxsize (int): Maximum connections kept alive per host.
+            timeout (float | tuple): requests timeout, (connect, read) seconds.
+            cache (ResponseCache): Optional on-disk response cache.
+            rate_limiter (RateLimiter): Optional token bucket every request goes through.
+            resilience (Resilience): Optional retries, circuit breakers and deadline for every request.
+        """
         self._url = url
         self._key = key
-        self._default_key = default_key 
+        self._default_key = default_key
+        self._timeout = timeout
+        self._pool_maxsize = pool_maxsize
+        self._cache = cache
+        self._rate_limiter = rate_limiter
+        self._resilience = resilience
+        self._single_flight = SingleFlight()
+        self._session = self.create_session(pool_connections, pool_maxsize)
+
 
-    
     @abstractmethod
     def __repr__(self) -> str:
         pass
@@ -21,11 +56,11 @@ class DBManager(ABC):
     @property
     def url(self):
         return self._url
-    
+
     @property
     def key(self):
         return self._key
-    
+
     @property
     def default_key(self):
         return self._default_key
@@ -34,11 +69,171 @@ class DBManager(ABC):
     @abstractmethod
     def key(self, key):
         pass
-    
+
+    @property
+    def session(self) -> requests.Session:
+        return self._session
+
+    @property
+    def pool_maxsize(self) -> int:
+        return self._pool_maxsize
+
+    @property
+    def cache(self):
+        return self._cache
+
+    @cache.setter
+    def cache(self, cache):
+        self._cache = cache
+
+    @property
+    def rate_limiter(self):
+        return self._rate_limiter
+
+    @rate_limiter.setter
+    def rate_limiter(self, rate_limiter):
+        self._rate_limiter = rate_limiter
+
+    @property
+    def resilience(self):
+        return self._resilience
+
+    @resilience.setter
+    def resilience(self, resilience):
+        self._resilience = resilience
+
+    @property
+    def single_flight(self) -> SingleFlight:
+        return self._single_flight
+
+    @property
+    def timeout(self):
+        return self._timeout
+
+    @timeout.setter
+    def timeout(self, value):
+        self._timeout = value
+
     @abstractmethod
     def get_item(self):
         pass
 
+    @staticmethod
+    def create_session(pool_connections = 4, pool_maxsize = 10) -> requests.Session:
+        """Returns a keep-alive session with a connection pool mounted for http and https"""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _get(self, path, params = None, **kwargs) -> requests.Response:
+        """
+        Sends a GET request for path (relative to url) through the pooled session.
+        With a rate limiter the request waits for a token, and a 429 is retried after a jittered backoff.
+        With resilience, errors and 5xx responses are retried and an open circuit raises CircuitOpenError.
+        """
+        kwargs.setdefault("timeout", self._timeout)
+        if self._resilience is not None:
+            return self._resilience.call(endpoint_name(f"{self._url}{path}"), self._send, path, params, **kwargs)
+        return self._send(path, params, **kwargs)
+
+    def _send(self, path, params = None, **kwargs) -> requests.Response:
+        """Sends one GET for path, pacing it with the rate limiter and retrying 429 responses"""
+        limiter = self._rate_limiter
+        attempt = 0
+        while True:
+            if limiter is not None:
+                limiter.acquire()
+            response = self._session.get(f"{self._url}{path}", params=params, **kwargs)
+            if limiter is None:
+                return response
+            limiter.update(response.headers)
+            if response.status_code != 429 or attempt >= limiter.max_retries:
+                return response
+            print("Rate limited, retrying...")
+            limiter.backoff(attempt, response.headers.get("Retry-After"))
+            attempt += 1
+
+    def _get_json(self, path, params = None):
+        """
+        Returns the decoded JSON body of a GET for path, or None on failure.
+        With a cache: fresh entries skip the network, offline mode serves only from the cache,
+        and stale entries are served when the API is unreachable or failing.
+        Concurrent identical requests share one fetch; each caller decodes its own copy.
+        """
+        body = self._single_flight.do(ResponseCache.make_key(path, params), self._fetch_body, path, params)
+        return json.loads(body) if body is not None else None
+
+    def _fetch_body(self, path, params = None):
+        """
+        Returns the raw response body for path from the cache or the API, None on failure.
+        An expired entry is revalidated with its ETag / Last-Modified; a 304 reuses the cached body.
+        """
+        cache_key = None
+        headers = {}
+        if self._cache is not None:
+            cache_key = self._cache.make_key(path, params)
+            body = self._cache.get(cache_key)
+            if body is not None:
+                return body
+            if self._cache.offline:
+                print(f"Offline: no cached data for {cache_key}")
+                return None
+            headers = self._cache.validators(cache_key)
+
+        try:
+            response = self._get(path, params, headers=headers) if headers else self._get(path, params)
+        except requests.RequestException as e:
+            return self._serve_stale(cache_key, e)
+
+        if response.status_code == 304 and cache_key is not None and self._cache.refresh(cache_key):
+            return self._cache.get(cache_key)
+        if response.status_code == 200:
+            if cache_key is not None:
+                self._store(cache_key, response)
+            return response.content
+        if response.status_code >= 500 and cache_key is not None:
+            return self._serve_stale(cache_key, f"Error {response.status_code}")
+        print(f"Failed to retrieve data. Error {response.status_code}\nURL: {response.url}")
+
+    def _store(self, cache_key, response):
+        """Caches a 200 response's body with its validators"""
+        self._cache.put(cache_key, response.content, etag=response.headers.get("ETag"),
+                        last_modified=response.headers.get("Last-Modified"))
+
+    def revalidate(self, path, params = None) -> bool:
+        """
+        Refreshes the cached entry for path without decoding it, fresh or not: a 304 extends its ttl
+        and a 200 replaces it. Returns True if the entry is fresh afterwards.
+        """
+        if self._cache is None or self._cache.offline:
+            return False
+        cache_key = self._cache.make_key(path, params)
+        try:
+            response = self._get(path, params, headers=self._cache.validators(cache_key))
+        except requests.RequestException as e:
+            print(f"Failed to revalidate {cache_key}. {e}")
+            return False
+        if response.status_code == 304:
+            return self._cache.refresh(cache_key)
+        if response.status_code == 200:
+            self._store(cache_key, response)
+            return True
+        return False
+
+    def _serve_stale(self, cache_key, error):
+        """Returns an expired cache entry for cache_key when the API cannot answer"""
+        body = self._cache.get(cache_key, allow_stale=True) if cache_key is not None else None
+        if body is None:
+            print(f"Failed to retrieve data. {error}")
+            return None
+        print("API unavailable, using cached data")
+        return body
+
+    def close(self):
+        """Closes every pooled connection held by the session"""
+        self._session.close()
 
     def prompt_key(self) -> str:
         """Prompts user for api key or returns default key"""
@@ -54,4 +249,3 @@ class DBManager(ABC):
 
 #print(fc_db.url)
 #print(fc_db.get_food_item(534358))
-
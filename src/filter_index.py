@@ -0,0 +1,296 @@
+"""
+filter_index.py
+Dietary filters of a search query ("low sugar", "gluten free", "vegan", ...) kept as one
+bitmap per filter over the local food catalog.
+"""
+
+import hashlib
+import re
+import sqlite3
+import threading
+
+import numpy as np
+
+from ingredient_index import PLANT_QUALIFIERS, IngredientIndex, food_allergens, food_ingredients, words
+from text_analyzer import TOKEN_RE, fold
+
+
+#nutrient claims per 100 g, after the EU nutrition claim conditions
+LOW_SUGAR_MAX = 5.0 #g sugars (269)
+LOW_FAT_MAX = 3.0 #g total fat (204)
+HIGH_PROTEIN_SHARE = 0.20 #share of energy (208) from protein (203) at 4 kcal/g
+HIGH_FIBER_MIN = 6.0 #g fiber (291)
+
+ANIMAL_ALLERGENS = frozenset(("milk", "egg", "fish", "shellfish"))
+#animal products that are not allergens
+ANIMAL_WORDS = frozenset(("meat", "beef", "pork", "chicken", "turkey", "lamb", "veal", "ham", "bacon", "sausage", "gelatin",
+                          "honey", "lard", "tallow", "carmine", "shellac", "collagen"))
+
+
+def nutrient_values(food: dict) -> dict:
+    """Returns {nutrient number: amount} of a record in search, full or abridged format"""
+    values = {}
+    for nutrient in food.get("foodNutrients") or []:
+        info = nutrient.get("nutrient") or nutrient
+        number = nutrient.get("nutrientNumber") or info.get("number")
+        amount = nutrient.get("value", nutrient.get("amount"))
+        if number is not None and isinstance(amount, (int, float)):
+            values[str(number)] = float(amount)
+    return values
+
+
+def ingredient_words(food: dict) -> list:
+    """Returns the folded, singular words of a food's parsed ingredients (none for a branded food without ingredients)"""
+    return [word for ingredient in food_ingredients(food) for word in words(ingredient)]
+
+
+def _labelled(food, claim):
+    return claim in " ".join(TOKEN_RE.findall(fold(f"{food.get('description') or ''} {food.get('ingredients') or ''}")))
+
+
+def _contains(words, listed) -> bool:
+    """True if a listed word occurs without a plant qualifier before it"""
+    return any(word in listed and (i == 0 or words[i - 1] not in PLANT_QUALIFIERS) for i, word in enumerate(words))
+
+
+def low_sugar(food: dict) -> bool:
+    sugars = nutrient_values(food).get("269")
+    return sugars is not None and sugars <= LOW_SUGAR_MAX
+
+
+def low_fat(food: dict) -> bool:
+    fat = nutrient_values(food).get("204")
+    return fat is not None and fat <= LOW_FAT_MAX
+
+
+def high_protein(food: dict) -> bool:
+    values = nutrient_values(food)
+    protein, energy = values.get("203"), values.get("208")
+    return bool(protein and energy) and 4 * protein >= HIGH_PROTEIN_SHARE * energy
+
+
+def high_fiber(food: dict) -> bool:
+    fiber = nutrient_values(food).get("291")
+    return fiber is not None and fiber >= HIGH_FIBER_MIN
+
+
+def gluten_free(food: dict) -> bool:
+    return _labelled(food, "gluten free") or (bool(food_ingredients(food)) and "gluten" not in food_allergens(food))
+
+
+def vegan(food: dict) -> bool:
+    found = ingredient_words(food)
+    return _labelled(food, "vegan") or (bool(found) and not ANIMAL_ALLERGENS & food_allergens(food) and not _contains(found, ANIMAL_WORDS))
+
+
+#filter phrase -> predicate over a food record; the position of a filter is its bit
+FILTERS = {"low sugar": low_sugar, "low fat": low_fat, "high protein": high_protein, "high fiber": high_fiber,
+           "gluten free": gluten_free, "vegan": vegan}
+_FILTER_ALTERNATIVES = "|".join(re.escape(name).replace(r"\ ", "[ -]") for name in FILTERS)
+FILTER_GROUP_RE = re.compile(rf"\b(?:{_FILTER_ALTERNATIVES})(?:\s+or\s+(?:{_FILTER_ALTERNATIVES}))*\b")
+
+
+def food_flags(food: dict) -> int:
+    """Returns the filters a food passes as bits (bit i set for the i-th entry of FILTERS)"""
+    return sum(1 << bit for bit, passes in enumerate(FILTERS.values()) if passes(food))
+
+
+def split_filters(query: str) -> tuple:
+    """
+    Returns (text, groups): the query without its filter phrases, and the filters as groups a
+    food must match all of, each group being alternatives joined by "or" in the query.
+    "vegan low sugar or low fat yogurt" -> ("yogurt", [("vegan",), ("low sugar", "low fat")])
+    """
+    query = " ".join(query.lower().split())
+    groups = []
+    for match in FILTER_GROUP_RE.finditer(query):
+        names = re.split(r"\s+or\s+", match.group())
+        groups.append(tuple(dict.fromkeys(name.replace("-", " ") for name in names)))
+    return " ".join(FILTER_GROUP_RE.sub(" ", query).split()), groups
+
+
+class FilterIndex:
+    """
+    One bitmap per dietary filter over every food added, bit r standing for the food in row r.
+
+    Each food's filters are computed once, when it is added, from its nutrients and
+    ingredients, and kept in SQLite so later runs only load them. match() combines the
+    bitmaps with AND/OR array operations; keep() then tests candidates against the result
+    with one indexed read each, so a filtered search drops foods before they are ranked.
+    """
+
+    def __init__(self, path = "filter_index.db"):
+        """
+        Args:
+            path (str): SQLite database file (":memory:" for a throwaway index).
+                Flags computed for a different filter list are discarded on open.
+        """
+        self._path = path
+        self._lock = threading.Lock()
+        self._ids = [] #row -> fdcId
+        self._rows = {} #fdcId -> row
+        self._flags = np.zeros(0, dtype=np.int64) #row -> filter bits
+        self._bitmaps = np.zeros((len(FILTERS), 0), dtype=np.uint8) #filter -> packed rows, little bit order
+        self._size = 0 #rows in use
+        self._loaded = threading.Event()
+        self._loaded.set()
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS flags (fdc_id INTEGER PRIMARY KEY, bits INTEGER NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        built_for = self._conn.execute("SELECT value FROM meta WHERE key = 'filters'").fetchone()
+        if built_for is None or built_for[0] != self.signature():
+            self._conn.execute("DELETE FROM flags")
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('filters', ?)", (self.signature(),))
+        self._conn.commit()
+        rows = self._conn.execute("SELECT fdc_id, bits FROM flags").fetchall()
+        self._set([fdc_id for fdc_id, _ in rows], [bits for _, bits in rows])
+
+    @classmethod
+    def from_food_index(cls, index, path = "filter_index.db", batch = 5000, background = False):
+        """
+        Returns a FilterIndex covering every food stored in a FoodIndex, computing flags only for foods
+        not seen before. With background, it is returned at once and filled by a daemon thread;
+        lookups wait for the fill to finish.
+        """
+        filter_index = cls(path)
+        if background:
+            filter_index._loaded.clear()
+            threading.Thread(target=filter_index._fill, args=(index, batch), name="filter-load", daemon=True).start()
+        else:
+            filter_index._fill(index, batch)
+        return filter_index
+
+    def _fill(self, index, batch = 5000):
+        """Adds the stored foods not added before or meanwhile (those are newer), then marks the index loaded"""
+        try:
+            missing = [fdc_id for fdc_id, in index.field_values() if fdc_id not in self]
+            for i in range(0, len(missing), batch):
+                self.add_foods(index.get_foods(missing[i:i + batch]), replace=False)
+        finally:
+            self._loaded.set()
+
+    def wait_loaded(self, timeout = None) -> bool:
+        """Blocks until a background load is done. Returns False on timeout."""
+        return self._loaded.wait(timeout)
+
+    @staticmethod
+    def signature() -> str:
+        """Names the filters, thresholds and word lists the stored flags were computed with"""
+        animal = hashlib.sha1(" ".join(sorted(ANIMAL_WORDS | ANIMAL_ALLERGENS)).encode()).hexdigest()[:8]
+        return (",".join(FILTERS) + f";{LOW_SUGAR_MAX},{LOW_FAT_MAX},{HIGH_PROTEIN_SHARE},{HIGH_FIBER_MIN};{animal};"
+                + IngredientIndex.signature())
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    def add_foods(self, foods, replace = True) -> int:
+        """
+        Computes and stores the filters of food records, replacing older copies (unless replace
+        is False, which skips foods already in the index). Returns the number added.
+        """
+        latest = {food["fdcId"]: food_flags(food) for food in foods if isinstance(food, dict) and food.get("fdcId") is not None}
+        with self._lock:
+            if not replace:
+                latest = {fdc_id: bits for fdc_id, bits in latest.items() if fdc_id not in self._rows}
+            if not latest:
+                return 0
+            self._conn.executemany("INSERT OR REPLACE INTO flags (fdc_id, bits) VALUES (?, ?)", latest.items())
+            self._conn.commit()
+            self._set(list(latest), list(latest.values()))
+        return len(latest)
+
+    def _set(self, fdc_ids, flags):
+        """Writes the flags of foods into their rows (new foods get new rows) and the bitmaps"""
+        for fdc_id in fdc_ids:
+            if fdc_id not in self._rows:
+                self._rows[fdc_id] = len(self._ids)
+                self._ids.append(fdc_id)
+        self._fit(len(self._ids))
+        rows = np.fromiter((self._rows[fdc_id] for fdc_id in fdc_ids), dtype=np.int64, count=len(fdc_ids))
+        self._flags[rows] = flags
+        self._size = len(self._ids)
+        byte, bit = rows >> 3, (1 << (rows & 7)).astype(np.uint8)
+        for i, bitmap in enumerate(self._bitmaps):
+            np.bitwise_and.at(bitmap, byte, ~bit) #a replaced food may have lost a filter
+            passes = (self._flags[rows] >> i) & 1 == 1
+            np.bitwise_or.at(bitmap, byte[passes], bit[passes])
+
+    def _fit(self, size):
+        """Grows the row arrays to hold size rows, doubling their capacity"""
+        if size <= len(self._flags):
+            return
+        capacity = max(size, 2 * len(self._flags), 1024)
+        capacity += -capacity % 8
+        self._flags = np.concatenate((self._flags, np.zeros(capacity - len(self._flags), dtype=np.int64)))
+        self._bitmaps = np.concatenate((self._bitmaps, np.zeros((len(FILTERS), capacity // 8 - self._bitmaps.shape[1]), dtype=np.uint8)), axis=1)
+
+    def match(self, groups) -> np.ndarray:
+        """
+        Returns the packed bitmap of foods passing every group of filters, where a group is
+        passed by passing any one of its filters (AND of ORs, as split_filters returns them).
+        """
+        self._loaded.wait()
+        with self._lock:
+            result = np.zeros(self._bitmaps.shape[1], dtype=np.uint8)
+            result[:self._size // 8] = 0xFF
+            if self._size % 8:
+                result[self._size // 8] = (1 << (self._size % 8)) - 1
+            for group in groups:
+                alternatives = np.zeros_like(result)
+                for name in group:
+                    np.bitwise_or(alternatives, self._bitmaps[self._bit(name)], out=alternatives)
+                np.bitwise_and(result, alternatives, out=result)
+        return result
+
+    @staticmethod
+    def _bit(name) -> int:
+        try:
+            return list(FILTERS).index(name)
+        except ValueError:
+            raise ValueError(f"Unknown filter: {name!r}") from None
+
+    def keep(self, fdc_ids, groups) -> list:
+        """Returns the fdcIds (in their order) of foods in the index that pass every group of filters"""
+        fdc_ids = list(fdc_ids)
+        if not groups:
+            return fdc_ids
+        bitmap = self.match(groups)
+        rows = np.fromiter((self._rows.get(fdc_id, -1) for fdc_id in fdc_ids), dtype=np.int64, count=len(fdc_ids))
+        known = rows >= 0
+        passes = np.zeros(len(rows), dtype=bool)
+        passes[known] = (bitmap[rows[known] >> 3] >> (rows[known] & 7)) & 1 == 1
+        return [fdc_id for fdc_id, ok in zip(fdc_ids, passes.tolist()) if ok]
+
+    def ids(self, groups) -> list:
+        """Returns the fdcIds of every food that passes every group of filters"""
+        bits = np.unpackbits(self.match(groups), count=self._size, bitorder="little")
+        return [self._ids[row] for row in np.flatnonzero(bits).tolist()]
+
+    def count(self, groups) -> int:
+        return int(np.unpackbits(self.match(groups), count=self._size, bitorder="little").sum())
+
+    def flags(self, fdc_id) -> list:
+        """Returns the names of the filters a food passes, None if it is not in the index"""
+        self._loaded.wait()
+        row = self._rows.get(fdc_id)
+        if row is None:
+            return None
+        return [name for bit, name in enumerate(FILTERS) if int(self._flags[row]) >> bit & 1]
+
+    def close(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+
+    def __contains__(self, fdc_id):
+        return fdc_id in self._rows
+
+    def __len__(self):
+        return self._size
+
+    def __repr__(self):
+        return f"FilterIndex(path={self._path!r}, foods={self._size})"
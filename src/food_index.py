@@ -0,0 +1,227 @@
+"""
+food_index.py
+Persistent inverted index over FDC food records for local keyword search.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+from text_analyzer import ANALYZER
+
+
+class FoodIndex:
+    """
+    SQLite inverted index: one postings row (token, fdcId, term frequency) per distinct
+    token of each food, plus the food record itself and its token count.
+
+    Every record added stays searchable across runs, so repeat keyword searches can be
+    answered locally. A search returns the foods containing every query token, most
+    query-term occurrences first.
+
+    The index also keeps the corpus statistics BM25 ranks with (doc_count, avg_length,
+    doc_freqs): a terms table holds each token's document frequency and is updated
+    in the same transaction as the postings, so it never has to be recounted.
+    """
+
+    def __init__(self, path = "food_index.db", analyzer = None):
+        """
+        Args:
+            path (str): SQLite database file (":memory:" for a throwaway index).
+            analyzer (TextAnalyzer): Tokenizes foods and queries, the shared default if None.
+                An index built by a different analyzer is re-tokenized on open.
+        """
+        self._path = path
+        self._analyzer = analyzer if analyzer is not None else ANALYZER
+        self._lock = threading.Lock()
+        self.hits = 0 #searches answered with at least one food
+        self.misses = 0 #searches with no local match
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS foods ("
+            "fdc_id INTEGER PRIMARY KEY, data BLOB NOT NULL, length INTEGER NOT NULL, added REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS postings ("
+            "token TEXT NOT NULL, fdc_id INTEGER NOT NULL, tf INTEGER NOT NULL, PRIMARY KEY (token, fdc_id)) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS postings_food ON postings (fdc_id)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS terms (token TEXT PRIMARY KEY, df INTEGER NOT NULL) WITHOUT ROWID")
+        if self._conn.execute("SELECT 1 FROM terms LIMIT 1").fetchone() is None: #index built before terms existed
+            self._conn.execute("INSERT INTO terms (token, df) SELECT token, COUNT(*) FROM postings GROUP BY token")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+        self._doc_count, self._total_length = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM foods").fetchone()
+        built_by = self._conn.execute("SELECT value FROM meta WHERE key = 'analyzer'").fetchone()
+        if built_by is None or built_by[0] != self._analyzer.signature:
+            self.reindex()
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def analyzer(self):
+        return self._analyzer
+
+    @property
+    def doc_count(self) -> int:
+        return self._doc_count
+
+    @property
+    def avg_length(self) -> float:
+        return self._total_length / self._doc_count if self._doc_count else 0.0
+
+    def doc_freqs(self, tokens) -> dict:
+        """Returns {token: number of indexed foods containing it} for tokens"""
+        tokens = list(set(tokens))
+        dfs = dict.fromkeys(tokens, 0)
+        with self._lock:
+            for i in range(0, len(tokens), 500):
+                chunk = tokens[i:i + 500]
+                sql = f"SELECT token, df FROM terms WHERE token IN ({','.join('?' * len(chunk))})"
+                dfs.update(self._conn.execute(sql, chunk).fetchall())
+        return dfs
+
+    def _forget(self, fdc_ids):
+        """Takes the postings and lengths of stored copies of fdc_ids out of the statistics. Caller holds the lock."""
+        for i in range(0, len(fdc_ids), 500):
+            chunk = fdc_ids[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            counts = self._conn.execute(f"SELECT token, COUNT(*) FROM postings WHERE fdc_id IN ({marks}) GROUP BY token", chunk).fetchall()
+            self._conn.executemany("UPDATE terms SET df = df - ? WHERE token = ?", [(n, token) for token, n in counts])
+            docs, length = self._conn.execute(f"SELECT COUNT(*), COALESCE(SUM(length), 0) FROM foods WHERE fdc_id IN ({marks})", chunk).fetchone()
+            self._doc_count -= docs
+            self._total_length -= length
+
+    def add(self, food: dict) -> bool:
+        """Indexes one food record, replacing an older copy. Returns False if it has no fdcId."""
+        return self.add_many([food]) == 1
+
+    def add_many(self, foods) -> int:
+        """Indexes food records in one transaction, replacing older copies. Returns the number indexed."""
+        latest = {}
+        for food in foods:
+            fdc_id = food.get("fdcId") if isinstance(food, dict) else None
+            if fdc_id is not None:
+                latest[fdc_id] = food #last copy of a repeated fdcId wins
+        if not latest:
+            return 0
+
+        rows = []
+        postings = []
+        dfs = {}
+        length = 0
+        now = time.time()
+        for fdc_id, food in latest.items():
+            tokens = self._analyzer.food_tokens(food)
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            rows.append((fdc_id, json.dumps(food).encode(), len(tokens), now))
+            postings.extend((token, fdc_id, tf) for token, tf in counts.items())
+            for token in counts:
+                dfs[token] = dfs.get(token, 0) + 1
+            length += len(tokens)
+
+        with self._lock:
+            self._forget(list(latest))
+            self._conn.executemany("DELETE FROM postings WHERE fdc_id = ?", [(row[0],) for row in rows])
+            self._conn.executemany("INSERT OR REPLACE INTO foods (fdc_id, data, length, added) VALUES (?, ?, ?, ?)", rows)
+            self._conn.executemany("INSERT OR REPLACE INTO postings (token, fdc_id, tf) VALUES (?, ?, ?)", postings)
+            self._conn.executemany("INSERT INTO terms (token, df) VALUES (?, ?) ON CONFLICT (token) DO UPDATE SET df = df + excluded.df",
+                                   dfs.items())
+            self._conn.commit()
+            self._doc_count += len(rows)
+            self._total_length += length
+        return len(rows)
+
+    def search_ids(self, query: str, limit = None) -> list:
+        """Returns the fdcIds of foods containing every token of query, most query-term occurrences first"""
+        tokens = sorted(set(self._analyzer.tokens(query)))
+        if not tokens:
+            return []
+        sql = (f"SELECT fdc_id FROM postings WHERE token IN ({','.join('?' * len(tokens))}) "
+               "GROUP BY fdc_id HAVING COUNT(*) = ? ORDER BY SUM(tf) DESC, fdc_id")
+        args = [*tokens, len(tokens)]
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(limit)
+        with self._lock:
+            ids = [row[0] for row in self._conn.execute(sql, args)]
+            if ids:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return ids
+
+    def get_foods(self, fdc_ids) -> list:
+        """Returns the stored records for fdc_ids in the same order, skipping ids not in the index"""
+        fdc_ids = list(fdc_ids)
+        found = {}
+        with self._lock:
+            for i in range(0, len(fdc_ids), 500):
+                chunk = fdc_ids[i:i + 500]
+                sql = f"SELECT fdc_id, data FROM foods WHERE fdc_id IN ({','.join('?' * len(chunk))})"
+                found.update(self._conn.execute(sql, chunk).fetchall())
+        return [json.loads(found[fdc_id]) for fdc_id in fdc_ids if fdc_id in found]
+
+    def search(self, query: str, limit = None) -> list:
+        """Returns the records of foods containing every token of query, most query-term occurrences first"""
+        return self.get_foods(self.search_ids(query, limit))
+
+    def field_values(self, *fields) -> list:
+        """Returns (fdcId, value of each field...) for every stored food, read without decoding the records in Python"""
+        columns = "".join(f", json_extract(CAST(data AS TEXT), '$.{field}')" for field in fields)
+        with self._lock:
+            return self._conn.execute(f"SELECT fdc_id{columns} FROM foods").fetchall()
+
+    def iter_field_values(self, *fields, batch = 20000):
+        """Yields the rows of field_values in fdcId order, reading batch rows at a time so other calls are not held up meanwhile"""
+        columns = "".join(f", json_extract(CAST(data AS TEXT), '$.{field}')" for field in fields)
+        last = -(1 << 63)
+        while True:
+            with self._lock:
+                rows = self._conn.execute(f"SELECT fdc_id{columns} FROM foods WHERE fdc_id > ? ORDER BY fdc_id LIMIT ?", (last, batch)).fetchall()
+            yield from rows
+            if len(rows) < batch:
+                return
+            last = rows[-1][0]
+
+    def reindex(self, batch = 5000) -> int:
+        """Re-tokenizes every stored food with the current analyzer. Returns the number of foods."""
+        with self._lock:
+            fdc_ids = [row[0] for row in self._conn.execute("SELECT fdc_id FROM foods")]
+        for i in range(0, len(fdc_ids), batch):
+            self.add_many(self.get_foods(fdc_ids[i:i + batch]))
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('analyzer', ?)", (self._analyzer.signature,))
+            self._conn.commit()
+        return len(fdc_ids)
+
+    def remove(self, fdc_id):
+        with self._lock:
+            self._forget([fdc_id])
+            self._conn.execute("DELETE FROM postings WHERE fdc_id = ?", (fdc_id,))
+            self._conn.execute("DELETE FROM foods WHERE fdc_id = ?", (fdc_id,))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+
+    def __contains__(self, fdc_id):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM foods WHERE fdc_id = ?", (fdc_id,)).fetchone() is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM foods").fetchone()[0]
+
+    def __repr__(self):
+        return f"FoodIndex(path={self._path!r}, foods={len(self)})"
@@ -11,7 +11,7 @@ from typing import Dict, List
 class FoodItem():
     """Represents a single food item and its nutrient composition."""
 
-    def __init__(self, name: str, nutrients: Dict):
+    def __init__(self, name: str, nutrients: Dict, fdc_id: int | None = None):
         """
         Initialize a FoodItem object with parameter validation.
 
@@ -19,14 +19,21 @@ class FoodItem():
             name (str): Name of the food item.
             nutrients (dict[str, float]): Nutrient composition,
                 e.g. {"fat": 10, "protein": 5, "carbs": 20}.
+            fdc_id (int): FoodData Central ID of the record, if it came from FDC.
         """
         self._name = name
         self._nutrients = nutrients
+        self._fdc_id = fdc_id
 
     @property
     def name(self):
         return self._name
 
+    @property
+    def fdc_id(self) -> int | None:
+        """FoodData Central ID, used to open the item's full details"""
+        return self._fdc_id
+
     @property
     def nutrients(self) -> Dict[str, float]:
         """Get or set the nutrient composition."""
@@ -134,10 +141,11 @@ class FoundationFoodItem(FoodItem):
         name: str,
         nutrients: Dict[str, float],
         common_name: str,
-        scientific_name: str
+        scientific_name: str,
+        fdc_id: int | None = None
     ):
         # Call FoodItem initializer (handles name + nutrients validation)
-        super().__init__(name=name, nutrients=nutrients)
+        super().__init__(name=name, nutrients=nutrients, fdc_id=fdc_id)
 
         # Subclass-specific validation
         if not common_name:
@@ -163,8 +171,8 @@ class FoundationFoodItem(FoodItem):
 
 class BrandedFoodItem(FoodItem):
 
-    def __init__(self, name, brand_name, nutrients, ingredients, upc: str):
-        super().__init__(name=name, nutrients=nutrients)
+    def __init__(self, name, brand_name, nutrients, ingredients, upc: str, fdc_id = None):
+        super().__init__(name=name, nutrients=nutrients, fdc_id=fdc_id)
         self._food_class = "Branded"
         self._brand_name = brand_name.strip()
 
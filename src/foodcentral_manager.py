@@ -1,20 +1,117 @@
 from db_manager import DBManager
 from food_item import BrandedFoodItem, FoundationFoodItem, FoodItem
-import requests
 from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from lru_cache import LRUCache
+from rate_limiter import RateLimiter
+from resilience import Resilience
+from response_cache import ResponseCache
+from json_stream import iter_array_items
+from ranking import BM25, CorpusStats, RankedResults, TermMatrix, VECTOR_MIN_DOCS, top_k
+from text_analyzer import ANALYZER, food_text
+from trigram_index import fuzzy_text, word_similarity
+from gtin_index import normalize_gtin, short_gtin
+from filter_index import split_filters
+from ingredient_index import parse_ingredients, split_ingredient_clauses
+
+import json
+import requests
 
-import nltk
 
+FDC_URL = "https://api.nal.usda.gov/fdc/v1"
+FOODS_BATCH_LIMIT = 20 #max fdcIds accepted per /foods request
+#nutrient numbers the analyzer reads: protein, fat, carbohydrate, energy (kcal), sugars, fiber, sodium
+ANALYZER_NUTRIENTS = ("203", "204", "205", "208", "269", "291", "307")
+INDEX_SEARCH_LIMIT = 1000 #most local index matches ranked per search
+FUZZY_SEARCH_LIMIT = 20 #most typo-tolerant local matches returned per search
+RELEVANT_LIMIT = 100 #ranked results get_relevant returns
+INGEST_BATCH = 256 #streamed foods added to the index per transaction
 
 
+def normalize_nutrients(nutrients):
+    """
+    Returns foodNutrients in the flat search-result shape
+    ({"nutrientName", "nutrientNumber", "unitName", "value"}).
+    /food and /foods return a nested "nutrient" dict with "amount" (full format)
+    or "name"/"number"/"amount" (abridged format).
+    """
+    flat = []
+    for val in nutrients:
+        if "nutrientName" in val:
+            flat.append(val)
+        elif "nutrient" in val:
+            info = val["nutrient"]
+            flat.append({"nutrientId": info.get("id"), "nutrientName": info.get("name"), "nutrientNumber": info.get("number"),
+                         "unitName": info.get("unitName"), "value": val.get("amount", 0)})
+        else:
+            flat.append({"nutrientId": val.get("nutrientId"), "nutrientName": val.get("name"), "nutrientNumber": val.get("number"),
+                         "unitName": val.get("unitName"), "value": val.get("amount", 0)})
+    return flat
+
 
 class FCManager(DBManager):
     """
     Manages GET calls to USDA's Food Central Database
     """
     
-    def __init__(self, key = "DEMO_KEY"):
-        super().__init__("https://api.nal.usda.gov/fdc/v1", key, "DEMO_KEY")
+    def __init__(self, key = "DEMO_KEY", url = FDC_URL, search_cache = None, key_store = None, index = None,
+                 index_min_hits = 1, prefetch_top = 3, prefetch_budget = 300, prefetch_workers = 2, analyzer = None,
+                 fuzzy = None, fuzzy_min_similarity = 0.5, fuzzy_word_similarity = 0.8, gtins = None, autocomplete = None, filters = None,
+                 ingredients = None, **options):
+        """
+        search_cache (LRUCache): in-memory cache of ranked searchDB results, a 16 MB one by default.
+        key_store (KeyStore): remembers keys the API accepted, so they are not validated again.
+        index (FoodIndex): persistent inverted index of every food fetched; searchDB asks it before the API.
+            Its document frequencies also drive BM25 ranking (without one, ranking keeps in-memory statistics).
+        index_min_hits (int): local matches needed to answer a search without the API.
+        prefetch_top (int): details of this many top searchDB hits are fetched in the background (0 disables).
+        prefetch_budget (int): speculative detail requests allowed per hour.
+        prefetch_workers (int): threads fetching prefetched details.
+        analyzer (TextAnalyzer): tokenizes foods and queries for ranking; the index's analyzer
+            (or the shared default) if None, so ranking and the index see the same tokens.
+        fuzzy (TrigramIndex): typo-tolerant lookup over the indexed foods, tried when the index has
+            no keyword match ("kitkat" finds KIT KAT). Only matches close to every query word answer
+            before the API; looser ones are returned when the API finds nothing or fails. Needs index for the records.
+        fuzzy_min_similarity (float): share of the query's trigrams a fuzzy match must contain.
+        fuzzy_word_similarity (float): share of each query word's trigrams a fuzzy match must contain
+            to answer a search without the API.
+        gtins (GtinIndex): barcode -> fdcId map of every branded food fetched; UPC searches probe it first.
+        autocomplete (PrefixIndex): name and brand prefixes of the indexed foods, suggested while a query
+            is typed so a known food is opened without a search. Needs index for the records.
+        filters (FilterIndex): dietary filter bitmaps of every food fetched. Filter phrases in a keyword
+            search ("vegan", "low sugar or low fat") drop foods that fail them before ranking.
+        ingredients (IngredientIndex): ingredient and allergen postings of every food fetched. "contains"/"excludes"
+            clauses of a keyword search ("bar contains peanut excludes soy and dairy") drop foods before ranking;
+            a search of clauses alone is answered from it and the index without the API.
+        options are passed to DBManager (pool_connections, pool_maxsize, timeout, cache, rate_limiter, resilience).
+        Unless one is given, requests are paced by a RateLimiter sized to the key's hourly quota,
+        and failures are retried behind per-endpoint circuit breakers by a default Resilience.
+        """
+        self._owns_limiter = "rate_limiter" not in options #only a limiter made here is resized for a new key
+        options.setdefault("rate_limiter", RateLimiter.for_key(key))
+        options.setdefault("resilience", Resilience())
+        super().__init__(url, key, "DEMO_KEY", **options)
+        self._search_cache = search_cache if search_cache is not None else LRUCache(max_entries=128, max_bytes=16 * 1024 * 1024)
+        self._key_store = key_store
+        self._key_pending = self._needs_validation(key)
+        self._index = index
+        self._analyzer = analyzer if analyzer is not None else (index.analyzer if index is not None else ANALYZER)
+        self._terms = TermMatrix() if TermMatrix.available else None #term rows of the foods ranked so far
+        self._ranker = BM25(index if index is not None else self._memory_stats())
+        self._index_min_hits = max(1, index_min_hits)
+        self._fuzzy = fuzzy
+        self._fuzzy_min_similarity = fuzzy_min_similarity
+        self._fuzzy_word_similarity = fuzzy_word_similarity
+        self._gtins = gtins
+        self._autocomplete = autocomplete
+        self._filters = filters
+        self._ingredients = ingredients
+        self._prefetch_top = prefetch_top
+        self._prefetch_budget = RateLimiter(prefetch_budget) if prefetch_budget > 0 else None
+        self._prefetch_workers = prefetch_workers
+        self._prefetch_pool = None #created on first prefetch
+        self._details = LRUCache(max_entries=64, max_bytes=4 * 1024 * 1024) #prefetched get_item bodies
+        self.prefetched = 0 #speculative detail requests sent
         
     def __repr__(self):
         return f'FC DB (url: "{self.url}")'
@@ -24,51 +121,290 @@ class FCManager(DBManager):
         return self._key
 
     
+    @property
+    def search_cache(self) -> LRUCache:
+        return self._search_cache
+
+    @property
+    def key_store(self):
+        return self._key_store
+
+    @property
+    def index(self):
+        return self._index
+
+    @index.setter
+    def index(self, index):
+        self._index = index
+        self._ranker.stats = index if index is not None else self._memory_stats()
+
+    @property
+    def fuzzy(self):
+        return self._fuzzy
+
+    @property
+    def gtins(self):
+        return self._gtins
+
+    @property
+    def filters(self):
+        return self._filters
+
+    @property
+    def ingredients(self):
+        return self._ingredients
+
+    @property
+    def autocomplete(self):
+        return self._autocomplete
+
+    @property
+    def analyzer(self):
+        return self._analyzer
+
+    @property
+    def ranker(self) -> BM25:
+        return self._ranker
+
+    def _memory_stats(self):
+        """Returns the in-memory ranking statistics used without an index"""
+        return self._terms if self._terms is not None else CorpusStats()
+
+    @property
+    def prefetch_top(self) -> int:
+        return self._prefetch_top
+
+    @prefetch_top.setter
+    def prefetch_top(self, value: int):
+        self._prefetch_top = value
+
+    @property
+    def details(self) -> LRUCache:
+        """In-memory get_item bodies filled by prefetch_details"""
+        return self._details
+
     @DBManager.key.setter
     def key(self, key = ""):
-        """Sets api key to key parameter if valid key. Resets key to DEMO_KEY if key is unspecified."""
+        """
+        Sets api key to key parameter. Prompts for a key (default DEMO_KEY) if key is unspecified.
+        Keys not already in the key store are validated by the next request instead of a separate probe;
+        if the API rejects the key, the manager falls back to the default key. A key that needs no
+        validation (the default or a remembered one) becomes the store's last key right away.
+        """
         if key == "":
             key = self.prompt_key()
-        print("Validating...")
-
-        test_url = f"{self.url}/food/534358?api_key={key}" 
-        
-        response = requests.get(test_url)
+        self._key = key
+        self._key_pending = self._needs_validation(key)
+        if self._key_store is not None and not self._key_pending:
+            self._key_store.use(key, trusted=key == self.default_key)
+        if self._owns_limiter and self.rate_limiter is not None:
+            self.rate_limiter.resize(RateLimiter.quota(key))
+
+    def _needs_validation(self, key) -> bool:
+        return key != self.default_key and not (self._key_store is not None and self._key_store.is_valid(key))
+
+    def _get(self, path, params = None, **kwargs):
+        """DBManager._get that validates a newly set key on its first real request"""
+        response = super()._get(path, params, **kwargs)
+        if self._key_pending and params and params.get("api_key") == self._key:
+            if response.status_code in (401, 403):
+                print(f"API key rejected (Error {response.status_code}). Using {self.default_key}.")
+                if self._key_store is not None:
+                    self._key_store.forget(self._key)
+                self.key = self.default_key
+                params = dict(params, api_key=self.default_key)
+                return super()._get(path, params, **kwargs)
+            if response.status_code < 400:
+                self._key_pending = False
+                if self._key_store is not None:
+                    self._key_store.remember(self._key)
+        return response
+
+    def validate_key(self, key) -> bool:
+        """Returns True if the API accepts key (remembered in the key store)"""
+        response = super()._get("/food/534358", {"api_key": key})
         if (response.status_code == 200):
-            self.__key = key
             print(f"Success. Status Code: {response.status_code}")
-        else:
-            print(f"Error. Status Code: {response.status_code}\nURL: {test_url}")
+            if self._key_store is not None:
+                self._key_store.remember(key)
+            return True
+        print(f"Error. Status Code: {response.status_code}\nURL: {response.url}")
+        return False
 
     def create_food_item(self, food_data):
-        """creates a FoodItem object from food central database"""
+        """
+        creates a FoodItem object from food central database
+        Missing optional fields (brandOwner, ingredients, gtinUpc) are left empty, and a Foundation
+        food without a scientificName becomes a plain FoodItem.
+        """
         if type(food_data) != dict:
             print('Invalid food data')
             return
 
-        
-        match food_data["dataType"]:
-            case "Foundation":
-                return FoundationFoodItem(food_data["description"], food_data["foodNutrients"], food_data["scientificName"])
+        description = food_data.get("description") or ""
+        nutrients = normalize_nutrients(food_data.get("foodNutrients") or [])
+        fdc_id = food_data.get("fdcId")
+        match food_data.get("dataType"):
+            case "Foundation" if description and food_data.get("scientificName"):
+                return FoundationFoodItem(description, nutrients, description, food_data["scientificName"], fdc_id=fdc_id)
             case "Branded": 
                 # print(food_data['foodNutrients'])
-                return BrandedFoodItem(food_data["description"], food_data["brandOwner"], food_data["foodNutrients"], food_data["ingredients"], food_data["gtinUpc"])
+                return BrandedFoodItem(description, food_data.get("brandOwner") or "", nutrients, parse_ingredients(food_data.get("ingredients")),
+                                       food_data.get("gtinUpc") or "", fdc_id=fdc_id)
             case _:
-                return FoodItem(food_data["description"], food_data["foodNutrients"])
+                return FoodItem(description, nutrients, fdc_id=fdc_id)
             
 
-    def get_item(self, fdcID):
-        """Given the Food Central Database ID, returns dictionary of details of that item"""
-        request_url = f"{self.url}/food/{fdcID}?api_key={self.key}"
+    @staticmethod
+    def projection_params(abridged = False, nutrients = None) -> dict:
+        """
+        Returns the /food and /foods parameters that trim the payload.
+        abridged: request format=abridged (no portions, label fields, ingredients or update log)
+        nutrients: only return these nutrient numbers (e.g. ANALYZER_NUTRIENTS), at most 25
+        """
+        params = {}
+        if abridged:
+            params["format"] = "abridged"
+        if nutrients:
+            params["nutrients"] = ",".join(str(n) for n in nutrients)
+        return params
+
+    def get_item(self, fdcID, abridged = False, nutrients = None):
+        """
+        Given the Food Central Database ID, returns dictionary of details of that item.
+        abridged / nutrients trim the payload, see projection_params; trimmed records are not
+        indexed, so they do not replace the full records the local indexes hold.
+        """
+        path, params = f"/food/{fdcID}", {"api_key": self.key, **self.projection_params(abridged, nutrients)}
+        body = self._details.get(ResponseCache.make_key(path, params))
+        if body is not None:
+            return json.loads(body)
         print("Retrieving...")
-        response = requests.get(request_url)
+        food = self._get_json(path, params)
+        if isinstance(food, dict) and not self.projection_params(abridged, nutrients):
+            self.ingest([food])
+        return food
+
+    def ingest(self, foods) -> int:
+        """Adds food records to the local search index, barcode, filter and ingredient indexes (if any). Returns the number indexed."""
+        foods = list(foods)
+        if self._terms is not None: #term rows of records whose text changed are rebuilt when next ranked
+            self._terms.discard_changed({food["fdcId"]: hash(food_text(food)) for food in foods
+                                         if isinstance(food, dict) and food.get("fdcId") in self._terms})
+        if self._gtins is not None:
+            self._gtins.add_foods(foods)
+        if self._filters is not None:
+            self._filters.add_foods(foods)
+        if self._ingredients is not None:
+            self._ingredients.add_foods(foods)
+        if self._index is None:
+            return 0
+        if self._fuzzy is not None:
+            self._fuzzy.add_foods(foods)
+        if self._autocomplete is not None:
+            self._autocomplete.add_foods(foods)
+        return self._index.add_many(foods)
+
+    def suggest(self, prefix: str, k = 5) -> list:
+        """Returns up to k (fdcId, label) pairs of indexed foods matching a partly typed name, most popular first"""
+        if self._autocomplete is None or self._index is None:
+            return []
+        return self._autocomplete.suggest(prefix, k)
+
+    def known_food(self, fdc_id):
+        """
+        Returns a FoodItem of an indexed food (e.g. a chosen suggestion) without any request,
+        None if it is not indexed. The choice raises the food in later suggestions.
+        """
+        foods = self._index.get_foods([fdc_id]) if self._index is not None else []
+        if not foods:
+            return None
+        self.choose(fdc_id)
+        return self.create_food_item(foods[0])
+
+    def choose(self, fdc_id):
+        """Records that the user chose a food (a suggestion or a search result), raising it in later suggestions"""
+        if self._autocomplete is not None:
+            self._autocomplete.select(fdc_id)
+
+    def prefetch_details(self, items):
+        """
+        Starts fetching get_item details for the first prefetch_top items on a background pool,
+        so opening one of them is answered from memory. Skipped when the prefetch budget is spent
+        or the rate limiter has no spare token for the user's own requests.
+        Returns the futures of the fetches started.
+        """
+        futures = []
+        for item in items[:self._prefetch_top]:
+            fdc_id = getattr(item, "fdc_id", None)
+            if fdc_id is None:
+                continue
+            path, params = f"/food/{fdc_id}", {"api_key": self.key}
+            cache_key = ResponseCache.make_key(path, params)
+            if cache_key in self._details:
+                continue
+            if self.rate_limiter is not None and self.rate_limiter.tokens < 2:
+                break
+            if self._prefetch_budget is not None and not self._prefetch_budget.try_acquire():
+                break
+            if self._prefetch_pool is None:
+                self._prefetch_pool = ThreadPoolExecutor(max_workers=self._prefetch_workers, thread_name_prefix="fc-prefetch")
+            self.prefetched += 1
+            futures.append(self._prefetch_pool.submit(self._prefetch_one, path, params, cache_key))
+        return futures
+
+    def _prefetch_one(self, path, params, cache_key):
+        """Fetches one detail body (shared with a concurrent get_item) and keeps it in memory"""
+        body = self.single_flight.do(cache_key, self._fetch_body, path, params)
+        if body is not None:
+            self._details.put(cache_key, body)
+
+    def close(self):
+        """Stops the prefetch pool and closes pooled connections"""
+        if self._prefetch_pool is not None:
+            self._prefetch_pool.shutdown(wait=False, cancel_futures=True)
+        super().close()
+
+    def get_items(self, fdcIDs, abridged = False, nutrients = None):
+        """
+        Given a list of Food Central Database IDs, returns a list of FoodItem objects in the same order.
+        IDs are sent to the multi-ID /foods endpoint in chunks of FOODS_BATCH_LIMIT, chunks run concurrently.
+        Positions of IDs the server did not return are None.
+        abridged / nutrients trim the payload, see projection_params (trimmed records are not indexed).
+        """
+        fdcIDs = list(fdcIDs)
+        chunks = [fdcIDs[i:i + FOODS_BATCH_LIMIT] for i in range(0, len(fdcIDs), FOODS_BATCH_LIMIT)]
+        if not chunks:
+            return []
 
-        if response.status_code == 200:
-            food_data = response.json()
-            return food_data
-        else:
-            print(f"Failed to retrieve data. Error {response.status_code}\nURL: {request_url}")
-    
+        print("Retrieving...")
+        found = {}
+        projection = self.projection_params(abridged, nutrients)
+        with ThreadPoolExecutor(max_workers=min(len(chunks), self.pool_maxsize)) as pool:
+            for foods in pool.map(lambda chunk: self._get_foods_chunk(chunk, projection), chunks):
+                for food in foods:
+                    found[str(food.get("fdcId"))] = food
+        if not projection:
+            self.ingest(found.values())
+
+        return [self.create_food_item(found[str(i)]) if str(i) in found else None for i in fdcIDs]
+
+    def _get_foods_chunk(self, chunk, projection = None):
+        """Fetches one chunk of IDs from /foods, returns list of food dictionaries"""
+        params = {"api_key": self.key, "fdcIds": ",".join(str(i) for i in chunk), **(projection or {})}
+        return self._get_json("/foods", params) or []
+
+    def refresh_items(self, fdcIDs, abridged = False, nutrients = None) -> int:
+        """
+        Revalidates the cached get_item records for fdcIDs (e.g. a nightly cache warm-up).
+        Unchanged records cost a 304 with no body and are not re-parsed. Returns the number refreshed.
+        """
+        fdcIDs = list(fdcIDs)
+        if self.cache is None or not fdcIDs:
+            return 0
+        params = {"api_key": self.key, **self.projection_params(abridged, nutrients)}
+        with ThreadPoolExecutor(max_workers=min(len(fdcIDs), self.pool_maxsize)) as pool:
+            return sum(pool.map(lambda fdcID: self.revalidate(f"/food/{fdcID}", params), fdcIDs))
 
     def searchDB(self, query:str, key = 0):
         """Finds food items in FCDB that match search conditions
@@ -76,132 +412,279 @@ class FCManager(DBManager):
         key = 1: Searches by UPC
         
         Returns food item object if one matching search result
-        and returns list of food item objects if multiple matches 
-        """
-        request_url = ""
-
-        if key == 0:
-            query = query.strip().replace(" ", "%20")
-            request_url = f"{self.url}/foods/search?api_key={self.key}&query={query}?"
-        elif key == 1:
-            query = query.strip()
-            if query.isnumeric():
-                request_url = f"{self.url}/foods/search?api_key={self.key}&query={query}" #gtinUPC%3A%20
-            else:
+        and returns RankedResults (a sequence of food item objects, built as they are read) if multiple matches 
+        A UPC search returns the one food with that barcode (UPC-A, EAN-13 or GTIN-14 form), or None.
+        """
+        query = query.strip()
+        search = self._search
+        if key == 1:
+            query = normalize_gtin(query)
+            if query is None:
                 print("Invalid UPC")
                 return
-        print("Retrieving...")
-        response = requests.get(request_url)
-
-        if response.status_code == 200:
-            food_data = response.json()
+            search = self._search_upc
+
+        cache_key = self.search_key(query, key)
+        result = self._search_cache.get(cache_key)
+        if result is None:
+            result = self.single_flight.do(("searchDB",) + cache_key, search, query)
+            if result is not None and not getattr(result, "provisional", False):
+                self._search_cache.put(cache_key, result)
+                if isinstance(result, RankedResults): #items are built after the cache measured the results
+                    result.on_build = lambda item, result=result: self._search_cache.grow(cache_key, result, self._search_cache.sizeof(item))
+        if isinstance(result, RankedResults):
+            if self._prefetch_top > 0:
+                self.prefetch_details(result)
+        return result
+
+    @staticmethod
+    def search_key(query: str, key = 0) -> tuple:
+        """Returns the canonical (query, key mode) pair searchDB results are cached under"""
+        return (" ".join(query.lower().split()), key)
+
+    def invalidate_search(self, query = None, key = 0):
+        """Drops the cached results for one search, or every cached search if query is None"""
+        self._search_cache.invalidate(None if query is None else self.search_key(query, key))
+
+    def _search(self, query: str):
+        """
+        Ranks local index matches, else returns local spellings close to every query word (fuzzy),
+        else runs a search request and ranks its results. When the request finds nothing or fails,
+        looser local spellings are returned; after a failure they are not cached. None if nothing was found.
+        With a filter index, filter phrases are taken out of the query and only foods passing
+        them are ranked or returned; with an ingredient index, so are "contains"/"excludes" clauses.
+        """
+        query, groups = self._split_filters(query)
+        query, clauses = self._split_ingredients(query)
+        if not query:
+            return self._search_ingredients(groups, clauses)
+        local = self._search_local(query, groups, clauses)
+        if local is None:
+            local = self._search_fuzzy(query, groups, clauses, self._fuzzy_word_similarity)
+        if local is not None:
+            return local
 
-            if food_data['totalHits'] == 0:
+        print("Retrieving...")
+        food_data = self._get_json("/foods/search", {"api_key": self.key, "query": query}) #gtinUPC%3A%20
+
+        if food_data is None:
+            fallback = self._search_fuzzy(query, groups, clauses)
+            if fallback is not None:
+                fallback.provisional = True #not cached, so the next search asks the API again
+            return fallback
+
+        foodlist = food_data.get("foods", [])
+        self.ingest(foodlist)
+        hits = food_data['totalHits']
+        if groups or clauses:
+            kept = set(self._keep([food.get("fdcId") for food in foodlist], groups, clauses))
+            foodlist = [food for food in foodlist if food.get("fdcId") in kept]
+            hits = len(foodlist)
+        if hits == 0:
+            fallback = self._search_fuzzy(query, groups, clauses)
+            if fallback is None:
                 print("Food item not found")
-            elif food_data['totalHits'] == 1:
-                # print(food_data['foods'][0]['description'])
-                return self.create_food_item(food_data['foods'][0])
-            elif food_data['totalHits'] > 1:
-                foodlist = []
-                for i in range(len(food_data['foods'])):
-                    foodlist.append(food_data['foods'][i])
-                #print(food_data)
-
-                return self.get_relevant(query, foodlist)
-        else:
-            print(f"Failed to retrieve data. Error {response.status_code}\nURL: {request_url}")
-            # print(response.text)
-        
+            return fallback
+        elif hits == 1:
+            # print(food_data['foods'][0]['description'])
+            return self.create_food_item(foodlist[0])
+        elif hits > 1:
+            return self.get_relevant(query, foodlist)
+
+    def _split_filters(self, query: str) -> tuple:
+        """Returns (query text, filter groups); no groups without a filter index or when only filter words were typed"""
+        if self._filters is None:
+            return query, []
+        text, groups = split_filters(query)
+        return (text, groups) if text else (query, [])
+
+    def _split_ingredients(self, query: str) -> tuple:
+        """
+        Returns (query text, clauses): clauses are the (includes, excludes) items of the query's ingredient
+        clauses, None without any or an ingredient index. Clauses alone leave no text only when the
+        local index can answer them.
+        """
+        if self._ingredients is None:
+            return query, None
+        text, includes, excludes = split_ingredient_clauses(query)
+        if not includes and not excludes or (not text and self._index is None):
+            return query, None
+        return text, (includes, excludes)
+
+    def _keep(self, fdc_ids, groups = (), clauses = None) -> list:
+        """Returns the fdcIds (in their order) that pass the filter groups and ingredient clauses of a search"""
+        if groups:
+            fdc_ids = self._filters.keep(fdc_ids, groups)
+        if clauses is not None:
+            fdc_ids = self._ingredients.keep(fdc_ids, *clauses)
+        return list(fdc_ids)
+
+    def _search_ingredients(self, groups, clauses):
+        """Answers a search of ingredient clauses alone ("contains peanut") from the ingredient and local indexes"""
+        fdc_ids = self._ingredients.query(*clauses)
+        foods = self._index.get_foods(self._keep(fdc_ids, groups)[:INDEX_SEARCH_LIMIT])
+        if not foods:
+            print("Food item not found")
+            return None
+        if len(foods) == 1:
+            return self.create_food_item(foods[0])
+        return RankedResults(foods, self.create_food_item)
+
+    def _search_upc(self, gtin: str):
+        """
+        Returns the food with a normalized GTIN: a barcode index hit is answered from the local
+        index (or one /food request), otherwise a search request is filtered to the exact barcode.
+        """
+        fdc_id = self._gtins.lookup(gtin) if self._gtins is not None else None
+        if fdc_id is not None:
+            foods = self._index.get_foods([fdc_id]) if self._index is not None else []
+            food = foods[0] if foods else self.get_item(fdc_id)
+            if food is not None:
+                return self.create_food_item(food)
 
+        print("Retrieving...")
+        food_data = self._get_json("/foods/search", {"api_key": self.key, "query": short_gtin(gtin)})
+        if food_data is None:
+            return None
+        self.ingest(food_data.get("foods", []))
+        for food in food_data.get("foods", []):
+            if normalize_gtin(food.get("gtinUpc") or "") == gtin:
+                return self.create_food_item(food)
+        print("Food item not found")
+        return None
+
+    def _search_local(self, query: str, groups = (), clauses = None):
+        """
+        Answers a search from the local index, None if it has fewer than index_min_hits matches.
+        With filter groups or ingredient clauses, matches failing them are dropped before their records are read.
+        """
+        if self._index is None:
+            return None
+        if groups or clauses:
+            foods = self._index.get_foods(self._keep(self._index.search_ids(query), groups, clauses)[:INDEX_SEARCH_LIMIT])
+        else:
+            foods = self._index.search(query, limit=INDEX_SEARCH_LIMIT)
+        if len(foods) < self._index_min_hits:
+            return None
+        if len(foods) == 1:
+            return self.create_food_item(foods[0])
+        return self.get_relevant(query, foods)
+
+    def _search_fuzzy(self, query: str, groups = (), clauses = None, word_similarity_min = None):
+        """
+        Answers a misspelled keyword search from the trigram index, None without a close enough match.
+        With word_similarity_min, only foods that close to every query word are kept (see word_similarity).
+        """
+        if self._fuzzy is None or self._index is None or query.isnumeric():
+            return None
+        fdc_ids = self._fuzzy.search_ids(query, FUZZY_SEARCH_LIMIT, self._fuzzy_min_similarity)
+        foods = self._index.get_foods(self._keep(fdc_ids, groups, clauses))
+        if word_similarity_min is not None:
+            foods = [food for food in foods if word_similarity(query, fuzzy_text(food)) >= word_similarity_min]
+        if not foods:
+            return None
+        if len(foods) == 1:
+            return self.create_food_item(foods[0])
+        return RankedResults(foods, self.create_food_item) #closest spelling first
+
+    def iter_search(self, query: str, page_size = 50, max_pages = None):
+        """
+        Yields a FoodItem for every keyword search result, walking pageNumber lazily.
+        While the caller consumes one page, the next is fetched on a background thread,
+        so at most two pages are held in memory.
+        Results come in server order (no re-ranking).
+        """
+        query = query.strip()
+        pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fc-page")
+        try:
+            page_number = 1
+            future = pool.submit(self._search_page, query, page_number, page_size)
+            while future is not None:
+                food_data = future.result()
+                if not food_data or not food_data.get("foods"):
+                    return
+                future = None
+                if page_number < food_data.get("totalPages", page_number) and (max_pages is None or page_number < max_pages):
+                    page_number += 1
+                    future = pool.submit(self._search_page, query, page_number, page_size)
+                for food in food_data["foods"]:
+                    yield self.create_food_item(food)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def stream_search(self, query: str, page_size = None, meta = None):
+        """
+        Yields a FoodItem for each keyword search result while the response is still downloading.
+        The foods array is decoded one record at a time, so memory tracks a single food, not the page.
+        meta (dict): optional, filled with the other response fields (totalHits, totalPages...).
+        Streamed responses bypass the response cache and request coalescing.
+        A failed request (or a connection lost mid-stream) is printed and ends the results.
+        """
+        params = {"api_key": self.key, "query": query.strip()}
+        if page_size is not None:
+            params["pageSize"] = page_size
+        print("Retrieving...")
+        try:
+            response = self._get("/foods/search", params, stream=True)
+        except requests.RequestException as e:
+            print(f"Failed to retrieve data. {e}")
+            return
+        batch = []
+        try:
+            if response.status_code != 200:
+                print(f"Failed to retrieve data. Error {response.status_code}\nURL: {response.url}")
+                return
+            for food in iter_array_items(response.iter_content(chunk_size=64 * 1024), "foods", meta):
+                batch.append(food)
+                if len(batch) >= INGEST_BATCH:
+                    self.ingest(batch)
+                    batch = []
+                yield self.create_food_item(food)
+        except requests.RequestException as e:
+            print(f"Failed to retrieve data. {e}")
+        finally:
+            self.ingest(batch)
+            response.close()
+
+    def _search_page(self, query: str, page_number: int, page_size: int):
+        """Returns one page of keyword search results as a dictionary"""
+        food_data = self._get_json("/foods/search", {"api_key": self.key, "query": query,
+                                                     "pageNumber": page_number, "pageSize": page_size})
+        if food_data:
+            self.ingest(food_data.get("foods", []))
+        return food_data
 
     def get_relevant(self, query, results):
-        """Returns 100 most relevant using TF-IDF for the list of food dictionaries"""
-        docs = []
-        i = 0
-        limit = 3
-        for val in results: #adds all results to a list as a string of relevant text 
-            
-            # if i>limit: #limiting number of search results processed
-            #     break
-            docRepr = ""
-            if 'description' in val:
-                docRepr += str(val['description'])
-            if 'ingredients' in val:
-                docRepr += str(val['ingredients'])
-            if 'brandedFoodCategory' in val:
-                docRepr +=str(val['brandedFoodCategory'])
-            if 'brandOwner' in val:
-                docRepr += str(val['brandOwner'])
-            # print(f"$$$ {docRepr}")
-            docs.append(docRepr)
-            results[i]['relScore'] = self.computeTFIDF(docRepr,query)
-            # print(results[i]['relScore'])
-            i +=1
-        # for val in results:
-        # print(val.keys())
-        results = sorted(results, key = lambda x: x.get('relScore', 0))
-        # print(results[0].get('relScore'))
-        # print(results[-1].get('relScore'))
-        
-        ranked = []
-        i = 0
-        for val in results:
-            if i >= 100:
-                break
-            # print("Score: " + str(val['relScore']))
-            temp_food = self.create_food_item(val)
-            # print("Created: " + str(temp_food))
-            ranked.append(temp_food)
-            i += 1
-
-
-        return ranked
-
-        
-        
-            
-
-
-    def tokenize(self, text:str):
-        stop_sym = [".",",","(",")"]
-        stop_words = ["the", "in", "a"]
-        for sym in stop_sym: 
-            text.replace(sym , " ")
-        tokens = text.lower().split()
-
-        
-        filtered_tokens = [word for word in tokens if word not in stop_words]
-        
-        filteredText = ""
-        for val in filtered_tokens:
-            filteredText +=val + " "
-        # print(filteredText)
-        return filteredText
-    
-    def computeTFIDF(self, text, query:str):
-        """Returns term frequency of text"""
-        # query = self.tokenize(query)
-        qwords = query.split()
-
-        text = self.tokenize(text)
-        twords = text.split()
-        
-        tfDict = {}
-        for val in twords:
-            if val in tfDict:
-                tfDict[val] +=1
-            else:
-                tfDict[val] = 0
-        
-        tfidfs = {}
-        for val in qwords:
-            if val in tfDict:
-                tfidfs[val] = tfDict[val]/len(text)
-        
-        score = 0
-        for val in tfidfs:
-            score += tfidfs[val]
-        return score
+        """
+        Returns the RELEVANT_LIMIT most relevant foods of a list of food dictionaries, best first,
+        as RankedResults: FoodItems are only built for the foods the caller reads.
+        Foods are scored with BM25 against the corpus statistics (the index's, or the foods
+        ranked so far) and each dictionary gets its score as 'relScore'.
+        With numpy and scipy, VECTOR_MIN_DOCS or more results are scored with one sparse
+        matrix product over their TermMatrix rows; foods ranked before are not re-tokenized.
+        """
+        ids = [val["fdcId"] if "fdcId" in val else food_text(val) for val in results]
+        query_tokens = self._analyzer.tokens(query)
+        if self._terms is not None and len(results) >= VECTOR_MIN_DOCS:
+            for val, doc_id in zip(results, ids):
+                if doc_id not in self._terms:
+                    self._terms.add(doc_id, self._analyzer.food_tokens(val), hash(food_text(val)))
+            docs = dict(zip(ids, results)) #rows discarded by a concurrent ingest are added again from these
+            scores = self._ranker.score_matrix(query_tokens, self._terms, ids, lambda doc_id: self._analyzer.food_tokens(docs[doc_id])).tolist()
+        else:
+            docs = [self._analyzer.food_tokens(val) for val in results]
+            if self._index is None: #the index already counted everything it holds
+                for doc_id, doc in zip(ids, docs):
+                    self._ranker.stats.add(doc_id, doc)
+            scores = self._ranker.score_many(query_tokens, docs)
+
+        for val, score in zip(results, scores):
+            val['relScore'] = score
+        return RankedResults([results[i] for i in top_k(scores, RELEVANT_LIMIT)], self.create_food_item)
+
+    def tokenize(self, text:str) -> list:
+        """Returns the tokens of text as searches and ranking see them (folded, stop words removed, stemmed)"""
+        return list(self._analyzer.tokens(text))
 
     def prompt_key(self) -> str:
         """Prompts user for api key or returns default key"""
@@ -0,0 +1,124 @@
+"""
+gtin_index.py
+GTIN (UPC-A / EAN-13 / GTIN-14) normalization and a persistent barcode -> fdcId index.
+"""
+
+import sqlite3
+import threading
+
+
+GTIN_LENGTH = 14
+MIN_LENGTH = 8 #EAN-8, the shortest GTIN
+
+
+def check_digit(body: str) -> int:
+    """Returns the GS1 check digit for the digits before it (weights 3, 1, 3... from the right)"""
+    total = sum(int(d) * (3 if i % 2 == 0 else 1) for i, d in enumerate(reversed(body)))
+    return (10 - total % 10) % 10
+
+
+def normalize_gtin(code) -> str | None:
+    """
+    Returns code as a 14-digit GTIN, or None if it is not a valid barcode.
+    UPC-A, EAN-13 and GTIN-14 forms of one product (and extra leading zeros) give the same
+    value: "012345678905", "0012345678905" and "00012345678905" -> "00012345678905".
+    Spaces and dashes are ignored; the last digit must be the check digit.
+    """
+    digits = "".join(ch for ch in str(code) if ch not in " -")
+    if not digits.isdigit() or len(digits) < MIN_LENGTH:
+        return None
+    gtin = digits.lstrip("0").rjust(GTIN_LENGTH, "0")
+    if len(gtin) != GTIN_LENGTH or not gtin.strip("0") or check_digit(gtin[:-1]) != int(gtin[-1]):
+        return None
+    return gtin
+
+
+def short_gtin(gtin: str) -> str:
+    """Returns the shortest standard form of a 14-digit GTIN (UPC-A, EAN-13, else GTIN-14)"""
+    if gtin.startswith("00"):
+        return gtin[2:]
+    if gtin.startswith("0"):
+        return gtin[1:]
+    return gtin
+
+
+class GtinIndex:
+    """
+    Persistent map from normalized GTIN to fdcId.
+
+    Entries are written through to SQLite and mirrored in a dict loaded at open,
+    so a lookup is one hash probe. Records without a valid gtinUpc are skipped.
+    """
+
+    def __init__(self, path = "gtin_index.db"):
+        """
+        Args:
+            path (str): SQLite database file (":memory:" for a throwaway index).
+        """
+        self._path = path
+        self._lock = threading.Lock()
+        self.hits = 0 #lookups of a known barcode
+        self.misses = 0 #lookups of an unknown or invalid barcode
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS gtins (gtin TEXT PRIMARY KEY, fdc_id INTEGER NOT NULL) WITHOUT ROWID")
+        self._conn.commit()
+        self._map = dict(self._conn.execute("SELECT gtin, fdc_id FROM gtins"))
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    def add(self, code, fdc_id) -> bool:
+        """Maps a barcode to fdc_id. Returns False if code is not a valid GTIN."""
+        gtin = normalize_gtin(code)
+        if gtin is None:
+            return False
+        self._write([(gtin, fdc_id)])
+        return True
+
+    def add_foods(self, foods) -> int:
+        """Maps the gtinUpc of every branded record in foods to its fdcId. Returns the number mapped."""
+        rows = []
+        for food in foods:
+            if not isinstance(food, dict) or food.get("fdcId") is None or not food.get("gtinUpc"):
+                continue
+            gtin = normalize_gtin(food["gtinUpc"])
+            if gtin is not None:
+                rows.append((gtin, food["fdcId"]))
+        self._write(rows)
+        return len(rows)
+
+    def _write(self, rows):
+        rows = [(gtin, fdc_id) for gtin, fdc_id in rows if self._map.get(gtin) != fdc_id]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO gtins (gtin, fdc_id) VALUES (?, ?)", rows)
+            self._conn.commit()
+            self._map.update(rows)
+
+    def lookup(self, code):
+        """Returns the fdcId of a barcode in any of its forms, None if unknown or invalid"""
+        fdc_id = self._map.get(normalize_gtin(code))
+        if fdc_id is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return fdc_id
+
+    def close(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+
+    def __contains__(self, code):
+        return normalize_gtin(code) in self._map
+
+    def __len__(self):
+        return len(self._map)
+
+    def __repr__(self):
+        return f"GtinIndex(path={self._path!r}, gtins={len(self._map)})"
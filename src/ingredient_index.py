@@ -0,0 +1,345 @@
+"""
+ingredient_index.py
+Parses FDC ingredient statements into normalized ingredient names, maps them to allergens through
+synonym lists, and keeps a persistent inverted index answering "contains peanut" or
+"excludes soy and dairy" across the local catalog.
+"""
+
+import hashlib
+import re
+import sqlite3
+import threading
+
+from text_analyzer import TOKEN_RE, fold, light_stem
+
+
+#"CONTAINS 2% OR LESS OF:", "LESS THAN 2% OF EACH OF THE FOLLOWING:", "2.5%", "INGREDIENTS:"
+QUALIFIER_RE = re.compile(r"\b(?:contains\s+)?(?:(?:less than|not more than)\s+)?\d+(?:\.\d+)?\s*%(?:\s+or less)?(?:\s+of)?"
+                          r"(?:\s+each)?(?:\s+of)?(?:\s+the following)?\s*:?|\bingredients?\s*:|\bcontains\s*:|\band/or\b")
+SEPARATOR_RE = re.compile(r"[,;:()\[\]{}]|\.(?=\s|$)") #a period ends an item unless it is a decimal point
+FUNCTION_RE = re.compile(r"^(?:to|for|as)\s") #"(to preserve freshness)", "(for color)"
+CONJUNCTION_RE = re.compile(r"^(?:and|or|an?)\s+") #"..., AND SALT", "(AN EMULSIFIER)"
+
+#allergen -> ingredient words and phrases that declare it
+ALLERGENS = {
+    "peanut": ("peanut", "groundnut", "arachis"),
+    "tree nut": ("almond", "cashew", "walnut", "pecan", "hazelnut", "filbert", "pistachio", "macadamia", "brazil nut",
+                 "pine nut", "praline", "marzipan"),
+    "milk": ("milk", "milkfat", "butterfat", "cream", "butter", "buttermilk", "cheese", "whey", "casein", "caseinate", "lactose",
+             "lactalbumin", "yogurt", "ghee", "curd", "kefir", "paneer"),
+    "egg": ("egg", "albumin", "ovalbumin", "lysozyme", "mayonnaise", "meringue"),
+    "soy": ("soy", "soya", "soybean", "edamame", "tofu", "tempeh", "miso"),
+    "wheat": ("wheat", "semolina", "durum", "spelt", "farina", "bulgur", "couscous", "seitan", "graham", "einkorn", "emmer",
+              "kamut", "farro"),
+    "gluten": ("gluten", "wheat", "semolina", "durum", "spelt", "farina", "bulgur", "couscous", "seitan", "graham", "einkorn",
+               "emmer", "kamut", "farro", "barley", "rye", "malt", "triticale"),
+    "fish": ("fish", "anchovy", "tuna", "salmon", "cod", "tilapia", "sardine", "pollock", "haddock", "trout", "mackerel"),
+    "shellfish": ("shrimp", "prawn", "crab", "lobster", "crayfish", "oyster", "clam", "mussel", "scallop"),
+    "sesame": ("sesame", "tahini"),
+}
+#names a query may use for an allergen
+ALLERGEN_ALIASES = {"dairy": "milk", "nut": "tree nut", "tree nut": "tree nut", "soya": "soy", "seafood": "shellfish"}
+#a synonym right after one of these names a plant product ("coconut milk", "cocoa butter", "rice malt")
+PLANT_QUALIFIERS = frozenset(("coconut", "almond", "soy", "oat", "rice", "cashew", "peanut", "cocoa", "cacao", "shea",
+                              "nut", "seed", "sunflower", "apple", "hemp"))
+NOT_ALLERGENS = ("cream of tartar",) #ingredient names that contain a synonym but declare no allergen
+
+CLAUSE_RE = re.compile(r"\b(contains|containing|excludes|excluding|without|free of)\b")
+INCLUDE_WORDS = ("contains", "containing")
+ITEM_SEPARATOR_RE = re.compile(r",|&|\band\b")
+
+
+def words(text: str) -> list:
+    """Returns the folded, singular words of text ("Roasted Peanuts" -> ["roasted", "peanut"])"""
+    return [light_stem(word) for word in TOKEN_RE.findall(fold(text))]
+
+
+_WORD_ALLERGENS = {} #one-word synonym -> allergens
+_PHRASES = [] #(allergen, words) of longer synonyms
+for _allergen, _synonyms in ALLERGENS.items():
+    for _synonym in map(tuple, map(words, _synonyms)):
+        if len(_synonym) == 1:
+            _WORD_ALLERGENS.setdefault(_synonym[0], set()).add(_allergen)
+        else:
+            _PHRASES.append((_allergen, _synonym))
+
+
+def parse_ingredients(text: str) -> list:
+    """
+    Returns the ingredient names of an FDC ingredient statement, sub-ingredients included, folded
+    to lower case without punctuation, in order and without repeats:
+    "ENRICHED FLOUR (WHEAT FLOUR, NIACIN), SUGAR, CONTAINS 2% OR LESS OF: SALT."
+    -> ["enriched flour", "wheat flour", "niacin", "sugar", "salt"]
+    """
+    names = []
+    for piece in SEPARATOR_RE.split(QUALIFIER_RE.sub(",", fold(text or ""))):
+        name = CONJUNCTION_RE.sub("", " ".join(TOKEN_RE.findall(piece)))
+        if name and not FUNCTION_RE.match(name):
+            names.append(name)
+    return list(dict.fromkeys(names))
+
+
+def food_ingredients(food: dict) -> list:
+    """
+    Returns the parsed ingredients of a food record. Foundation and SR foods have no ingredient
+    statement but name their one ingredient ("Apples, raw"), so their description is used;
+    a branded food without ingredients has none.
+    """
+    if food.get("ingredients"):
+        return parse_ingredients(food["ingredients"])
+    if food.get("dataType") != "Branded" and food.get("description"):
+        return [" ".join(TOKEN_RE.findall(fold(food["description"])))]
+    return []
+
+
+def ingredient_allergens(ingredient: str) -> set:
+    """Returns the allergens an ingredient name declares ("whey protein" -> {"milk"}, "coconut milk" -> set())"""
+    if ingredient in NOT_ALLERGENS:
+        return set()
+    ingredient_words = words(ingredient)
+    found = set()
+    for i, word in enumerate(ingredient_words):
+        if word in _WORD_ALLERGENS and (i == 0 or ingredient_words[i - 1] not in PLANT_QUALIFIERS):
+            found.update(_WORD_ALLERGENS[word])
+    for allergen, phrase in _PHRASES:
+        n = len(phrase)
+        if any(tuple(ingredient_words[i:i + n]) == phrase for i in range(len(ingredient_words) - n + 1)):
+            found.add(allergen)
+    return found
+
+
+def food_allergens(food: dict) -> set:
+    """Returns the allergens declared by any ingredient of a food record"""
+    return set().union(*map(ingredient_allergens, food_ingredients(food)))
+
+
+def resolve(item: str) -> list:
+    """
+    Returns the index terms an item of an ingredient query must all match: one allergen term
+    for an allergen or its alias ("dairy" -> ["allergen:milk"]), else the item's words.
+    """
+    key = " ".join(words(item))
+    allergen = ALLERGEN_ALIASES.get(key, key)
+    if allergen in ALLERGENS:
+        return [f"allergen:{allergen}"]
+    return words(item)
+
+
+def split_ingredient_clauses(query: str) -> tuple:
+    """
+    Returns (text, includes, excludes): the query before its ingredient clauses, and the items
+    of its "contains"/"excludes" (or "without", "free of") clauses.
+    "chocolate bar contains peanut excludes soy and dairy" -> ("chocolate bar", ["peanut"], ["soy", "dairy"])
+    """
+    parts = CLAUSE_RE.split(" ".join(query.lower().split()))
+    includes, excludes = [], []
+    for keyword, clause in zip(parts[1::2], parts[2::2]):
+        items = [" ".join(item.split()) for item in ITEM_SEPARATOR_RE.split(clause)]
+        (includes if keyword in INCLUDE_WORDS else excludes).extend(item for item in items if item)
+    return parts[0].strip(), includes, excludes
+
+
+def food_terms(food: dict) -> set:
+    """Returns the index terms of a food: the words of its ingredients and an allergen term per declared allergen"""
+    ingredients = food_ingredients(food)
+    terms = {word for ingredient in ingredients for word in words(ingredient)}
+    terms.update(f"allergen:{allergen}" for ingredient in ingredients for allergen in ingredient_allergens(ingredient))
+    return terms
+
+
+class IngredientIndex:
+    """
+    SQLite inverted index from ingredient words and allergens to the foods declaring them.
+
+    A food is indexed under every word of its parsed ingredients and under "allergen:<name>"
+    for each allergen its ingredients declare, so a query reads one posting list per term
+    instead of parsing product text. Only foods with a known ingredient list are in the
+    catalog "excludes" queries are answered from; a food without one is neither.
+    """
+
+    def __init__(self, path = "ingredient_index.db"):
+        """
+        Args:
+            path (str): SQLite database file (":memory:" for a throwaway index).
+                Postings built with different allergen lists are discarded on open.
+        """
+        self._path = path
+        self._lock = threading.Lock()
+        self.hits = 0 #queries matching at least one food
+        self.misses = 0
+        self._loaded = threading.Event()
+        self._loaded.set()
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS foods (fdc_id INTEGER PRIMARY KEY)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS postings (term TEXT NOT NULL, fdc_id INTEGER NOT NULL, "
+                           "PRIMARY KEY (term, fdc_id)) WITHOUT ROWID")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS postings_food ON postings (fdc_id)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        built_for = self._conn.execute("SELECT value FROM meta WHERE key = 'allergens'").fetchone()
+        if built_for is None or built_for[0] != self.signature():
+            self._conn.execute("DELETE FROM foods")
+            self._conn.execute("DELETE FROM postings")
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('allergens', ?)", (self.signature(),))
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM foods").fetchone()[0]
+
+    @classmethod
+    def from_food_index(cls, index, path = "ingredient_index.db", batch = 5000, background = False):
+        """
+        Returns an IngredientIndex covering every food stored in a FoodIndex, parsing only foods not
+        indexed before. With background, it is returned at once and filled by a daemon thread;
+        queries wait for the fill to finish.
+        """
+        ingredient_index = cls(path)
+        if background:
+            ingredient_index._loaded.clear()
+            threading.Thread(target=ingredient_index._fill, args=(index, batch), name="ingredient-load", daemon=True).start()
+        else:
+            ingredient_index._fill(index, batch)
+        return ingredient_index
+
+    def _fill(self, index, batch = 5000):
+        """Indexes the stored foods not indexed before or meanwhile (those are newer), then marks the index loaded"""
+        try:
+            with self._lock:
+                known = {fdc_id for fdc_id, in self._conn.execute("SELECT fdc_id FROM foods")}
+            missing = [fdc_id for fdc_id, in index.field_values() if fdc_id not in known]
+            for i in range(0, len(missing), batch):
+                self.add_foods(index.get_foods(missing[i:i + batch]), replace=False)
+        finally:
+            self._loaded.set()
+
+    def wait_loaded(self, timeout = None) -> bool:
+        """Blocks until a background load is done. Returns False on timeout."""
+        return self._loaded.wait(timeout)
+
+    @staticmethod
+    def signature() -> str:
+        """Describes the parser's allergen lists and stemmer, so postings built with others are rebuilt"""
+        text = repr((sorted(ALLERGENS.items()), sorted(PLANT_QUALIFIERS), NOT_ALLERGENS, light_stem.version))
+        return hashlib.sha1(text.encode()).hexdigest()[:12]
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    def add_foods(self, foods, replace = True) -> int:
+        """
+        Indexes the ingredients of food records, replacing older copies (unless replace is False,
+        which skips foods already in the catalog). A record without ingredients drops the food
+        from the index. Returns the number indexed.
+        """
+        latest = {}
+        for food in foods:
+            if isinstance(food, dict) and food.get("fdcId") is not None:
+                latest[food["fdcId"]] = food_terms(food)
+        if not latest:
+            return 0
+        with self._lock:
+            if not replace:
+                for fdc_id in self._known(list(latest)):
+                    del latest[fdc_id]
+            indexed = {fdc_id: terms for fdc_id, terms in latest.items() if terms}
+            self._conn.executemany("DELETE FROM postings WHERE fdc_id = ?", [(fdc_id,) for fdc_id in latest])
+            self._conn.executemany("DELETE FROM foods WHERE fdc_id = ?", [(fdc_id,) for fdc_id in latest if fdc_id not in indexed])
+            self._conn.executemany("INSERT OR IGNORE INTO foods (fdc_id) VALUES (?)", [(fdc_id,) for fdc_id in indexed])
+            self._conn.executemany("INSERT INTO postings (term, fdc_id) VALUES (?, ?)",
+                                   [(term, fdc_id) for fdc_id, terms in indexed.items() for term in terms])
+            self._conn.commit()
+            self._size = self._conn.execute("SELECT COUNT(*) FROM foods").fetchone()[0]
+        return len(indexed)
+
+    def _known(self, fdc_ids) -> set:
+        """Returns the fdc_ids in the catalog. Caller holds the lock."""
+        known = set()
+        for i in range(0, len(fdc_ids), 500):
+            chunk = fdc_ids[i:i + 500]
+            known.update(row[0] for row in self._conn.execute(f"SELECT fdc_id FROM foods WHERE fdc_id IN ({','.join('?' * len(chunk))})", chunk))
+        return known
+
+    @staticmethod
+    def _where(includes, excludes, probe = False) -> tuple:
+        """
+        Returns the SQL conditions (and their arguments) on foods.fdc_id for the items of a query:
+        membership in the foods read from the items' posting lists, or with probe, one primary key
+        lookup per food and term (cheaper when only a few foods are tested).
+        """
+        conditions, args = [], []
+        for items, negate in ((includes, ""), (excludes, "NOT ")):
+            for item in items:
+                terms = sorted(set(resolve(item)))
+                if not terms:
+                    continue
+                if probe:
+                    exists = " AND ".join(["EXISTS (SELECT 1 FROM postings WHERE term = ? AND postings.fdc_id = foods.fdc_id)"] * len(terms))
+                    conditions.append(f"{negate}({exists})")
+                    args.extend(terms)
+                else:
+                    conditions.append(f"fdc_id {negate}IN (SELECT fdc_id FROM postings WHERE term IN ({','.join('?' * len(terms))}) "
+                                      "GROUP BY fdc_id HAVING COUNT(*) = ?)")
+                    args.extend(terms + [len(terms)])
+        return conditions, args
+
+    def query(self, includes = (), excludes = (), limit = None) -> list:
+        """
+        Returns the fdcIds, ascending, of catalog foods whose ingredients contain every include
+        item and none of the exclude items. An item is an allergen ("peanut", "dairy") or
+        ingredient words ("palm oil": every word must occur).
+        """
+        conditions, args = self._where(includes, excludes)
+        sql = "SELECT fdc_id FROM foods" + (" WHERE " + " AND ".join(conditions) if conditions else "") + " ORDER BY fdc_id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(limit)
+        self._loaded.wait()
+        with self._lock:
+            ids = [row[0] for row in self._conn.execute(sql, args)]
+            if ids:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return ids
+
+    def search(self, query: str, limit = None) -> list:
+        """Answers a query such as "contains peanut" or "excludes soy and dairy" (see query)"""
+        _, includes, excludes = split_ingredient_clauses(query)
+        return self.query(includes, excludes, limit)
+
+    def keep(self, fdc_ids, includes = (), excludes = ()) -> list:
+        """Returns the fdcIds (in their order) of catalog foods among fdc_ids that satisfy the items"""
+        fdc_ids = list(fdc_ids)
+        if not includes and not excludes:
+            return fdc_ids
+        conditions, args = self._where(includes, excludes, probe=True)
+        kept = set()
+        self._loaded.wait()
+        with self._lock:
+            for i in range(0, len(fdc_ids), 500):
+                chunk = fdc_ids[i:i + 500]
+                sql = f"SELECT fdc_id FROM foods WHERE fdc_id IN ({','.join('?' * len(chunk))})"
+                kept.update(row[0] for row in self._conn.execute(" AND ".join([sql] + conditions), chunk + args))
+        return [fdc_id for fdc_id in fdc_ids if fdc_id in kept]
+
+    def terms(self, fdc_id) -> set:
+        """Returns the index terms of a food (empty if it is not in the catalog)"""
+        self._loaded.wait()
+        with self._lock:
+            return {row[0] for row in self._conn.execute("SELECT term FROM postings WHERE fdc_id = ?", (fdc_id,))}
+
+    def close(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+
+    def __contains__(self, fdc_id):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM foods WHERE fdc_id = ?", (fdc_id,)).fetchone() is not None
+
+    def __len__(self):
+        return self._size
+
+    def __repr__(self):
+        return f"IngredientIndex(path={self._path!r}, foods={self._size})"
@@ -0,0 +1,116 @@
+"""
+json_stream.py
+Incremental decoding of one array inside a large JSON object.
+"""
+
+import codecs
+import json
+
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+_NUMBER_END = ",]}" + _WHITESPACE
+
+
+class _TextReader:
+    """Text buffer over an iterator of byte chunks, refilled on demand and trimmed as values are consumed"""
+
+    COMPACT_AT = 64 * 1024
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """Appends the next chunk of decoded text, returns False at end of input"""
+        for chunk in self._chunks:
+            text = self._utf8.decode(chunk)
+            if text:
+                if self.pos >= self.COMPACT_AT:
+                    self.text = self.text[self.pos:]
+                    self.pos = 0
+                self.text += text
+                return True
+        self.eof = True
+        return False
+
+    def peek(self) -> str:
+        """Skips whitespace and returns the next character without consuming it"""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                raise ValueError("Unexpected end of JSON input")
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos}")
+        self.pos += 1
+
+    def value(self):
+        """
+        Decodes and consumes the JSON value at pos with the C scanner, reading more input
+        while the value is incomplete (or ends exactly at the buffer end, e.g. a cut number).
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            if self._maybe_cut(value, end) and not self.eof and self.fill():
+                continue
+            self.pos = end
+            return value
+
+    def _maybe_cut(self, value, end: int) -> bool:
+        """True if value may continue past the buffered text (it ends the buffer, or a number stops mid-token like "3.")"""
+        if end == len(self.text):
+            return True
+        return isinstance(value, (int, float)) and not isinstance(value, bool) and self.text[end] not in _NUMBER_END
+
+
+def iter_array_items(chunks, key: str, meta = None):
+    """
+    Yields each element of the array stored under key in a top-level JSON object,
+    decoding elements one at a time as the byte chunks arrive.
+
+    Args:
+        chunks: iterable of bytes, e.g. response.iter_content(65536).
+        key (str): name of the top-level field holding the array, e.g. "foods".
+        meta (dict): optional, filled with the other top-level fields as they are passed.
+    """
+    reader = _TextReader(chunks)
+    reader.expect("{")
+    while True:
+        char = reader.peek()
+        if char == "}":
+            return
+        if char == ",":
+            reader.pos += 1
+            continue
+        name = reader.value()
+        reader.expect(":")
+
+        if name == key and reader.peek() == "[":
+            reader.pos += 1
+            while True:
+                char = reader.peek()
+                if char == "]":
+                    reader.pos += 1
+                    break
+                if char == ",":
+                    reader.pos += 1
+                    continue
+                yield reader.value()
+        else:
+            value = reader.value()
+            if meta is not None:
+                meta[name] = value
@@ -0,0 +1,91 @@
+"""
+key_store.py
+Remembers validated API keys on disk so they are not re-validated every launch.
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+
+
+class KeyStore:
+    """
+    JSON file of API keys that an API has accepted, each with an expiry time.
+    The file is written with owner-only permissions since it holds secrets.
+    """
+
+    def __init__(self, path = "api_keys.json", ttl = 30 * 24 * 3600):
+        """
+        Args:
+            path (str): File the keys are stored in.
+            ttl (float): Seconds a validated key is trusted before it must be validated again.
+        """
+        self._path = Path(path)
+        self._ttl = ttl
+        self._data = self._load()
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    @property
+    def ttl(self) -> float:
+        return self._ttl
+
+    def _load(self) -> dict:
+        if not self._path.exists():
+            return {"last": None, "keys": {}, "trusted": []}
+        try:
+            with open(self._path, "r") as file:
+                data = json.load(file)
+        except (json.JSONDecodeError, OSError):
+            return {"last": None, "keys": {}, "trusted": []}
+        data.setdefault("last", None)
+        data.setdefault("keys", {})
+        data.setdefault("trusted", [])
+        return data
+
+    def _save(self):
+        fd = os.open(self._path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as file:
+            json.dump(self._data, file)
+
+    def is_valid(self, key: str) -> bool:
+        """Returns True if key is trusted, or was validated and has not expired"""
+        return key in self._data["trusted"] or self._data["keys"].get(key, 0) > time.time()
+
+    def remember(self, key: str):
+        """Marks key as validated until ttl from now and makes it the last used key"""
+        self._data["keys"][key] = time.time() + self._ttl
+        self._data["last"] = key
+        self._save()
+
+    def use(self, key: str, trusted = False):
+        """
+        Makes key the last used key without validating it. A trusted key (one that needs no
+        validation, such as the default key) is kept without expiry.
+        """
+        if trusted and key not in self._data["trusted"]:
+            self._data["trusted"].append(key)
+        elif self._data["last"] == key:
+            return
+        self._data["last"] = key
+        self._save()
+
+    def forget(self, key: str):
+        """Removes key from the store"""
+        self._data["keys"].pop(key, None)
+        if key in self._data["trusted"]:
+            self._data["trusted"].remove(key)
+        if self._data["last"] == key:
+            self._data["last"] = None
+        self._save()
+
+    def last_key(self):
+        """Returns the last validated key if it has not expired, otherwise None"""
+        key = self._data["last"]
+        return key if key is not None and self.is_valid(key) else None
+
+    def __repr__(self):
+        return f"KeyStore(path={str(self._path)!r}, keys={len(self._data['keys'])})"
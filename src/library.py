@@ -17,10 +17,43 @@ from html.parser import HTMLParser
 import os
 import matplotlib.pyplot as plt
 import numpy as np
+from resilience import Resilience, endpoint_name
+from response_cache import ResponseCache
+from filter_index import split_filters
 
 # --------------------------------------------------
 # === UTILITY FUNCTIONS ===
 # --------------------------------------------------
+HTTP_TIMEOUT = (3.05, 10) #(connect, read) seconds for each outbound request
+RESILIENCE = Resilience(deadline=15.0) #shared retries, circuit breakers and deadline for the fetchers below
+
+OFF_CACHE = None #optional ResponseCache for OpenFoodFacts products, e.g. ResponseCache("off_cache.db")
+
+def resilient_get(url: str, params: dict = None, headers: dict = None) -> requests.Response:
+    """GET url with retries and a circuit breaker per endpoint; raises CircuitOpenError while the endpoint is down."""
+    return RESILIENCE.call(endpoint_name(url), requests.get, url, params=params, headers=headers, timeout=HTTP_TIMEOUT)
+
+def cached_get(url: str, cache: ResponseCache = None, force: bool = False) -> bytes:
+    """
+    Returns the body of a GET for url. With a cache, fresh entries skip the network and
+    expired ones (or every one if force) are revalidated with If-None-Match / If-Modified-Since:
+    a 304 refreshes the entry's ttl and returns the cached body without downloading it again.
+    """
+    if cache is None:
+        r = resilient_get(url)
+        r.raise_for_status()
+        return r.content
+    key = cache.make_key(url)
+    body = None if force else cache.get(key)
+    if body is not None:
+        return body
+    r = resilient_get(url, headers=cache.validators(key))
+    if r.status_code == 304 and cache.refresh(key):
+        return cache.get(key)
+    r.raise_for_status()
+    cache.put(key, r.content, etag=r.headers.get("ETag"), last_modified=r.headers.get("Last-Modified"))
+    return r.content
+
 def convert_to_imperial_units(nutrients: dict) -> dict:
     """Convert metric nutrient values (per 100 g) into imperial units (per oz)."""
     if not nutrients:
@@ -117,7 +150,7 @@ def get_healthier_alternatives(food_name: str, max_results: int = 3) -> list:
     print(f"\n🔍 Searching OpenFoodFacts for healthier alternatives to: {food_name}")
     print("-" * 60)
     try:
-        url = "https://world.openfoodfacts.org/cgi/search.pl"
+        url = f"{OFF_URL}/cgi/search.pl"
         params = {
             "search_terms": food_name,
             "search_simple": 1,
@@ -125,7 +158,7 @@ def get_healthier_alternatives(food_name: str, max_results: int = 3) -> list:
             "json": 1,
             "page_size": 20
         }
-        r = requests.get(url, params=params)
+        r = resilient_get(url, params=params)
         r.raise_for_status()
         data = r.json()
         products = data.get("products", [])
@@ -241,10 +274,10 @@ def parse_usda_nutrients(food: dict) -> dict:
 
 def get_usda_food(food_name_or_upc: str, api_key: str) -> dict:
     """Try USDA FoodData Central search by name or UPC."""
-    url = "https://api.nal.usda.gov/fdc/v1/foods/search"
+    url = f"{USDA_URL}/foods/search"
     params = {"query": food_name_or_upc, "pageSize": 1, "api_key": api_key}
     try:
-        r = requests.get(url, params=params)
+        r = resilient_get(url, params=params)
         r.raise_for_status()
         data = r.json()
         if not data.get("foods"):
@@ -256,11 +289,9 @@ def get_usda_food(food_name_or_upc: str, api_key: str) -> dict:
 
 
 def get_openfoodfacts_food(upc: str) -> dict:
-    """Fetch nutrient data from OpenFoodFacts by barcode."""
+    """Fetch nutrient data from OpenFoodFacts by barcode (cached in OFF_CACHE if set)."""
     try:
-        r = requests.get(f"https://world.openfoodfacts.org/api/v0/product/{upc}.json")
-        r.raise_for_status()
-        d = r.json()
+        d = json.loads(cached_get(f"{OFF_URL}/api/v0/product/{upc}.json", OFF_CACHE))
         if d.get("status") != 1:
             return {}
         p = d["product"]
@@ -278,6 +309,19 @@ def get_openfoodfacts_food(upc: str) -> dict:
         }
     except Exception:
         return {}
+
+def refresh_openfoodfacts_products(upcs: list) -> int:
+    """Revalidates the OFF_CACHE entries of the given barcodes; unchanged products cost a bodiless 304."""
+    if OFF_CACHE is None:
+        return 0
+    refreshed = 0
+    for upc in upcs:
+        try:
+            cached_get(f"{OFF_URL}/api/v0/product/{upc}.json", OFF_CACHE, force=True)
+            refreshed += 1
+        except Exception as e:
+            print(f"⚠️ Could not refresh product {upc}:", e)
+    return refreshed
         
 def search_keyword(text: str, keyword: str) -> bool:
     """
@@ -330,14 +374,14 @@ def format_search_results(results: List[Dict[str, str]]) -> List[Dict[str, str]]
     return formatted
 
 
-food_url = "https://api.nal.usda.gov/fdc/v1"
+food_url = os.environ.get("USDA_URL", "https://api.nal.usda.gov/fdc/v1")
 USDA_API_KEY = "DEMO_KEY"  # Replace with your USDA key
 
 
 def get_food_item(upc): #Theo
     """Given the universal product code, returns json of details of that item"""
     url = f"{food_url}/foods/search?api_key={USDA_API_KEY}&query={upc}"
-    response = requests.get(url)
+    response = resilient_get(url)
     if response.status_code == 200:
         food_data = response.json()
         return food_data
@@ -363,7 +407,7 @@ def generate_alt(upc, nutrient, comparison, ref, filters=None): #Theo
     url = f"{food_url}/foods/search?api_key={USDA_API_KEY}"
 
     if comparison == 0:
-        response = requests.get(url+f"&{nutrient}>{init_nutrient_val}&sortBy={nutrient}&sortOrder=desc")
+        response = resilient_get(url+f"&{nutrient}>{init_nutrient_val}&sortBy={nutrient}&sortOrder=desc")
         return response.json()
     if comparison == 1:
         pass
@@ -373,10 +417,10 @@ def generate_alt(upc, nutrient, comparison, ref, filters=None): #Theo
 
 # ----- generate_alt() test ------
 # print(get_food_item(850126007120))
-test_food = get_food_item(850126007120)
+# test_food = get_food_item(850126007120)
 #for key in test_food["foods"][0]["foodNutrients"]:
 #    print(key, ":", test_food["foods"][0]["foodNutrients"])
-print(test_food["foods"][0]["foodNutrients"][1])
+# print(test_food["foods"][0]["foodNutrients"][1])
 
 
 # print(generate_alt(850126007120, "sugar", 0, "serving"))
@@ -408,13 +452,14 @@ def decode_barcode_from_image():
 # --------------------------------------------------
 
 USDA_API_KEY = "DEMO_KEY"  # Replace with your USDA key
-USDA_URL = "https://api.nal.usda.gov/fdc/v1" #URL for the food central database
+USDA_URL = os.environ.get("USDA_URL", "https://api.nal.usda.gov/fdc/v1") #URL for the food central database
+OFF_URL = os.environ.get("OFF_URL", "https://world.openfoodfacts.org") #URL for OpenFoodFacts (set both to a stand-in server to run offline)
 csv_export = "../resources/export.csv" #holds export dat in csv form 
 
 def get_food_item(upc):
     """Given the universal product code, returns json of details of that item"""
     url = f"{USDA_URL}/food/search?api_key={USDA_API_KEY}&query={upc}"
-    response = requests.get(url)
+    response = resilient_get(url)
     if response.status_code == 200:
         food_data = response.json()
         return food_data
@@ -438,7 +483,7 @@ def set_key(key = "DEMO_KEY"):
         pass
 
 def export_to_csv(food_details):
-   """Exports selected food's nutritional facts to export.csv"""
+    """Exports selected food's nutritional facts to export.csv"""
     fieldnames = set()
     for entry in food_details:
         fieldnames.update(entry.keys())
@@ -510,16 +555,9 @@ def run_app():
             print("👋 Goodbye! Stay healthy!")
             break
 def parse_search_query(query: str) -> dict:
-    query = query.strip().lower()
-    filters = []
-    possible_filters = ["low sugar", "low fat", "high protein", "high fiber", "gluten free", "vegan"]
-
-    for f in possible_filters:
-        if f in query:
-            filters.append(f)
-            query = query.replace(f, "").strip()
-
-    return {"food": query, "filters": filters}
+    """Splits the dietary filters (filter_index.FILTERS) out of a search query"""
+    food, groups = split_filters(query)
+    return {"food": food, "filters": [f for group in groups for f in group]}
 
 def show_macro_pie_chart(food_name: str, macros: dict):
     if not all(k in macros for k in ("protein", "carbs", "fat")):
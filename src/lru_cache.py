@@ -0,0 +1,134 @@
+"""
+lru_cache.py
+Bounded in-memory LRU cache with hit/miss/eviction counters.
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+
+
+def approx_size(obj, seen = None) -> int:
+    """Returns an approximate deep size of obj in bytes (containers and object attributes are followed)"""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(approx_size(k, seen) + approx_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(approx_size(v, seen) for v in obj)
+    elif hasattr(obj, "__dict__"):
+        size += approx_size(vars(obj), seen)
+    return size
+
+
+class LRUCache:
+    """
+    Thread-safe least recently used map bounded by entry count and an approximate memory budget.
+    """
+
+    def __init__(self, max_entries = 128, max_bytes = 16 * 1024 * 1024, sizeof = approx_size):
+        """
+        Args:
+            max_entries (int): Maximum number of entries kept.
+            max_bytes (int): Memory budget for all values, measured with sizeof.
+            sizeof (callable): Returns the size in bytes of a value.
+        """
+        if max_entries < 1 or max_bytes < 1:
+            raise ValueError("Cache limits must be positive.")
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._data = OrderedDict() #key -> (value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def max_entries(self) -> int:
+        return self._max_entries
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes
+
+    @property
+    def sizeof(self):
+        """The function values are measured with"""
+        return self._sizeof
+
+    @property
+    def bytes(self) -> int:
+        """Approximate memory held by cached values"""
+        return self._bytes
+
+    def get(self, key, default = None):
+        """Returns the value for key and marks it most recently used, default on a miss"""
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key][0]
+
+    def put(self, key, value):
+        """Stores value under key, evicting least recently used entries past either limit"""
+        size = self._sizeof(value)
+        if size > self._max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._bytes -= self._data.pop(key)[1]
+            self._data[key] = (value, size)
+            self._bytes += size
+            self._evict()
+
+    def grow(self, key, value, size):
+        """
+        Charges size more bytes to the entry for key, if it still holds value (a value that
+        grows after it was stored, e.g. results building their items), evicting past either limit.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] is not value:
+                return
+            self._data[key] = (value, entry[1] + size)
+            self._bytes += size
+            self._evict()
+
+    def _evict(self):
+        """Drops least recently used entries until both limits hold. Caller holds the lock."""
+        while len(self._data) > self._max_entries or self._bytes > self._max_bytes:
+            _, (_, old_size) = self._data.popitem(last=False)
+            self._bytes -= old_size
+            self.evictions += 1
+
+    def invalidate(self, key = None):
+        """Removes one entry, or every entry if key is None"""
+        with self._lock:
+            if key is None:
+                self._data.clear()
+                self._bytes = 0
+            elif key in self._data:
+                self._bytes -= self._data.pop(key)[1]
+
+    def stats(self) -> dict:
+        """Returns hit, miss and eviction counters plus current usage"""
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "entries": len(self._data), "bytes": self._bytes}
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return f"LRUCache(entries={len(self._data)}/{self._max_entries}, bytes={self._bytes}/{self._max_bytes})"
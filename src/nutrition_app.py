@@ -1,7 +1,15 @@
+from autocomplete import PrefixIndex
 from foodcentral_manager import FCManager
+from filter_index import FilterIndex
+from food_index import FoodIndex
+from gtin_index import GtinIndex
+from ingredient_index import IngredientIndex
+from key_store import KeyStore
 from nutrition_analyzer import NutritionAnalyzer
 from profile import Profile
 from food_item import FoodItem
+from ranking import RankedResults
+from trigram_index import TrigramIndex
 
 import pickle
 import json
@@ -31,7 +39,11 @@ class NutritionApp:
     def start_up(self):
         print("Loading...")
 
-        self.fc_db = FCManager()
+        index = FoodIndex("food_index.db")
+        self.fc_db = FCManager(key_store=KeyStore("api_keys.json"), index=index, fuzzy=TrigramIndex.from_food_index(index, background=True),
+                               gtins=GtinIndex("gtin_index.db"), autocomplete=PrefixIndex.from_food_index(index, "autocomplete.json", background=True),
+                               filters=FilterIndex.from_food_index(index, "filter_index.db", background=True),
+                               ingredients=IngredientIndex.from_food_index(index, "ingredient_index.db", background=True))
         p = Path("profile.json")
 
         if p.exists():
@@ -49,7 +61,11 @@ class NutritionApp:
 
         self.analyzer = NutritionAnalyzer()
 
-        self.fc_db.prompt_key()
+        saved_key = self.fc_db.key_store.last_key()
+        if saved_key is None:
+            self.fc_db.key = self.fc_db.prompt_key() #validated by the first search
+        else:
+            self.fc_db.key = saved_key
         
     def run(self):
         print("Welcome to the Nutrition App")
@@ -58,7 +74,7 @@ class NutritionApp:
             choice = input("1) Search food  2) Manage Profile 3) Quit: ").strip()
             if choice == "1":
                 query = input("Enter food name or UPC: ").strip()
-                if query.isnumeric():
+                if query.replace("-", "").isnumeric():
                     print("UPC Search")
                     result = self.fc_db.searchDB(query,1)
                     
@@ -68,25 +84,38 @@ class NutritionApp:
                     else:
                         print(f"Food item found: {result}")
                         print("Searching for alternatives...")
-                        related = self.fc_db.searchDB(result.name,1)
-                        alters = self.analyzer.get_healthier_alternatives(related)
-                        self.display_alter(alters)
+                        related = self.fc_db.searchDB(result.name)
+                        if isinstance(related, RankedResults):
+                            alters = self.analyzer.get_healthier_alternatives(related)
+                            self.display_alter(alters)
                 else:
+                    suggestions = self.fc_db.suggest(query)
+                    if suggestions:
+                        print("Known foods")
+                        for i, (_, name) in enumerate(suggestions):
+                            print(f"{i}.) {name}")
+                        select = input("Enter number of a known food (anything else to search)").strip()
+                        if select.isnumeric() and int(select) < len(suggestions):
+                            #answered from the local index, no search request
+                            food = self.fc_db.known_food(suggestions[int(select)][0])
+                            if food is not None:
+                                self.display_food(food)
+                                continue
                     print("Keyword Search")
                     result = self.fc_db.searchDB(query) 
-                    if type(result) == list:
+                    if isinstance(result, RankedResults):
                         print("Search results")
                         for i, val in enumerate(result):
                             if i > 4:
                                 break
                             print(f"{i}.) {val}")
-                        select = input("Enter number of item (anything else to cancel)")
-                        if type(select.strip().isnumeric):
-                            select = int(select)
-                            if select > 5 or select < 1:
-                                break
-                            else:
-                                pass
+                        select = input("Enter number of item (anything else to cancel)").strip()
+                        if select.isnumeric() and int(select) < min(5, len(result)):
+                            #top hits are prefetched by searchDB, so this is usually answered from memory
+                            self.fc_db.choose(result[int(select)].fdc_id)
+                            details = self.fc_db.get_item(result[int(select)].fdc_id)
+                            if details is not None:
+                                self.display_food(self.fc_db.create_food_item(details))
                     else:
                         pass
 
@@ -105,6 +134,12 @@ class NutritionApp:
             else:
                 print("Invalid option.")
 
+    def display_food(self, food):
+        """Prints a selected food item and its nutrients"""
+        print(f"Selected: {food}")
+        for nutrient in food.nutrients:
+            print(f"  {nutrient['nutrientName']}: {nutrient['value']} {nutrient['unitName']}")
+
     def display_alter(self, alters):
         """Takes dictionary of alternative food items and formats/prints message"""
         print(f"Higher protein option: {alters['protein']}\n ({alters['protein'].protein})")
@@ -0,0 +1,353 @@
+"""
+ranking.py
+BM25 relevance scoring backed by corpus document-frequency statistics.
+"""
+
+import heapq
+import math
+import threading
+from collections.abc import Sequence
+
+try: #optional: vectorized scoring of large candidate sets
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = None
+    sparse = None
+
+
+VECTOR_MIN_DOCS = 256 #candidate sets at least this large are scored with one sparse product
+
+
+class CorpusStats:
+    """
+    In-memory document-frequency statistics, grown incrementally as documents are seen.
+    Each document id is counted once, so re-ranking the same foods does not skew the counts.
+    FoodIndex offers the same interface (doc_count, avg_length, doc_freqs) for persistent stats.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seen = set()
+        self._df = {} #token -> documents containing it
+        self._total_length = 0
+
+    @property
+    def doc_count(self) -> int:
+        return len(self._seen)
+
+    @property
+    def avg_length(self) -> float:
+        return self._total_length / len(self._seen) if self._seen else 0.0
+
+    def add(self, doc_id, tokens) -> bool:
+        """Counts a document's tokens unless doc_id was already added. Returns True if it was new."""
+        with self._lock:
+            return self._count(doc_id, tokens)
+
+    def _count(self, doc_id, tokens) -> bool:
+        """add() without the lock. Caller holds the lock."""
+        if doc_id in self._seen:
+            return False
+        self._seen.add(doc_id)
+        self._total_length += len(tokens)
+        for token in set(tokens):
+            self._df[token] = self._df.get(token, 0) + 1
+        return True
+
+    def doc_freqs(self, tokens) -> dict:
+        """Returns {token: number of documents containing it} for tokens"""
+        return {token: self._df.get(token, 0) for token in tokens}
+
+    def __contains__(self, doc_id):
+        return doc_id in self._seen
+
+    def __len__(self):
+        return len(self._seen)
+
+    def __repr__(self):
+        return f"{type(self).__name__}(docs={self.doc_count}, terms={len(self._df)})"
+
+
+class TermMatrix(CorpusStats):
+    """
+    CorpusStats that also keeps every document's term frequencies as a row of a sparse
+    documents x vocabulary matrix (CSR), so a candidate set of known documents becomes
+    a term matrix by slicing rows instead of re-tokenizing.
+
+    add() appends rows to Python lists; they are moved into growable NumPy buffers the
+    next time a matrix is read. Each row may carry a version (e.g. a hash of the document's
+    text); discard_changed() forgets documents whose version changed, so they are added again
+    with their new terms. Forgotten rows are compacted away once they outnumber the live ones.
+    Needs numpy and scipy (see TermMatrix.available).
+    """
+
+    available = np is not None
+
+    def __init__(self):
+        super().__init__()
+        self._vocab = {} #token -> column
+        self._tokens = [] #column -> token
+        self._rows = {} #doc_id -> row
+        self._size = 0 #rows written, discarded ones included
+        self._versions = {} #doc_id -> version given to add()
+        self._pending = ([], [], []) #columns, frequencies and row sizes not yet in the buffers
+        self._nnz = 0
+        self._indices = np.zeros(1024, dtype=np.int32)
+        self._data = np.zeros(1024, dtype=np.float64)
+        self._indptr = np.zeros(1024, dtype=np.int64)
+        self._lengths = np.zeros(1024, dtype=np.float64)
+
+    def add(self, doc_id, tokens, version = None) -> bool:
+        """Adds a document's row unless doc_id was already added. Returns True if it was new."""
+        with self._lock:
+            return self._count(doc_id, tokens, version)
+
+    def _count(self, doc_id, tokens, version = None) -> bool:
+        if not super()._count(doc_id, tokens):
+            return False
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        columns, frequencies, sizes = self._pending
+        for token in counts:
+            if token not in self._vocab:
+                self._vocab[token] = len(self._tokens)
+                self._tokens.append(token)
+            columns.append(self._vocab[token])
+        frequencies.extend(counts.values())
+        sizes.append(len(counts))
+        row = self._size
+        self._size += 1
+        self._rows[doc_id] = row
+        self._versions[doc_id] = version
+        self._lengths = _fit(self._lengths, row + 1)
+        self._lengths[row] = len(tokens)
+        return True
+
+    def _flush(self):
+        """Moves pending rows into the CSR buffers. Caller holds the lock."""
+        columns, frequencies, sizes = self._pending
+        if not sizes:
+            return
+        first = self._size - len(sizes)
+        nnz = self._nnz + len(columns)
+        self._indices = _fit(self._indices, nnz)
+        self._data = _fit(self._data, nnz)
+        self._indptr = _fit(self._indptr, self._size + 1)
+        self._indices[self._nnz:nnz] = columns
+        self._data[self._nnz:nnz] = frequencies
+        self._indptr[first + 1:self._size + 1] = self._nnz + np.cumsum(sizes)
+        self._nnz = nnz
+        self._pending = ([], [], [])
+
+    def discard(self, doc_ids) -> int:
+        """Forgets documents and takes their terms out of the statistics. Returns the number forgotten."""
+        with self._lock:
+            return self._discard(doc_ids)
+
+    def discard_changed(self, versions: dict) -> int:
+        """Forgets the documents of {doc_id: version} added with another version. Returns the number forgotten."""
+        with self._lock:
+            return self._discard([doc_id for doc_id, version in versions.items()
+                                  if doc_id in self._rows and self._versions[doc_id] != version])
+
+    def _discard(self, doc_ids) -> int:
+        """discard() without the lock. Caller holds the lock."""
+        self._flush()
+        count = 0
+        for doc_id in doc_ids:
+            row = self._rows.pop(doc_id, None)
+            if row is None:
+                continue
+            del self._versions[doc_id]
+            self._seen.discard(doc_id)
+            self._total_length -= int(self._lengths[row])
+            for column in self._indices[self._indptr[row]:self._indptr[row + 1]].tolist():
+                self._df[self._tokens[column]] -= 1
+            count += 1
+        if self._size - len(self._rows) > max(1024, len(self._rows)):
+            self._compact()
+        return count
+
+    def _compact(self):
+        """Rewrites the buffers with only the live rows, renumbered in their order. Caller holds the lock (pending rows flushed)."""
+        live = sorted(self._rows.items(), key=lambda item: item[1])
+        rows = np.fromiter((row for _, row in live), dtype=np.int64, count=len(live))
+        starts, sizes = self._indptr[rows], self._indptr[rows + 1] - self._indptr[rows]
+        indptr = np.zeros(max(len(rows) + 1, 1024), dtype=np.int64)
+        np.cumsum(sizes, out=indptr[1:len(rows) + 1])
+        nnz = int(indptr[len(rows)])
+        positions = np.arange(nnz) - np.repeat(indptr[:len(rows)], sizes) + np.repeat(starts, sizes)
+        self._indices = _fit(self._indices[positions], 1024)
+        self._data = _fit(self._data[positions], 1024)
+        self._indptr = indptr
+        self._lengths = _fit(self._lengths[rows], 1024)
+        self._rows = {doc_id: row for row, (doc_id, _) in enumerate(live)}
+        self._size = len(live)
+        self._nnz = nnz
+
+    def counts(self, doc_ids, terms, tokens_of = None):
+        """
+        Returns (tf, lengths): the len(doc_ids) x len(terms) CSR matrix of term frequencies
+        and the token count of each document. Every doc_id must have been added; a document
+        discarded since (by another thread) is added again from tokens_of(doc_id) if given.
+        """
+        doc_ids = doc_ids if isinstance(doc_ids, list) else list(doc_ids)
+        terms = list(terms)
+        with self._lock:
+            if tokens_of is not None:
+                for doc_id in doc_ids:
+                    if doc_id not in self._rows:
+                        self._count(doc_id, tokens_of(doc_id))
+            self._flush()
+            rows = np.fromiter(map(self._rows.__getitem__, doc_ids), dtype=np.int64, count=len(doc_ids))
+            shape = (self._size, len(self._vocab))
+            matrix = sparse.csr_matrix((self._data[:self._nnz], self._indices[:self._nnz], self._indptr[:shape[0] + 1]), shape=shape)
+            known = [(j, self._vocab[term]) for j, term in enumerate(terms) if term in self._vocab]
+            lengths = self._lengths[rows]
+        positions = np.array([j for j, _ in known], dtype=np.int64)
+        columns = [col for _, col in known]
+        if 4 * len(rows) < shape[0]: #few candidates: cut their rows first
+            tf = matrix[rows][:, columns]
+        else:
+            tf = matrix[:, columns][rows]
+        return sparse.csr_matrix((tf.data, positions[tf.indices], tf.indptr), shape=(len(rows), len(terms))), lengths
+
+
+def _fit(buffer, size):
+    """Returns buffer, or a copy at least twice as large if it holds fewer than size items"""
+    if size <= len(buffer):
+        return buffer
+    grown = np.zeros(max(size, 2 * len(buffer)), dtype=buffer.dtype)
+    grown[:len(buffer)] = buffer
+    return grown
+
+
+class BM25:
+    """
+    Okapi BM25 scorer.
+
+        score(q, d) = sum over query terms t of
+                      idf(t) * tf(t, d) * (k1 + 1) / (tf(t, d) + k1 * (1 - b + b * |d| / avgdl))
+        idf(t)      = ln(1 + (N - df(t) + 0.5) / (df(t) + 0.5))
+
+    N, df and avgdl come from a stats object (CorpusStats or FoodIndex). Query term
+    weights are looked up once per query, so scoring a document costs O(query terms)
+    however large the corpus grows.
+
+    score_matrix scores documents held in a TermMatrix all at once: the BM25 term
+    weights are computed on the nonzeros of the sparse documents x query-terms matrix,
+    which is then multiplied by the idf vector.
+    """
+
+    def __init__(self, stats, k1 = 1.2, b = 0.75):
+        """
+        Args:
+            stats: CorpusStats or FoodIndex supplying doc_count, avg_length and doc_freqs.
+            k1 (float): Term frequency saturation.
+            b (float): Document length normalization (0 = none, 1 = full).
+        """
+        self._stats = stats
+        self._k1 = k1
+        self._b = b
+
+    @property
+    def stats(self):
+        return self._stats
+
+    @stats.setter
+    def stats(self, stats):
+        self._stats = stats
+
+    @staticmethod
+    def idf(doc_count: int, df: int) -> float:
+        return math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+
+    def query_weights(self, query_tokens) -> dict:
+        """Returns {term: idf} for the distinct query terms"""
+        terms = list(dict.fromkeys(query_tokens))
+        doc_count = self._stats.doc_count
+        dfs = self._stats.doc_freqs(terms)
+        return {term: self.idf(doc_count, dfs.get(term, 0)) for term in terms}
+
+    def score(self, weights: dict, doc_tokens) -> float:
+        """Returns the BM25 score of one tokenized document for query weights from query_weights"""
+        tf = {}
+        for token in doc_tokens:
+            if token in weights:
+                tf[token] = tf.get(token, 0) + 1
+        if not tf:
+            return 0.0
+        avg_length = self._stats.avg_length or len(doc_tokens) or 1
+        norm = self._k1 * (1 - self._b + self._b * len(doc_tokens) / avg_length)
+        return sum(weights[t] * f * (self._k1 + 1) / (f + norm) for t, f in tf.items())
+
+    def score_many(self, query_tokens, docs) -> list:
+        """Returns the BM25 score of each tokenized document in docs"""
+        weights = self.query_weights(query_tokens)
+        return [self.score(weights, doc) for doc in docs]
+
+    def score_matrix(self, query_tokens, matrix: TermMatrix, doc_ids, tokens_of = None):
+        """Returns the BM25 scores of documents already added to matrix, as a NumPy array (see TermMatrix.counts)"""
+        weights = self.query_weights(query_tokens)
+        tf, lengths = matrix.counts(doc_ids, weights, tokens_of)
+        avg_length = self._stats.avg_length
+        ratio = lengths / avg_length if avg_length else np.ones_like(lengths) #no statistics yet: no length normalization
+        norm = self._k1 * (1 - self._b + self._b * ratio)
+        rows = np.repeat(np.arange(tf.shape[0]), np.diff(tf.indptr))
+        tf.data = tf.data * (self._k1 + 1) / (tf.data + norm[rows])
+        return tf @ np.fromiter(weights.values(), dtype=np.float64, count=len(weights))
+
+    def __repr__(self):
+        return f"BM25(k1={self._k1}, b={self._b}, stats={self._stats!r})"
+
+
+def top_k(scores, k) -> list:
+    """
+    Returns the positions of the k highest scores, best first (ties keep their order).
+    Uses a bounded heap: O(n log k) instead of sorting all n scores.
+    """
+    return heapq.nlargest(k, range(len(scores)), key=scores.__getitem__)
+
+
+class RankedResults(Sequence):
+    """
+    Read-only sequence of ranked food records whose FoodItem objects are built on
+    first access, so callers that only look at the first few results never pay
+    for the rest. Built items are kept, and slicing returns a list of items.
+    on_build, if set, is called with each item as it is built (e.g. to charge a cache for it).
+    """
+
+    def __init__(self, foods, create):
+        """
+        Args:
+            foods (list): Food dictionaries, best first.
+            create (callable): Turns one food dictionary into a FoodItem.
+        """
+        self._foods = list(foods)
+        self._create = create
+        self._items = [None] * len(self._foods)
+        self.on_build = None
+
+    @property
+    def foods(self) -> list:
+        """The ranked food dictionaries"""
+        return list(self._foods)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self._foods)))]
+        item = self._items[index]
+        if item is None:
+            item = self._items[index] = self._create(self._foods[index])
+            if self.on_build is not None:
+                self.on_build(item)
+        return item
+
+    def __len__(self):
+        return len(self._foods)
+
+    def __repr__(self):
+        built = sum(item is not None for item in self._items)
+        return f"RankedResults(foods={len(self._foods)}, built={built})"
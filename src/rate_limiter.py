@@ -0,0 +1,139 @@
+"""
+rate_limiter.py
+Token bucket that paces outgoing API requests under an hourly quota.
+"""
+
+import random
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Token bucket refilled at capacity/period tokens per second.
+
+    acquire() reserves a token and sleeps until it is due, so callers queue
+    in arrival order instead of failing. update() syncs the bucket with the
+    X-RateLimit-Limit / X-RateLimit-Remaining headers the API sends back, and
+    backoff() waits a jittered, exponentially growing delay after a 429.
+    """
+
+    DEMO_KEY_PER_HOUR = 30 #api.data.gov DEMO_KEY hourly limit
+    KEY_PER_HOUR = 1000 #api.data.gov personal key hourly limit
+
+    def __init__(self, capacity, period = 3600.0, max_retries = 5, backoff_base = 1.0, max_backoff = 60.0,
+                 clock = time.monotonic, sleep = time.sleep):
+        """
+        Args:
+            capacity (int): Requests allowed per period (also the burst size).
+            period (float): Length of the quota window in seconds.
+            max_retries (int): 429 responses retried before giving up.
+            backoff_base (float): First backoff delay ceiling in seconds.
+            max_backoff (float): Upper bound for one backoff delay.
+        """
+        if capacity <= 0 or period <= 0:
+            raise ValueError("capacity and period must be positive.")
+        self._capacity = float(capacity)
+        self._period = float(period)
+        self._rate = self._capacity / self._period
+        self._tokens = self._capacity
+        self._max_retries = max_retries
+        self._backoff_base = backoff_base
+        self._max_backoff = max_backoff
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+        self.waited = 0.0 #total seconds spent pacing
+        self.throttled = 0 #429 responses seen
+
+    @classmethod
+    def for_key(cls, key: str, **kwargs):
+        """Returns a limiter sized to the hourly quota of key"""
+        return cls(cls.quota(key), **kwargs)
+
+    @classmethod
+    def quota(cls, key: str) -> int:
+        """Returns the hourly request quota of key"""
+        return cls.DEMO_KEY_PER_HOUR if key == "DEMO_KEY" else cls.KEY_PER_HOUR
+
+    @property
+    def capacity(self) -> float:
+        return self._capacity
+
+    @property
+    def tokens(self) -> float:
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+    @property
+    def max_retries(self) -> int:
+        return self._max_retries
+
+    def _refill(self):
+        """Adds tokens earned since the last update. Caller holds the lock."""
+        now = self._clock()
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def acquire(self) -> float:
+        """Takes one token, sleeping until it is available. Returns the seconds waited."""
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            wait = -self._tokens / self._rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            self.waited += wait
+            self._sleep(wait)
+        return wait
+
+    def try_acquire(self) -> bool:
+        """Takes one token if one is available right now, never waits"""
+        with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def update(self, headers):
+        """Syncs the bucket with the quota headers of a response"""
+        limit = headers.get("X-RateLimit-Limit")
+        remaining = headers.get("X-RateLimit-Remaining")
+        with self._lock:
+            self._refill()
+            if limit is not None and limit.isdigit() and int(limit) > 0:
+                self._resize(int(limit))
+            if remaining is not None and remaining.isdigit():
+                self._tokens = min(self._tokens, float(remaining))
+
+    def resize(self, capacity):
+        """Changes the requests allowed per period; tokens already spent stay spent"""
+        if capacity <= 0:
+            raise ValueError("capacity must be positive.")
+        with self._lock:
+            self._refill()
+            self._resize(capacity)
+
+    def _resize(self, capacity):
+        """resize() without the lock. Caller holds the lock."""
+        self._capacity = float(capacity)
+        self._rate = self._capacity / self._period
+        self._tokens = min(self._tokens, self._capacity)
+
+    def backoff(self, attempt: int, retry_after = None) -> float:
+        """Sleeps a full-jitter exponential delay after a 429 (at least Retry-After if given). Returns the delay."""
+        ceiling = min(self._max_backoff, self._backoff_base * (2 ** attempt))
+        delay = random.uniform(0, ceiling)
+        if retry_after is not None and str(retry_after).isdigit():
+            delay = max(delay, float(retry_after))
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, 0.0)
+            self.throttled += 1
+        self._sleep(delay)
+        return delay
+
+    def __repr__(self):
+        return f"RateLimiter(capacity={self._capacity:g}, period={self._period:g}s, tokens={self.tokens:.1f})"
@@ -0,0 +1,266 @@
+"""
+resilience.py
+Retries, per-endpoint circuit breakers and deadlines for outbound HTTP calls.
+"""
+
+import random
+import re
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+
+
+RETRY_STATUSES = (500, 502, 503, 504) #responses treated as a failing dependency
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised instead of sending a request while the endpoint's circuit is open"""
+
+
+class DeadlineExceeded(requests.Timeout):
+    """Raised when a call's deadline passes before a usable response arrived"""
+
+
+def endpoint_name(url: str) -> str:
+    """Returns the host and path of url with ids and barcodes replaced, e.g. api.nal.usda.gov/fdc/v1/food/{id}"""
+    parsed = urlparse(url)
+    return parsed.netloc + re.sub(r"/\d+", "/{id}", parsed.path)
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after failure_threshold consecutive failed calls. While open every
+    call is rejected at once; after reset_timeout one probe call is let through
+    (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, name, failure_threshold = 5, reset_timeout = 30.0, clock = time.monotonic):
+        """
+        Args:
+            name (str): Endpoint the breaker guards.
+            failure_threshold (int): Consecutive failed calls that open the circuit.
+            reset_timeout (float): Seconds the circuit stays open before a probe is allowed.
+        """
+        self._name = name
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.failures = 0 #failed calls
+        self.successes = 0 #successful calls
+        self.rejected = 0 #calls failed fast while open
+        self.trips = 0 #times the circuit opened
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self._reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Returns True if a call may be sent now"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self._reset_timeout:
+                self._state = self.HALF_OPEN
+            if self._state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.successes += 1
+            self._consecutive = 0
+            self._probing = False
+            self._state = self.CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._consecutive += 1
+            self._probing = False
+            if self._state == self.HALF_OPEN or self._consecutive >= self._failure_threshold:
+                if self._state != self.OPEN:
+                    self.trips += 1
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+
+    def stats(self) -> dict:
+        return {"state": self.state, "failures": self.failures, "successes": self.successes,
+                "rejected": self.rejected, "trips": self.trips}
+
+    def __repr__(self):
+        return f"CircuitBreaker({self._name!r}, state={self.state!r})"
+
+
+class Resilience:
+    """
+    Wraps a request function with bounded retries, a circuit breaker per endpoint
+    and an optional deadline.
+
+    Connection errors, timeouts and 5xx responses are failures: they are retried
+    after a full-jitter exponential backoff, and a call whose retries all fail
+    counts against the endpoint's breaker. Once the breaker opens, calls raise
+    CircuitOpenError without touching the network until the reset timeout passes. The deadline bounds the whole call,
+    retries included; each attempt's read timeout is cut to the time left.
+    """
+
+    def __init__(self, max_retries = 2, backoff_base = 0.25, max_backoff = 5.0, deadline = None, failure_threshold = 5,
+                 reset_timeout = 30.0, retry_statuses = RETRY_STATUSES, clock = time.monotonic, sleep = time.sleep):
+        """
+        Args:
+            max_retries (int): Retries after the first failed attempt.
+            backoff_base (float): First backoff delay ceiling in seconds.
+            max_backoff (float): Upper bound for one backoff delay.
+            deadline (float): Seconds a whole call may take, retries included (None = no deadline).
+            failure_threshold (int): Consecutive failed calls that open an endpoint's circuit.
+            reset_timeout (float): Seconds an open circuit waits before letting a probe through.
+            retry_statuses (tuple): Status codes counted as failures.
+        """
+        self._max_retries = max_retries
+        self._backoff_base = backoff_base
+        self._max_backoff = max_backoff
+        self._deadline = deadline
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._retry_statuses = frozenset(retry_statuses)
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._breakers = {} #endpoint -> CircuitBreaker
+        self.calls = 0 #calls made through call()
+        self.attempts = 0 #requests actually sent
+        self.retries = 0 #attempts after the first
+        self.short_circuited = 0 #calls rejected by an open circuit
+        self.deadline_exceeded = 0 #calls stopped by their deadline
+        self.backoff_time = 0.0 #seconds slept between retries
+
+    @property
+    def deadline(self):
+        return self._deadline
+
+    @deadline.setter
+    def deadline(self, seconds):
+        self._deadline = seconds
+
+    @property
+    def max_retries(self) -> int:
+        return self._max_retries
+
+    def breaker(self, endpoint: str) -> CircuitBreaker:
+        """Returns the circuit breaker of endpoint, creating it on first use"""
+        with self._lock:
+            breaker = self._breakers.get(endpoint)
+            if breaker is None:
+                breaker = CircuitBreaker(endpoint, self._failure_threshold, self._reset_timeout, self._clock)
+                self._breakers[endpoint] = breaker
+            return breaker
+
+    def backoff(self, attempt: int) -> float:
+        """Returns a full-jitter exponential delay for the given retry attempt"""
+        return random.uniform(0, min(self._max_backoff, self._backoff_base * (2 ** attempt)))
+
+    def is_failure(self, response) -> bool:
+        return response.status_code in self._retry_statuses
+
+    @staticmethod
+    def _cut_timeout(timeout, remaining):
+        """Returns timeout with its read part lowered to the seconds remaining"""
+        if isinstance(timeout, tuple):
+            return (min(timeout[0], remaining), min(timeout[1], remaining))
+        return remaining if timeout is None else min(timeout, remaining)
+
+    def call(self, endpoint: str, func, *args, deadline = None, **kwargs):
+        """
+        Returns func(*args, **kwargs), a requests-style call returning a Response.
+        Failures are retried; if every attempt fails the last 5xx response is returned
+        or the last exception raised. Raises CircuitOpenError while endpoint's circuit
+        is open and DeadlineExceeded when the deadline runs out between attempts.
+        """
+        deadline = self._deadline if deadline is None else deadline
+        breaker = self.breaker(endpoint)
+        expires = self._clock() + deadline if deadline is not None else None
+        with self._lock:
+            self.calls += 1
+
+        if not breaker.allow():
+            with self._lock:
+                self.short_circuited += 1
+            raise CircuitOpenError(f"Circuit open for {endpoint}")
+        try:
+            response = self._attempt(endpoint, func, args, kwargs, deadline, expires)
+        except BaseException:
+            breaker.record_failure()
+            raise
+        if self.is_failure(response):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+    def _attempt(self, endpoint, func, args, kwargs, deadline, expires):
+        """Sends func until it succeeds, retries run out or the deadline would pass"""
+        attempt = 0
+        while True:
+            if expires is not None:
+                kwargs["timeout"] = self._cut_timeout(kwargs.get("timeout"), max(0.001, expires - self._clock()))
+            with self._lock:
+                self.attempts += 1
+                self.retries += attempt > 0
+
+            error = response = None
+            try:
+                response = func(*args, **kwargs)
+            except requests.RequestException as e:
+                error = e
+            if error is None and not self.is_failure(response):
+                return response
+
+            delay = self.backoff(attempt)
+            out_of_time = expires is not None and self._clock() + delay >= expires
+            if attempt >= self._max_retries or out_of_time:
+                if out_of_time and attempt < self._max_retries:
+                    with self._lock:
+                        self.deadline_exceeded += 1
+                    if error is not None:
+                        raise DeadlineExceeded(f"Deadline of {deadline}s exceeded for {endpoint}") from error
+                if error is not None:
+                    raise error
+                return response
+            if response is not None:
+                response.close()
+            with self._lock:
+                self.backoff_time += delay
+            self._sleep(delay)
+            attempt += 1
+
+    def stats(self) -> dict:
+        """Returns call, retry, short-circuit and deadline counters plus each endpoint's breaker stats"""
+        with self._lock:
+            breakers = list(self._breakers.values())
+            counters = {"calls": self.calls, "attempts": self.attempts, "retries": self.retries,
+                        "short_circuited": self.short_circuited, "deadline_exceeded": self.deadline_exceeded,
+                        "backoff_time": self.backoff_time}
+        counters["breakers"] = {breaker.name: breaker.stats() for breaker in breakers}
+        return counters
+
+    def __repr__(self):
+        return f"Resilience(max_retries={self._max_retries}, deadline={self._deadline}, endpoints={len(self._breakers)})"
@@ -0,0 +1,207 @@
+"""
+response_cache.py
+Persistent SQLite cache for API responses.
+"""
+
+import sqlite3
+import threading
+import time
+from urllib.parse import urlencode
+
+
+class ResponseCache:
+    """
+    On-disk cache of raw response bodies keyed by endpoint plus normalized parameters.
+
+    - every entry has its own expiry (ttl)
+    - total stored bytes are capped, least recently used entries are evicted first
+    - offline mode serves only from the cache, expired entries included
+    - ETag / Last-Modified validators are kept so expired entries can be
+      revalidated with a conditional request; a 304 just extends the expiry
+    """
+
+    IGNORED_PARAMS = ("api_key",)
+    TOUCH_FLUSH = 100 #access-time updates buffered before a commit
+
+    def __init__(self, path = "fdc_cache.db", ttl = 7 * 24 * 3600, max_bytes = 256 * 1024 * 1024, offline = False):
+        """
+        Args:
+            path (str): SQLite database file (":memory:" for a throwaway cache).
+            ttl (float): Default seconds an entry stays fresh.
+            max_bytes (int): Cap on the total size of cached bodies.
+            offline (bool): Serve only from cache and never touch the network.
+        """
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be positive.")
+        self._path = path
+        self._ttl = ttl
+        self._max_bytes = max_bytes
+        self._offline = offline
+        self._lock = threading.Lock()
+        self._pending_touches = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.revalidations = 0 #expired entries refreshed by a 304
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, body BLOB NOT NULL, size INTEGER NOT NULL, "
+            "expires REAL NOT NULL, last_access REAL NOT NULL, etag TEXT, last_modified TEXT)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(responses)")}
+        for column in ("etag", "last_modified"):
+            if column not in columns: #cache files created before validators were stored
+                self._conn.execute(f"ALTER TABLE responses ADD COLUMN {column} TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_access)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def ttl(self) -> float:
+        return self._ttl
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes
+
+    @property
+    def size(self) -> int:
+        """Total bytes of cached bodies"""
+        return self._size
+
+    @property
+    def offline(self) -> bool:
+        return self._offline
+
+    @offline.setter
+    def offline(self, value: bool):
+        self._offline = bool(value)
+
+    @staticmethod
+    def normalize_params(params) -> list:
+        """Returns params as a sorted list of (name, value) with api keys dropped and queries case/space folded"""
+        normalized = []
+        for name, value in (params or {}).items():
+            if name in ResponseCache.IGNORED_PARAMS or value is None:
+                continue
+            if isinstance(value, (list, tuple)):
+                value = ",".join(str(v) for v in value)
+            value = " ".join(str(value).split())
+            if name == "query":
+                value = value.lower()
+            normalized.append((name, value))
+        return sorted(normalized)
+
+    @classmethod
+    def make_key(cls, endpoint: str, params = None) -> str:
+        """Returns the cache key for endpoint called with params"""
+        return f"{endpoint}?{urlencode(cls.normalize_params(params))}"
+
+    def get(self, key: str, allow_stale = False):
+        """Returns the cached body for key, or None if missing or expired (unless allow_stale or offline)"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT body, expires FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or (row[1] < now and not (allow_stale or self._offline)):
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._pending_touches += 1
+            if self._pending_touches >= self.TOUCH_FLUSH:
+                self._commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, body: bytes, ttl = None, etag = None, last_modified = None):
+        """
+        Stores body under key for ttl seconds (default ttl if None), evicting LRU entries past max_bytes.
+        etag / last_modified are the response's validators, used to revalidate the entry once it expires.
+        """
+        if isinstance(body, str):
+            body = body.encode()
+        size = len(body)
+        if size > self._max_bytes:
+            return
+        now = time.time()
+        expires = now + (self._ttl if ttl is None else ttl)
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, body, size, expires, last_access, etag, last_modified) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, body, size, expires, now, etag, last_modified),
+            )
+            self._size += size - (old[0] if old else 0)
+            self._evict()
+            self._commit()
+
+    def validators(self, key: str) -> dict:
+        """Returns the If-None-Match / If-Modified-Since headers that revalidate the entry for key (empty if none)"""
+        with self._lock:
+            row = self._conn.execute("SELECT etag, last_modified FROM responses WHERE key = ?", (key,)).fetchone()
+        headers = {}
+        if row is not None and row[0]:
+            headers["If-None-Match"] = row[0]
+        if row is not None and row[1]:
+            headers["If-Modified-Since"] = row[1]
+        return headers
+
+    def refresh(self, key: str, ttl = None) -> bool:
+        """Marks the entry for key fresh for another ttl seconds without rewriting its body. Returns False if missing."""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute("UPDATE responses SET expires = ?, last_access = ? WHERE key = ?",
+                                        (now + (self._ttl if ttl is None else ttl), now, key))
+            self._commit()
+            if cursor.rowcount == 0:
+                return False
+            self.revalidations += 1
+            return True
+
+    def _evict(self):
+        """Deletes least recently used entries until the cache fits in max_bytes. Caller holds the lock."""
+        while self._size > self._max_bytes:
+            rows = self._conn.execute("SELECT key, size FROM responses ORDER BY last_access LIMIT 64").fetchall()
+            if not rows:
+                self._size = 0
+                return
+            for key, size in rows:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._size -= size
+                self.evictions += 1
+                if self._size <= self._max_bytes:
+                    break
+
+    def invalidate(self, key = None):
+        """Removes one entry, or every entry if key is None"""
+        with self._lock:
+            if key is None:
+                self._conn.execute("DELETE FROM responses")
+            else:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            self._commit()
+
+    def _commit(self):
+        self._conn.commit()
+        self._pending_touches = 0
+
+    def close(self):
+        with self._lock:
+            self._commit()
+            self._conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def __repr__(self):
+        return f"ResponseCache(path={self._path!r}, size={self._size}, max_bytes={self._max_bytes}, offline={self._offline})"
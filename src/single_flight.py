@@ -0,0 +1,54 @@
+"""
+single_flight.py
+Request coalescing: concurrent identical calls share one execution.
+"""
+
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time. Callers that arrive while a call
+    for their key is in flight wait for it and receive the same result (or exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = {} #key -> Future
+        self.calls = 0 #calls actually executed
+        self.shared = 0 #callers served by another caller's call (requests saved)
+
+    def do(self, key, func, *args, **kwargs):
+        """Returns func(*args, **kwargs), sharing the call with concurrent callers using the same key"""
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def stats(self) -> dict:
+        """Returns executed calls, shared callers and calls currently in flight"""
+        return {"calls": self.calls, "shared": self.shared, "in_flight": len(self._in_flight)}
+
+    def __repr__(self):
+        return f"SingleFlight(calls={self.calls}, shared={self.shared})"
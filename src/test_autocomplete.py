@@ -0,0 +1,117 @@
+# --------------------------------------------
+# === Unit tests for PrefixIndex ===
+# --------------------------------------------
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import autocomplete
+from autocomplete import PrefixIndex, normalize_prefix
+from food_index import FoodIndex
+from foodcentral_manager import FCManager
+from test_foodcentral_manager import make_food
+
+
+class TestPrefixIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = PrefixIndex()
+        self.index.add_foods([make_food(1, "KIT KAT", brandOwner="Hershey"), make_food(2, "KIT KAT MINIS", brandOwner="Hershey"),
+                              make_food(3, "KITCHEN SINK COOKIE", brandOwner=None), make_food(4, "Crème Brûlée", brandOwner=None),
+                              {"description": "no id"}])
+
+    def ids(self, prefix, k = 5):
+        return [fdc_id for fdc_id, _ in self.index.suggest(prefix, k)]
+
+    def test_prefixes_of_any_word(self):
+        self.assertEqual(normalize_prefix("  Kit-Kat "), "kit kat ")
+        self.assertEqual(self.ids("k"), [1, 3, 2]) #shorter texts first
+        self.assertEqual(self.ids("kit "), [1, 2])
+        self.assertEqual(self.ids("KAT"), [1, 2])
+        self.assertEqual(self.ids("hers"), [1, 2])
+        self.assertEqual(self.ids("creme b"), [4])
+        self.assertEqual(self.ids("s"), [3]) #first word before later words
+        self.assertEqual(self.ids("k", 1), [1])
+        self.assertEqual((self.ids("quinoa"), self.ids(" ")), ([], []))
+        self.assertEqual(self.index.suggest("kat", 1), [(1, "KIT KAT (Hershey)")])
+
+    def test_popular_foods_first(self):
+        self.index.select(2)
+        self.index.select(2)
+        self.index.select(1)
+        self.assertEqual(self.ids("k"), [2, 1, 3])
+        self.assertEqual(self.ids("s"), [3])
+        self.assertEqual(self.index.popularity(2), 2)
+
+    def test_readded_foods_replace_old_text(self):
+        self.index.add_foods([make_food(1, "PEANUT BRITTLE")])
+        self.assertEqual(self.ids("kit "), [2])
+        self.assertEqual(self.ids("pea"), [1])
+        self.assertEqual(len(self.index), 4)
+
+    def test_block_heads_match_a_full_scan(self):
+        with patch.object(autocomplete, "BLOCKS", (8, 32)), patch.object(autocomplete, "HEAD", 8):
+            index = PrefixIndex()
+            for batch in range(3):
+                index.add_foods(make_food(batch * 100 + i, f"SNACK {'MIX ' * (i % 3)}{i}", brandOwner=None) for i in range(60))
+                index.suggest("s")
+            for fdc_id in (259, 158, 259): #long texts of late rows, outside the block heads
+                index.select(fdc_id)
+            for prefix in ("s", "snack m", "mix", "1"):
+                expected = [fdc_id for fdc_id, _ in index._rank(normalize_prefix(prefix), autocomplete.HEAD)]
+                self.assertEqual([fdc_id for fdc_id, _ in index.suggest(prefix, 2)], expected[:2], prefix)
+
+    def test_popularity_persists(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "autocomplete.json")
+            PrefixIndex(path).select(2)
+            PrefixIndex(path).select("2")
+            self.assertEqual(os.listdir(tmp), ["autocomplete.json"])
+            index = PrefixIndex(path)
+            self.assertEqual(index.popularity(2), 2)
+            index.add_foods([make_food(1, "KIT KAT"), make_food(2, "KIT KAT MINIS")])
+            self.assertEqual(index.suggest("kit")[0][0], 2)
+
+    def test_from_food_index(self):
+        foods = FoodIndex(":memory:")
+        foods.add_many([make_food(1, "KIT KAT"), make_food(2, "CHEERIOS")])
+        self.assertEqual(PrefixIndex.from_food_index(foods).suggest("che"), [(2, "CHEERIOS (Test Brand)")])
+
+    def test_background_load(self):
+        foods = FoodIndex(":memory:")
+        foods.add_many([make_food(1, "KIT KAT"), make_food(2, "CHEERIOS")])
+        index = PrefixIndex.from_food_index(foods, background=True)
+        index.add_foods([make_food(2, "PEANUT BRITTLE", brandOwner=None)]) #ingested while loading: not replaced by the stored copy
+        self.assertEqual(index.suggest("kit"), [(1, "KIT KAT (Test Brand)")])
+        self.assertTrue(index.wait_loaded(0))
+        self.assertEqual(index.suggest("pea"), [(2, "PEANUT BRITTLE")])
+
+
+class TestKnownFoods(unittest.TestCase):
+
+    def setUp(self):
+        self.fc = FCManager(url="http://stand-in/fdc/v1", rate_limiter=None, index=FoodIndex(":memory:"),
+                            autocomplete=PrefixIndex(), prefetch_top=0)
+        self.fc.ingest([make_food(1, "KIT KAT"), make_food(2, "KIT KAT MINIS")])
+
+    def test_chosen_suggestion_skips_the_network(self):
+        with patch.object(self.fc, "_get") as get:
+            suggestions = self.fc.suggest("kit")
+            item = self.fc.known_food(suggestions[1][0])
+        get.assert_not_called()
+        self.assertEqual((item.name, item.fdc_id), ("KIT KAT MINIS", 2))
+        self.assertEqual([fdc_id for fdc_id, _ in self.fc.suggest("kit")], [2, 1])
+        self.assertIsNone(self.fc.known_food(3))
+
+    def test_only_user_choices_count(self):
+        with patch.object(self.fc, "_get_json", return_value=make_food(1, "KIT KAT")):
+            self.fc.get_item(1)
+        self.assertEqual(self.fc.autocomplete.popularity(1), 0)
+        self.fc.choose("1")
+        self.assertEqual(self.fc.autocomplete.popularity(1), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
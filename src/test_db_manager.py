@@ -0,0 +1,47 @@
+# --------------------------------------------------
+# === Unit tests for DBManager's pooled session ===
+# --------------------------------------------------
+
+import unittest
+from unittest.mock import patch
+
+from requests.adapters import HTTPAdapter
+
+from foodcentral_manager import FCManager
+from test_foodcentral_manager import make_food, make_response
+
+
+class TestPooledSession(unittest.TestCase):
+
+    def setUp(self):
+        self.fc = FCManager(url="https://stand-in/fdc/v1", rate_limiter=None, resilience=None, pool_connections=2, pool_maxsize=7)
+
+    def test_adapter_is_mounted_with_pool_sizes(self):
+        adapter = self.fc.session.get_adapter("https://stand-in/fdc/v1/food/1")
+        self.assertIsInstance(adapter, HTTPAdapter)
+        self.assertIs(self.fc.session.get_adapter("http://stand-in/fdc/v1/food/1"), adapter)
+        self.assertEqual((adapter._pool_connections, adapter._pool_maxsize), (2, 7))
+        self.assertEqual(self.fc.pool_maxsize, 7)
+
+    def test_requests_share_one_session_and_adapter(self):
+        session = self.fc.session
+        adapter = session.get_adapter("https://stand-in/fdc/v1/food/1")
+        response = make_response(make_food(1))
+        response.is_redirect = False
+        with patch.object(HTTPAdapter, "send", autospec=True, return_value=response) as send:
+            self.fc._get("/food/1")
+            self.fc._get("/food/2")
+            self.fc._get("/food/3", timeout=5)
+        self.assertIs(self.fc.session, session)
+        self.assertEqual([call.args[0] for call in send.call_args_list], [adapter] * 3)
+        self.assertEqual([call.kwargs["timeout"] for call in send.call_args_list], [(3.05, 15), (3.05, 15), 5])
+
+    def test_close_releases_the_session(self):
+        adapter = self.fc.session.get_adapter("https://stand-in/fdc/v1/food/1")
+        with patch.object(HTTPAdapter, "close", autospec=True) as close:
+            self.fc.close()
+        close.assert_called_with(adapter)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+# --------------------------------------------
+# === Unit tests for FilterIndex ===
+# --------------------------------------------
+
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+import filter_index
+from filter_index import FilterIndex, food_flags, gluten_free, high_protein, split_filters, vegan
+from food_index import FoodIndex
+from foodcentral_manager import FCManager
+from test_foodcentral_manager import make_food
+
+
+class TestFilters(unittest.TestCase):
+
+    def test_split_filters(self):
+        self.assertEqual(split_filters("Vegan  low sugar or LOW-FAT yogurt"), ("yogurt", [("vegan",), ("low sugar", "low fat")]))
+        self.assertEqual(split_filters("gluten free bread"), ("bread", [("gluten free",)]))
+        self.assertEqual(split_filters("veganism cookbook"), ("veganism cookbook", []))
+
+    def test_predicates(self):
+        self.assertTrue(vegan(make_food(1, ingredients="OATS, COCONUT MILK, COCOA BUTTER", nutrients={})))
+        self.assertFalse(vegan(make_food(1, ingredients="SUGAR, MILK, EGGS", nutrients={})))
+        self.assertFalse(vegan(make_food(1, "KIT KAT", ingredients=None, nutrients={}))) #branded without ingredients: unknown
+        self.assertTrue(vegan(make_food(1, "Apples, raw", ingredients=None, dataType="Foundation", nutrients={})))
+        self.assertFalse(gluten_free(make_food(1, ingredients="ENRICHED WHEAT FLOUR, SUGAR", nutrients={})))
+        self.assertTrue(gluten_free(make_food(1, "GLUTEN-FREE BREAD", ingredients="RICE FLOUR, XANTHAN GUM", nutrients={})))
+        self.assertTrue(high_protein(make_food(1, nutrients={"203": 25, "208": 400})))
+        self.assertFalse(high_protein(make_food(1, nutrients={"203": 5, "208": 400})))
+        self.assertEqual(food_flags(make_food(1, ingredients="RICE", nutrients={"269": 1, "204": 10})), 0b110001)
+
+
+class TestFilterIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = FilterIndex(":memory:")
+        self.index.add_foods([make_food(1, ingredients="OATS, SUGAR", nutrients={"269": 20, "204": 1}),
+                              make_food(2, ingredients="MILK, SUGAR", nutrients={"269": 4, "204": 2}),
+                              make_food(3, ingredients="RICE", nutrients={"269": 0, "204": 8}),
+                              make_food(4, ingredients="WHEAT, MILK", nutrients={"269": 30, "204": 9})])
+
+    def test_and_or(self):
+        self.assertEqual(self.index.ids([("low sugar",)]), [2, 3])
+        self.assertEqual(self.index.ids([("low sugar",), ("low fat",)]), [2])
+        self.assertEqual(self.index.ids([("low sugar", "low fat")]), [1, 2, 3])
+        self.assertEqual(self.index.ids([("vegan",), ("gluten free",)]), [1, 3])
+        self.assertEqual(self.index.count([]), 4)
+        self.assertEqual(self.index.keep([4, 3, 9, 2, 1], [("low sugar",)]), [3, 2])
+        self.assertEqual(self.index.flags(3), ["low sugar", "gluten free", "vegan"])
+        with self.assertRaises(ValueError):
+            self.index.match([("low salt",)])
+
+    def test_readded_food_replaces_its_bits(self):
+        self.index.add_foods([make_food(3, ingredients="BUTTER", nutrients={"269": 10, "204": 80})])
+        self.assertEqual(self.index.ids([("low sugar",)]), [2])
+        self.assertEqual(self.index.ids([("gluten free",)]), [1, 2, 3])
+        self.assertEqual(len(self.index), 4)
+
+    def test_grows_past_its_capacity(self):
+        self.index.add_foods(make_food(i, ingredients="RICE", nutrients={"269": i % 7}) for i in range(10, 3000))
+        self.assertEqual(self.index.count([("low sugar",)]), 2 + sum(1 for i in range(10, 3000) if i % 7 <= 5))
+
+    def test_persists_and_recomputes_for_new_thresholds(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "filters.db")
+            FilterIndex(path).add_foods([make_food(1, ingredients=None, nutrients={"269": 4})])
+            self.assertEqual(FilterIndex(path).ids([("low sugar",)]), [1])
+            with patch.object(filter_index, "LOW_SUGAR_MAX", 3.0):
+                self.assertEqual(len(FilterIndex(path)), 0)
+
+    def test_from_food_index(self):
+        foods = FoodIndex(":memory:")
+        foods.add_many([make_food(1, "KIT KAT"), make_food(2, "CHEERIOS")])
+        self.assertEqual(FilterIndex.from_food_index(foods, ":memory:").ids([("vegan",)]), [1, 2])
+
+    def test_background_load_keeps_newer_foods(self):
+        foods = FoodIndex(":memory:")
+        foods.add_many([make_food(1, "KIT KAT"), make_food(2, "CHEERIOS")])
+        with patch.object(threading.Thread, "start"): #fill by hand below
+            index = FilterIndex.from_food_index(foods, ":memory:", background=True)
+        self.assertFalse(index.wait_loaded(0))
+        milk = make_food(2, "CHEERIOS")
+        milk["ingredients"] = "OATS, MILK"
+        index.add_foods([milk]) #ingested while loading
+        index._fill(foods, batch=1)
+        self.assertTrue(index.wait_loaded(0))
+        self.assertEqual(index.ids([("vegan",)]), [1])
+        self.assertEqual(len(index), 2)
+
+
+class TestFilteredSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.fc = FCManager(url="http://stand-in/fdc/v1", rate_limiter=None, index=FoodIndex(":memory:"),
+                            filters=FilterIndex(":memory:"), prefetch_top=0)
+        milk = make_food(2, "CHOCOLATE BAR MILK")
+        milk["ingredients"] = "SUGAR, MILK"
+        self.fc.ingest([make_food(1, "CHOCOLATE BAR"), milk, make_food(3, "DARK CHOCOLATE BAR")])
+
+    def test_local_candidates_are_filtered_before_ranking(self):
+        with patch.object(self.fc, "_get") as get, patch.object(self.fc, "get_relevant", wraps=self.fc.get_relevant) as rank:
+            result = self.fc.searchDB("vegan chocolate bar")
+        get.assert_not_called()
+        self.assertEqual(sorted(food["fdcId"] for food in rank.call_args.args[1]), [1, 3])
+        self.assertEqual(rank.call_args.args[0], "chocolate bar")
+        self.assertEqual(sorted(item.fdc_id for item in result), [1, 3])
+
+    def test_api_results_are_filtered(self):
+        beef = make_food(5, "BEEF JERKY")
+        beef["ingredients"] = "BEEF, SALT"
+        data = {"totalHits": 2, "foods": [beef, make_food(6, "JERKY SOY")]}
+        with patch.object(self.fc, "_get_json", return_value=data) as get:
+            item = self.fc.searchDB("vegan jerky")
+        self.assertEqual(get.call_args.args[1]["query"], "jerky")
+        self.assertEqual(item.fdc_id, 6)
+        self.assertIn(5, self.fc.index)
+
+
+if __name__ == "__main__":
+    unittest.main()
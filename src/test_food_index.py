@@ -0,0 +1,85 @@
+# --------------------------------------------------
+# === Unit tests for FoodIndex ===
+# --------------------------------------------------
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from food_index import FoodIndex
+from text_analyzer import tokenize
+from foodcentral_manager import FCManager
+from test_foodcentral_manager import make_food, make_response
+
+
+class TestFoodIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "index.db")
+        self.index = FoodIndex(self.path)
+        self.index.add_many([make_food(1, "KIT KAT, CRISP WAFERS"), make_food(2, "KIT KAT MINI KIT"),
+                             make_food(3, "CHEERIOS CEREAL")])
+
+    def tearDown(self):
+        self.index.close()
+        self.tmp.cleanup()
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize("Nut 'n Berry MIX, 12oz"), ["nut", "n", "berry", "mix", "12oz"])
+
+    def test_all_query_tokens_must_match(self):
+        self.assertEqual(self.index.search_ids("kit kat"), [2, 1])
+        self.assertEqual(self.index.search_ids("kat cereal"), [])
+        self.assertEqual([food["fdcId"] for food in self.index.search("cereal")], [3])
+
+    def test_searches_ingredients_and_upc(self):
+        self.assertEqual(len(self.index.search_ids("wheat flour")), 3)
+        self.assertEqual(len(self.index.search_ids("012345678905")), 3)
+
+    def test_plural_and_singular_match(self):
+        self.index.add(make_food(4, "CHOCOLATE CHIP COOKIES"))
+        self.assertEqual(self.index.search_ids("cookie"), [4])
+        self.assertEqual(self.index.search_ids("chocolate chip cookies"), [4])
+
+    def test_iter_field_values_reads_in_batches(self):
+        self.assertEqual(list(self.index.iter_field_values("description", batch=2)), sorted(self.index.field_values("description")))
+
+    def test_readding_replaces_postings(self):
+        self.index.add(make_food(3, "OAT RINGS"))
+        self.assertEqual(self.index.search_ids("cheerios"), [])
+        self.assertEqual(self.index.search_ids("oat rings"), [3])
+        self.assertEqual(len(self.index), 3)
+
+    def test_persists_between_instances(self):
+        self.index.close()
+        self.index = FoodIndex(self.path)
+        self.assertEqual(self.index.search_ids("cheerios"), [3])
+
+
+class TestIndexedSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.index = FoodIndex(":memory:")
+        self.fc = FCManager(url="http://stand-in/fdc/v1", index=self.index, prefetch_top=0)
+
+    def test_fetched_foods_answer_later_searches_locally(self):
+        data = {"totalHits": 2, "foods": [make_food(1, "KIT KAT"), make_food(2, "KIT KAT MINI")]}
+        with patch.object(self.fc, "_get", return_value=make_response(data)) as get:
+            self.fc.searchDB("kit kat")
+            self.fc.invalidate_search()
+            results = self.fc.searchDB("Kat mini")
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(results.name, "KIT KAT MINI")
+
+    def test_local_miss_falls_back_to_api(self):
+        data = {"totalHits": 1, "foods": [make_food(5, "CHEERIOS")]}
+        with patch.object(self.fc, "_get", return_value=make_response(data)) as get:
+            self.assertEqual(self.fc.searchDB("cheerios").name, "CHEERIOS")
+        self.assertEqual(get.call_count, 1)
+        self.assertIn(5, self.index)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,375 @@
+# --------------------------------------------------
+# === Unit tests for FCManager (no network) ===
+# --------------------------------------------------
+
+import asyncio
+import json
+import requests
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from foodcentral_manager import FCManager, FOODS_BATCH_LIMIT, ANALYZER_NUTRIENTS
+from async_fc_manager import AsyncFCManager
+from lru_cache import LRUCache, approx_size
+from key_store import KeyStore
+from json_stream import iter_array_items
+from food_item import BrandedFoodItem, FoundationFoodItem, FoodItem
+from food_index import FoodIndex
+
+
+NUTRIENT_NAMES = {"203": "Protein", "204": "Total lipid (fat)", "205": "Carbohydrate, by difference", "208": "Energy",
+                  "269": "Sugars, total including NLEA", "291": "Fiber, total dietary"}
+
+
+def make_food(fdc_id, description="TEST FOOD", full_format=False, nutrients=None, **fields):
+    """
+    Returns a branded FDC record, nutrients in search shape or /food full format.
+    nutrients ({number: amount}) replaces the default protein, fat, carbohydrate and energy;
+    fields replace record keys (ingredients, brandOwner, dataType, ...).
+    """
+    if nutrients is None:
+        nutrients = {"203": 10, "204": 5, "205": 20, "208": 165}
+    if full_format:
+        food_nutrients = [{"nutrient": {"id": 1000 + int(num), "number": num, "name": NUTRIENT_NAMES[num], "unitName": "g"}, "amount": value}
+                          for num, value in nutrients.items()]
+    else:
+        food_nutrients = [{"nutrientName": NUTRIENT_NAMES[num], "nutrientNumber": num, "unitName": "G", "value": value}
+                          for num, value in nutrients.items()]
+    food = {"fdcId": fdc_id, "dataType": "Branded", "description": description, "brandOwner": "Test Brand",
+            "ingredients": "SUGAR, WHEAT FLOUR", "gtinUpc": "012345678905", "foodNutrients": food_nutrients}
+    food.update(fields)
+    return food
+
+
+def make_response(data, status=200):
+    response = MagicMock()
+    response.status_code = status
+    response.json.return_value = data
+    response.content = json.dumps(data).encode()
+    response.headers = {}
+    return response
+
+
+class TestGetItems(unittest.TestCase):
+
+    def setUp(self):
+        self.fc = FCManager(url="http://stand-in/fdc/v1")
+
+    def fake_foods(self, path, params=None, **kwargs):
+        ids = params["fdcIds"].split(",")
+        # server answers out of order and in full format
+        return make_response([make_food(int(i), f"FOOD {i}", full_format=True) for i in reversed(ids)])
+
+    def test_chunks_and_keeps_order(self):
+        ids = list(range(1, FOODS_BATCH_LIMIT * 2 + 6))
+        with patch.object(self.fc, "_get", side_effect=self.fake_foods) as get:
+            items = self.fc.get_items(ids)
+        self.assertEqual(get.call_count, 3)
+        self.assertEqual([item.name for item in items], [f"FOOD {i}" for i in ids])
+        self.assertIsInstance(items[0], BrandedFoodItem)
+        self.assertEqual(items[0].protein, 10)
+
+    def test_projection_params(self):
+        abridged = {"fdcId": 1, "dataType": "Branded", "description": "TEST FOOD", "brandOwner": "Test Brand",
+                    "gtinUpc": "012345678905", "foodNutrients": [{"number": "203", "name": "Protein", "amount": 10, "unitName": "G"}]}
+        with patch.object(self.fc, "_get", return_value=make_response([abridged])) as get:
+            items = self.fc.get_items([1], abridged=True, nutrients=ANALYZER_NUTRIENTS)
+        params = get.call_args.args[1]
+        self.assertEqual(params["format"], "abridged")
+        self.assertEqual(params["nutrients"], ",".join(ANALYZER_NUTRIENTS))
+        self.assertEqual(items[0].protein, 10)
+
+    def test_trimmed_records_do_not_replace_indexed_ones(self):
+        fc = FCManager(url="http://stand-in/fdc/v1", index=FoodIndex(":memory:"), prefetch_top=0)
+        food = make_food(9, "PEANUT BAR")
+        food["ingredients"] = "PEANUTS, SUGAR"
+        fc.ingest([food])
+        trimmed = {"fdcId": 9, "dataType": "Branded", "description": "PEANUT BAR", "foodNutrients": []}
+        with patch.object(fc, "_get", return_value=make_response(trimmed)):
+            fc.get_item(9, abridged=True, nutrients=("203",))
+        with patch.object(fc, "_get", return_value=make_response([trimmed])):
+            fc.get_items([9], abridged=True)
+        self.assertEqual(fc.index.search_ids("peanuts"), [9])
+        self.assertEqual(fc.index.get_foods([9])[0]["ingredients"], "PEANUTS, SUGAR")
+
+    def test_missing_ids_are_none(self):
+        with patch.object(self.fc, "_get", return_value=make_response([make_food(2)])):
+            items = self.fc.get_items([1, 2])
+        self.assertIsNone(items[0])
+        self.assertEqual(items[1].name, "TEST FOOD")
+
+
+class TestCreateFoodItem(unittest.TestCase):
+
+    def setUp(self):
+        self.fc = FCManager(url="http://stand-in/fdc/v1", rate_limiter=None)
+
+    def test_foundation_food(self):
+        item = self.fc.create_food_item({"fdcId": 7, "dataType": "Foundation", "description": "Apples, raw",
+                                         "scientificName": "Malus domestica", "foodNutrients": []})
+        self.assertIsInstance(item, FoundationFoodItem)
+        self.assertEqual((item.scientific_name, item.fdc_id), ("Malus domestica", 7))
+
+    def test_missing_optional_fields(self):
+        item = self.fc.create_food_item({"fdcId": 8, "dataType": "Foundation", "description": "Beans"})
+        self.assertEqual(type(item), FoodItem)
+        food = make_food(9)
+        del food["ingredients"], food["brandOwner"]
+        item = self.fc.create_food_item(food)
+        self.assertIsInstance(item, BrandedFoodItem)
+        self.assertEqual((item.ingredients, item.brand_name), ([], ""))
+
+
+class TestSearchCache(unittest.TestCase):
+
+    def setUp(self):
+        self.fc = FCManager(url="http://stand-in/fdc/v1", prefetch_top=0)
+        self.data = {"totalHits": 2, "foods": [make_food(1, "KIT KAT"), make_food(2, "KIT KAT MINI")]}
+
+    def test_repeat_search_is_served_from_memory(self):
+        with patch.object(self.fc, "_get", return_value=make_response(self.data)) as get, \
+             patch.object(self.fc, "get_relevant", wraps=self.fc.get_relevant) as rank:
+            first = self.fc.searchDB("Kit Kat")
+            second = self.fc.searchDB("  kit   KAT ")
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(rank.call_count, 1)
+        self.assertEqual([f.name for f in first], [f.name for f in second])
+        self.assertEqual(self.fc.search_cache.stats()["hits"], 1)
+
+    def test_invalidate_search(self):
+        with patch.object(self.fc, "_get", return_value=make_response(self.data)) as get:
+            self.fc.searchDB("kit kat")
+            self.fc.invalidate_search("Kit Kat")
+            self.fc.searchDB("kit kat")
+        self.assertEqual(get.call_count, 2)
+
+    def test_memory_budget_evicts(self):
+        cache = LRUCache(max_entries=10, max_bytes=1000, sizeof=len)
+        cache.put("a", "x" * 600)
+        cache.put("b", "y" * 600)
+        self.assertNotIn("a", cache)
+        self.assertEqual(cache.evictions, 1)
+        self.assertLessEqual(cache.bytes, 1000)
+
+    def test_built_items_are_charged_to_the_cache(self):
+        with patch.object(self.fc, "_get", return_value=make_response(self.data)):
+            results = self.fc.searchDB("kit kat")
+        stored = self.fc.search_cache.bytes
+        list(results)
+        self.assertEqual(self.fc.search_cache.bytes, stored + sum(map(approx_size, results)))
+        self.fc.search_cache.invalidate()
+        results[0]
+        self.assertEqual(self.fc.search_cache.bytes, 0)
+
+
+class TestIterSearch(unittest.TestCase):
+
+    def test_walks_every_page_lazily(self):
+        fc = FCManager(url="http://stand-in/fdc/v1")
+        requested = []
+
+        def fake_get(path, params=None, **kwargs):
+            page = params["pageNumber"]
+            requested.append(page)
+            foods = [make_food(page * 10 + i, f"FOOD {page}-{i}") for i in range(2)]
+            return make_response({"totalHits": 6, "totalPages": 3, "currentPage": page, "foods": foods})
+
+        with patch.object(fc, "_get", side_effect=fake_get):
+            results = fc.iter_search("food", page_size=2)
+            self.assertEqual(next(results).name, "FOOD 1-0")
+            names = ["FOOD 1-0"] + [item.name for item in results]
+        self.assertEqual(names, [f"FOOD {p}-{i}" for p in (1, 2, 3) for i in range(2)])
+        self.assertEqual(requested, [1, 2, 3])
+
+    def test_max_pages(self):
+        fc = FCManager(url="http://stand-in/fdc/v1")
+        data = {"totalHits": 100, "totalPages": 50, "foods": [make_food(1)]}
+        with patch.object(fc, "_get", return_value=make_response(data)) as get:
+            self.assertEqual(len(list(fc.iter_search("food", max_pages=2))), 2)
+        self.assertEqual(get.call_count, 2)
+
+
+class TestLazyKeyValidation(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = KeyStore(os.path.join(self.tmp.name, "keys.json"))
+        self.fc = FCManager(url="http://stand-in/fdc/v1", key_store=self.store, rate_limiter=None)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_setting_key_makes_no_request(self):
+        with patch.object(self.fc.session, "get") as get:
+            self.fc.key = "MY_KEY"
+        get.assert_not_called()
+        self.assertEqual(self.fc.key, "MY_KEY")
+
+    def test_first_request_validates_and_remembers(self):
+        self.fc.key = "MY_KEY"
+        with patch.object(self.fc.session, "get", return_value=make_response(make_food(1))):
+            self.fc.get_item(1)
+        self.assertTrue(self.store.is_valid("MY_KEY"))
+        self.assertEqual(KeyStore(self.store.path).last_key(), "MY_KEY")
+
+    def test_rejected_key_falls_back_to_default(self):
+        self.fc.key = "BAD_KEY"
+        responses = [make_response({}, status=403), make_response(make_food(1))]
+        with patch.object(self.fc.session, "get", side_effect=responses) as get:
+            self.assertEqual(self.fc.get_item(1), make_food(1))
+        self.assertEqual(get.call_args.kwargs["params"]["api_key"], "DEMO_KEY")
+        self.assertEqual(self.fc.key, "DEMO_KEY")
+        self.assertFalse(self.store.is_valid("BAD_KEY"))
+
+    def test_default_key_is_remembered_as_last(self):
+        self.fc.key = "DEMO_KEY"
+        self.assertEqual(KeyStore(self.store.path).last_key(), "DEMO_KEY")
+        self.store.remember("MY_KEY")
+        self.fc.key = "DEMO_KEY"
+        self.assertEqual(KeyStore(self.store.path).last_key(), "DEMO_KEY")
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_concurrent_identical_lookups_share_one_request(self):
+        fc = FCManager(url="http://stand-in/fdc/v1")
+        release = threading.Event()
+
+        def slow_get(path, params=None, **kwargs):
+            release.wait(1)
+            return make_response(make_food(1))
+
+        results = []
+        with patch.object(fc, "_get", side_effect=slow_get) as get:
+            threads = [threading.Thread(target=lambda: results.append(fc.get_item(1))) for _ in range(5)]
+            for thread in threads:
+                thread.start()
+            while fc.single_flight.shared < 4:
+                time.sleep(0.001)
+            release.set()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(fc.single_flight.stats()["shared"], 4)
+        self.assertEqual(results, [make_food(1)] * 5)
+        self.assertIsNot(results[0], results[1])
+
+    def test_key_change_keeps_the_counters(self):
+        fc = FCManager(url="http://stand-in/fdc/v1")
+        flight = fc.single_flight
+        fc.key = "MY_KEY"
+        fc.cache = None
+        self.assertIs(fc.single_flight, flight)
+
+
+class TestPrefetch(unittest.TestCase):
+
+    def setUp(self):
+        self.fc = FCManager(url="http://stand-in/fdc/v1", prefetch_top=2)
+        self.data = {"totalHits": 3, "foods": [make_food(1, "KIT KAT"), make_food(2, "KIT KAT MINI"), make_food(3, "KIT KAT BIG")]}
+
+    def fake_get(self, path, params=None, **kwargs):
+        if path == "/foods/search":
+            return make_response(self.data)
+        return make_response(make_food(int(path.rsplit("/", 1)[1]), full_format=True))
+
+    def test_top_hits_open_from_memory(self):
+        with patch.object(self.fc, "_get", side_effect=self.fake_get) as get:
+            results = self.fc.searchDB("kit kat")
+            self.fc._prefetch_pool.shutdown(wait=True)
+            self.assertEqual(get.call_count, 3)
+            self.assertEqual(self.fc.get_item(results[0].fdc_id)["fdcId"], results[0].fdc_id)
+            self.assertEqual(self.fc.get_item(results[1].fdc_id)["fdcId"], results[1].fdc_id)
+            self.assertEqual(get.call_count, 3)
+            self.fc.get_item(results[2].fdc_id)
+            self.assertEqual(get.call_count, 4)
+        self.assertEqual(self.fc.prefetched, 2)
+
+    def test_budget_limits_speculative_requests(self):
+        fc = FCManager(url="http://stand-in/fdc/v1", prefetch_top=2, prefetch_budget=1)
+        with patch.object(fc, "_get", side_effect=self.fake_get):
+            fc.searchDB("kit kat")
+            fc._prefetch_pool.shutdown(wait=True)
+        self.assertEqual(fc.prefetched, 1)
+
+
+class TestStreamSearch(unittest.TestCase):
+
+    def test_items_decoded_across_any_chunking(self):
+        doc = {"totalHits": 3, "foods": [{"a": [1, {"b": "}]\\\""}]}, 12.5e3, "é", None], "aggregations": {"x": 3.25}}
+        raw = json.dumps(doc, ensure_ascii=False).encode()
+        for size in range(1, 8):
+            meta = {}
+            chunks = [raw[i:i + size] for i in range(0, len(raw), size)]
+            self.assertEqual(list(iter_array_items(chunks, "foods", meta)), doc["foods"])
+            self.assertEqual(meta, {"totalHits": 3, "aggregations": {"x": 3.25}})
+
+    def test_stream_search_yields_food_items(self):
+        fc = FCManager(url="http://stand-in/fdc/v1")
+        raw = json.dumps({"totalHits": 2, "foods": [make_food(1), make_food(2)]}).encode()
+        response = make_response(None)
+        response.iter_content.return_value = [raw[i:i + 50] for i in range(0, len(raw), 50)]
+        meta = {}
+        with patch.object(fc, "_get", return_value=response) as get:
+            items = list(fc.stream_search("test", meta=meta))
+        self.assertTrue(get.call_args.kwargs["stream"])
+        self.assertEqual(len(items), 2)
+        self.assertIsInstance(items[0], BrandedFoodItem)
+        self.assertEqual(meta["totalHits"], 2)
+        response.close.assert_called_once()
+
+    def test_stream_search_failures_end_the_results(self):
+        fc = FCManager(url="http://stand-in/fdc/v1")
+        with patch.object(fc, "_get", side_effect=requests.ConnectionError("refused")):
+            self.assertEqual(list(fc.stream_search("test")), [])
+
+    def test_stream_search_feeds_any_configured_index(self):
+        filters = MagicMock()
+        fc = FCManager(url="http://stand-in/fdc/v1", filters=filters)
+        response = make_response(None)
+        response.iter_content.return_value = [json.dumps({"foods": [make_food(1)]}).encode()]
+        with patch.object(fc, "_get", return_value=response):
+            list(fc.stream_search("test"))
+        self.assertEqual(filters.add_foods.call_args.args[0], [make_food(1)])
+
+
+class TestAsyncFCManager(unittest.TestCase):
+
+    def test_concurrency_is_bounded(self):
+        afc = AsyncFCManager(url="http://stand-in/fdc/v1", max_concurrency=3)
+        lock = threading.Lock()
+        state = {"active": 0, "peak": 0}
+
+        def fake_get(path, params=None, **kwargs):
+            with lock:
+                state["active"] += 1
+                state["peak"] = max(state["peak"], state["active"])
+            time.sleep(0.01)
+            with lock:
+                state["active"] -= 1
+            return make_response(make_food(int(path.rsplit("/", 1)[1])))
+
+        async def fetch_all():
+            return await asyncio.gather(*(afc.get_item(i) for i in range(12)))
+
+        with patch.object(afc.manager, "_get", side_effect=fake_get):
+            foods = asyncio.run(fetch_all())
+        afc.close()
+        self.assertEqual([food["fdcId"] for food in foods], list(range(12)))
+        self.assertLessEqual(state["peak"], 3)
+
+    def test_search_builds_food_items(self):
+        afc = AsyncFCManager(url="http://stand-in/fdc/v1")
+        data = {"totalHits": 1, "foods": [make_food(7)]}
+        with patch.object(afc.manager, "_get", return_value=make_response(data)):
+            item = asyncio.run(afc.searchDB("test food"))
+        afc.close()
+        self.assertIsInstance(item, BrandedFoodItem)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+# --------------------------------------------
+# === Unit tests for GtinIndex ===
+# --------------------------------------------
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from food_index import FoodIndex
+from foodcentral_manager import FCManager
+from gtin_index import GtinIndex, check_digit, normalize_gtin, short_gtin
+from test_foodcentral_manager import make_food
+
+
+class TestNormalizeGtin(unittest.TestCase):
+
+    def test_forms_of_one_code_are_equal(self):
+        forms = ["012345678905", "0012345678905", "00012345678905", "12345678905", "0-12345-67890-5", "000012345678905"]
+        self.assertEqual({normalize_gtin(code) for code in forms}, {"00012345678905"})
+        self.assertEqual(normalize_gtin("4006381333931"), "04006381333931")
+        self.assertEqual(short_gtin("00012345678905"), "012345678905")
+        self.assertEqual(short_gtin("04006381333931"), "4006381333931")
+
+    def test_invalid_codes(self):
+        self.assertEqual(check_digit("01234567890"), 5)
+        for code in ("012345678904", "1234567", "00000000000000", "ABC123456789", ""):
+            self.assertIsNone(normalize_gtin(code), code)
+
+
+class TestGtinIndex(unittest.TestCase):
+
+    def test_persists_across_runs(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "gtin.db")
+            index = GtinIndex(path)
+            self.assertEqual(index.add_foods([make_food(1), {"fdcId": 2, "gtinUpc": "012345678904"}, {"fdcId": 3}]), 1)
+            self.assertFalse(index.add("123", 4))
+            index.close()
+
+            index = GtinIndex(path)
+            self.assertEqual(index.lookup("0012345678905"), 1)
+            self.assertIsNone(index.lookup("4006381333931"))
+            self.assertEqual((index.hits, index.misses, len(index)), (1, 1, 1))
+            index.close()
+
+
+class TestUpcSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.fc = FCManager(url="http://stand-in/fdc/v1", rate_limiter=None, index=FoodIndex(":memory:"),
+                            gtins=GtinIndex(":memory:"), prefetch_top=0)
+
+    def test_known_barcode_skips_the_network(self):
+        self.fc.ingest([make_food(1, "KIT KAT")])
+        with patch.object(self.fc, "_get") as get:
+            item = self.fc.searchDB("0012345678905", 1)
+        get.assert_not_called()
+        self.assertEqual((item.name, item.fdc_id), ("KIT KAT", 1))
+
+    def test_unknown_barcode_keeps_only_the_exact_match(self):
+        other = make_food(2, "OTHER")
+        other["gtinUpc"] = "4006381333931"
+        data = {"totalHits": 2, "foods": [other, make_food(1, "KIT KAT")]}
+        with patch.object(self.fc, "_get_json", return_value=data) as get:
+            item = self.fc.searchDB("012345678905", 1)
+            again = self.fc.searchDB("00012345678905", 1)
+        get.assert_called_once()
+        self.assertEqual(get.call_args.args[1]["query"], "012345678905")
+        self.assertEqual(item.fdc_id, 1)
+        self.assertIs(again, item)
+        self.assertEqual(self.fc.gtins.lookup("4006381333931"), 2)
+
+    def test_invalid_check_digit(self):
+        with patch.object(self.fc, "_get_json") as get:
+            self.assertIsNone(self.fc.searchDB("012345678904", 1))
+        get.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
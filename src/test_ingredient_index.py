@@ -0,0 +1,148 @@
+# --------------------------------------------
+# === Unit tests for IngredientIndex ===
+# --------------------------------------------
+
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+import ingredient_index
+from food_index import FoodIndex
+from foodcentral_manager import FCManager
+from ingredient_index import IngredientIndex, food_allergens, ingredient_allergens, parse_ingredients, split_ingredient_clauses
+from ranking import RankedResults
+from test_foodcentral_manager import make_food
+
+
+class TestParsing(unittest.TestCase):
+
+    def test_parse_ingredients(self):
+        self.assertEqual(parse_ingredients("ENRICHED FLOUR (WHEAT FLOUR, NIACIN), SUGAR, CONTAINS 2% OR LESS OF: SALT."),
+                         ["enriched flour", "wheat flour", "niacin", "sugar", "salt"])
+        self.assertEqual(parse_ingredients("Ingredients: Peanuts, Sea Salt, and Sugar; Soy Lecithin (an emulsifier)"),
+                         ["peanuts", "sea salt", "sugar", "soy lecithin", "emulsifier"])
+        self.assertEqual(parse_ingredients("WATER, CITRIC ACID (TO PRESERVE FRESHNESS), VITAMIN B1.5, WATER"),
+                         ["water", "citric acid", "vitamin b1 5"])
+        self.assertEqual(parse_ingredients("Crème Fraîche, 1.5% MILKFAT"), ["creme fraiche", "milkfat"])
+        self.assertEqual((parse_ingredients(None), parse_ingredients("")), ([], []))
+
+    def test_allergens(self):
+        self.assertEqual(ingredient_allergens("whey protein concentrate"), {"milk"})
+        self.assertEqual(ingredient_allergens("coconut milk"), set())
+        self.assertEqual(ingredient_allergens("cream of tartar"), set())
+        self.assertEqual(ingredient_allergens("barley malt"), {"gluten"})
+        self.assertEqual(ingredient_allergens("rice malt"), set())
+        self.assertEqual(ingredient_allergens("enriched wheat flour"), {"wheat", "gluten"})
+        self.assertEqual(ingredient_allergens("pine nuts"), {"tree nut"})
+        self.assertEqual(food_allergens(make_food(1, ingredients="ROASTED PEANUTS, SOYBEAN OIL, EGGS")), {"peanut", "soy", "egg"})
+        self.assertEqual(food_allergens({"fdcId": 1, "dataType": "Foundation", "description": "Almonds, raw"}), {"tree nut"})
+
+    def test_split_clauses(self):
+        self.assertEqual(split_ingredient_clauses("Chocolate Bar contains peanut excludes soy and dairy"),
+                         ("chocolate bar", ["peanut"], ["soy", "dairy"]))
+        self.assertEqual(split_ingredient_clauses("granola without palm oil, honey"), ("granola", [], ["palm oil", "honey"]))
+        self.assertEqual(split_ingredient_clauses("bread free of gluten"), ("bread", [], ["gluten"]))
+        self.assertEqual(split_ingredient_clauses("peanut butter"), ("peanut butter", [], []))
+
+
+class TestIngredientIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = IngredientIndex(":memory:")
+        self.index.add_foods([make_food(1, ingredients="PEANUTS, SALT"),
+                              make_food(2, ingredients="SUGAR, SOY LECITHIN, PEANUT OIL"),
+                              make_food(3, ingredients="OATS, WHEY, PALM OIL"),
+                              make_food(4, ingredients="RICE, COCONUT MILK"),
+                              make_food(5, ingredients=None), {"ingredients": "no id"}])
+
+    def test_contains_and_excludes(self):
+        self.assertEqual(self.index.search("contains peanut"), [1, 2])
+        self.assertEqual(self.index.search("excludes soy and dairy"), [1, 4])
+        self.assertEqual(self.index.search("contains peanut excludes soya"), [1])
+        self.assertEqual(self.index.search("contains palm oil"), [3])
+        self.assertEqual(self.index.search("contains oil"), [2, 3])
+        self.assertEqual(self.index.query(excludes=["peanut"], limit=1), [3])
+        self.assertEqual(self.index.keep([4, 5, 2, 1], excludes=["milk"]), [4, 2, 1])
+        self.assertEqual(self.index.search("contains sesame"), [])
+        self.assertEqual((self.index.hits, self.index.misses), (6, 1))
+        self.assertEqual(len(self.index), 4)
+        self.assertNotIn(5, self.index)
+
+    def test_readded_food_replaces_its_postings(self):
+        self.index.add_foods([make_food(1, ingredients="ALMONDS, SALT")])
+        self.assertEqual(self.index.search("contains peanut"), [2])
+        self.assertEqual(self.index.search("contains nut"), [1])
+        self.assertIn("allergen:tree nut", self.index.terms(1))
+        self.assertEqual(len(self.index), 4)
+
+    def test_readded_food_without_ingredients_is_dropped(self):
+        self.assertEqual(self.index.add_foods([make_food(1, ingredients=None)]), 0)
+        self.assertEqual(self.index.search("contains peanut"), [2])
+        self.assertEqual(self.index.search("excludes soy"), [3, 4])
+        self.assertEqual(self.index.terms(1), set())
+        self.assertEqual(len(self.index), 3)
+        self.assertNotIn(1, self.index)
+
+    def test_persists_and_rebuilds_for_new_allergens(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "ingredients.db")
+            IngredientIndex(path).add_foods([make_food(1, ingredients="SESAME SEEDS")])
+            self.assertEqual(IngredientIndex(path).search("contains sesame"), [1])
+            allergens = dict(ingredient_index.ALLERGENS, sesame=("sesame", "tahini", "benne"))
+            with patch.object(ingredient_index, "ALLERGENS", allergens):
+                self.assertEqual(len(IngredientIndex(path)), 0)
+
+    def test_from_food_index(self):
+        foods = FoodIndex(":memory:")
+        foods.add_many([make_food(1, "KIT KAT"), make_food(2, "CHEERIOS")])
+        self.assertEqual(IngredientIndex.from_food_index(foods, ":memory:").search("contains wheat"), [1, 2])
+
+    def test_background_load_keeps_newer_foods(self):
+        foods = FoodIndex(":memory:")
+        foods.add_many([make_food(1, "KIT KAT"), make_food(2, "CHEERIOS")])
+        with patch.object(threading.Thread, "start"): #fill by hand below
+            index = IngredientIndex.from_food_index(foods, ":memory:", background=True)
+        self.assertFalse(index.wait_loaded(0))
+        index.add_foods([make_food(2, ingredients="OATS, SALT")]) #ingested while loading
+        index._fill(foods, batch=1)
+        self.assertTrue(index.wait_loaded(0))
+        self.assertEqual(index.search("contains wheat"), [1])
+        self.assertEqual(len(index), 2)
+
+
+class TestIngredientSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.fc = FCManager(url="http://stand-in/fdc/v1", rate_limiter=None, index=FoodIndex(":memory:"),
+                            ingredients=IngredientIndex(":memory:"), prefetch_top=0)
+        foods = [make_food(1, "CHOCOLATE BAR"), make_food(2, "PEANUT CHOCOLATE BAR"), make_food(3, "DARK CHOCOLATE BAR")]
+        foods[1]["ingredients"] = "SUGAR, PEANUTS, MILK"
+        foods[2]["ingredients"] = "COCOA, SUGAR"
+        self.fc.ingest(foods)
+
+    def test_clauses_filter_local_candidates(self):
+        with patch.object(self.fc, "_get") as get, patch.object(self.fc, "get_relevant", wraps=self.fc.get_relevant) as rank:
+            result = self.fc.searchDB("chocolate bar excludes dairy")
+        get.assert_not_called()
+        self.assertEqual(rank.call_args.args[0], "chocolate bar")
+        self.assertEqual(sorted(item.fdc_id for item in result), [1, 3])
+        self.assertEqual(self.fc.searchDB("chocolate bar contains peanut").fdc_id, 2)
+
+    def test_clauses_alone_are_answered_locally(self):
+        with patch.object(self.fc, "_get") as get:
+            result = self.fc.searchDB("excludes peanut")
+            missing = self.fc.searchDB("contains sesame")
+        get.assert_not_called()
+        self.assertIsInstance(result, RankedResults)
+        self.assertEqual([item.fdc_id for item in result], [1, 3])
+        self.assertIsNone(missing)
+
+    def test_branded_items_get_a_parsed_ingredient_list(self):
+        item = self.fc.create_food_item(make_food(1, "KIT KAT"))
+        self.assertEqual(item.ingredients, ["sugar", "wheat flour"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,196 @@
+# ----------------------------------------
+# === Unit tests for BM25 / CorpusStats ===
+# ----------------------------------------
+
+import math
+import os
+import random
+import tempfile
+import unittest
+
+from foodcentral_manager import FCManager
+from food_index import FoodIndex
+from text_analyzer import food_text, tokenize
+from ranking import BM25, CorpusStats, RankedResults, TermMatrix, VECTOR_MIN_DOCS, top_k
+from test_foodcentral_manager import make_food
+
+
+class TestCorpusStats(unittest.TestCase):
+
+    def test_counts_each_document_once(self):
+        stats = CorpusStats()
+        self.assertTrue(stats.add(1, ["peanut", "butter", "peanut"]))
+        self.assertTrue(stats.add(2, ["almond", "butter"]))
+        self.assertFalse(stats.add(1, ["peanut", "butter", "peanut"]))
+        self.assertEqual(stats.doc_count, 2)
+        self.assertEqual(stats.avg_length, 2.5)
+        self.assertEqual(stats.doc_freqs(["peanut", "butter", "jam"]), {"peanut": 1, "butter": 2, "jam": 0})
+
+
+class TestBM25(unittest.TestCase):
+
+    def setUp(self):
+        self.stats = CorpusStats()
+        self.docs = {1: ["peanut", "butter"], 2: ["almond", "butter"], 3: ["peanut", "butter", "cookie", "cookie", "snack", "bar"]}
+        for doc_id, tokens in self.docs.items():
+            self.stats.add(doc_id, tokens)
+        self.bm25 = BM25(self.stats)
+
+    def test_matches_formula(self):
+        idf = math.log(1 + (3 - 2 + 0.5) / (2 + 0.5)) #peanut is in 2 of 3 documents
+        norm = 1.2 * (1 - 0.75 + 0.75 * 2 / (10 / 3))
+        self.assertAlmostEqual(self.bm25.score_many(["peanut"], [self.docs[1]])[0], idf * 2.2 / (1 + norm))
+
+    def test_rare_terms_and_short_documents_score_higher(self):
+        scores = self.bm25.score_many(["peanut", "butter"], self.docs.values())
+        self.assertEqual(scores[1], self.bm25.score_many(["butter"], [self.docs[2]])[0])
+        self.assertGreater(scores[0], scores[1]) #peanut is rarer than butter
+        self.assertGreater(scores[0], scores[2]) #same terms, longer document
+        self.assertEqual(self.bm25.score_many(["jam"], self.docs.values()), [0.0, 0.0, 0.0])
+
+    def test_index_statistics_follow_updates(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            index = FoodIndex(os.path.join(tmp, "index.db"))
+            plain = dict(brandOwner="", ingredients="", gtinUpc="") #description words only
+            index.add_many([make_food(1, "PEANUT BUTTER", **plain), make_food(2, "ALMOND BUTTER", **plain),
+                            make_food(2, "ALMOND BUTTER SPREAD", **plain)])
+            self.assertEqual((index.doc_count, index.avg_length), (2, 2.5))
+            self.assertEqual(index.doc_freqs(["butter", "spread", "jam"]), {"butter": 2, "spread": 1, "jam": 0})
+
+            index.add(make_food(1, "PEANUT BRITTLE", **plain))
+            index.remove(2)
+            self.assertEqual(index.doc_freqs(["butter", "peanut", "brittle"]), {"butter": 0, "peanut": 1, "brittle": 1})
+            index.close()
+
+            reopened = FoodIndex(os.path.join(tmp, "index.db"))
+            self.assertEqual((reopened.doc_count, reopened.avg_length), (1, 2.0))
+            self.assertEqual(reopened.doc_freqs(["peanut"]), {"peanut": 1})
+            reopened.close()
+
+
+@unittest.skipUnless(TermMatrix.available, "numpy and scipy are not installed")
+class TestTermMatrix(unittest.TestCase):
+
+    def test_sparse_scores_match_python_scores(self):
+        rng = random.Random(3)
+        words = [f"w{i}" for i in range(50)]
+        docs = {i: rng.choices(words, k=rng.randint(0, 12)) for i in range(300)}
+        matrix = TermMatrix()
+        bm25 = BM25(matrix)
+        for doc_id in range(200):
+            matrix.add(doc_id, docs[doc_id])
+        query = ["w1", "w7", "w1", "unknown"]
+        ids = [5, 0, 199, 5]
+        self.assertScores(bm25.score_matrix(query, matrix, ids), bm25.score_many(query, [docs[i] for i in ids]))
+
+        for doc_id in range(200, 300): #rows added after the first flush
+            matrix.add(doc_id, docs[doc_id])
+        self.assertFalse(matrix.add(0, ["w1"]))
+        self.assertScores(bm25.score_matrix(query, matrix, list(docs)), bm25.score_many(query, docs.values()))
+        self.assertEqual(bm25.score_matrix(["unknown"], matrix, [1, 2]).tolist(), [0.0, 0.0])
+
+    def test_large_candidate_sets_use_the_matrix(self):
+        results = [make_food(i, f"FOOD {i}", ingredients="PEANUTS, SALT" if i % 3 else "SUGAR, SALT, SALT") for i in range(VECTOR_MIN_DOCS)]
+        fc = FCManager(url="http://stand-in/fdc/v1", rate_limiter=None, prefetch_top=0)
+        ranked = fc.get_relevant("peanuts salt", results)
+        self.assertEqual(len(fc.ranker.stats), VECTOR_MIN_DOCS)
+        expected = fc.ranker.score_many(fc.tokenize("peanuts salt"), [tokenize(food_text(val)) for val in results])
+        self.assertScores([val["relScore"] for val in results], expected)
+        self.assertEqual(ranked[0].fdc_id, 1)
+
+    def test_discarded_documents_are_re_added_with_new_terms(self):
+        matrix = TermMatrix()
+        bm25 = BM25(matrix)
+        matrix.add(1, ["w1", "w2"])
+        matrix.add(2, ["w2"])
+        self.assertEqual(matrix.discard([1, 9]), 1)
+        self.assertEqual((len(matrix), matrix.doc_freqs(["w1", "w2"])), (1, {"w1": 0, "w2": 1}))
+        self.assertTrue(matrix.add(1, ["w3", "w3"]))
+        self.assertEqual(matrix.avg_length, 1.5)
+        self.assertScores(bm25.score_matrix(["w3", "w2"], matrix, [1, 2]), bm25.score_many(["w3", "w2"], [["w3", "w3"], ["w2"]]))
+
+    def test_compaction_keeps_the_live_rows(self):
+        rng = random.Random(5)
+        words = [f"w{i}" for i in range(30)]
+        docs = {i: rng.choices(words, k=rng.randint(1, 8)) for i in range(3000)}
+        matrix = TermMatrix()
+        bm25 = BM25(matrix)
+        for doc_id, tokens in docs.items():
+            matrix.add(doc_id, tokens)
+        matrix.discard(range(0, 3000, 3))
+        matrix.discard(range(1, 3000, 3))
+        self.assertEqual(matrix._size, 1000) #compacted
+        live = list(range(2, 3000, 3))
+        self.assertScores(bm25.score_matrix(["w1", "w2"], matrix, live), bm25.score_many(["w1", "w2"], [docs[i] for i in live]))
+
+    def test_rows_discarded_while_scoring_are_added_again(self):
+        matrix = TermMatrix()
+        bm25 = BM25(matrix)
+        matrix.add(1, ["w1"])
+        matrix.add(2, ["w2"])
+        matrix.discard([1]) #a concurrent ingest
+        scores = bm25.score_matrix(["w1"], matrix, [1, 2], {1: ["w1"], 2: ["w2"]}.get)
+        self.assertGreater(scores[0], 0)
+        self.assertIn(1, matrix)
+
+    def test_unchanged_records_keep_their_rows(self):
+        fc = FCManager(url="http://stand-in/fdc/v1", rate_limiter=None, prefetch_top=0)
+        results = [make_food(i, f"FOOD {i}", ingredients="SUGAR") for i in range(VECTOR_MIN_DOCS)]
+        for _ in range(5):
+            fc.ingest(results)
+            fc.get_relevant("sugar", results)
+        self.assertEqual(fc.ranker.stats._size, VECTOR_MIN_DOCS)
+
+    def test_reingested_records_are_ranked_on_their_new_text(self):
+        fc = FCManager(url="http://stand-in/fdc/v1", rate_limiter=None, prefetch_top=0)
+        results = [make_food(i, f"FOOD {i}", ingredients="SUGAR") for i in range(VECTOR_MIN_DOCS)]
+        fc.get_relevant("peanuts", results)
+        changed = [make_food(i, f"FOOD {i}", ingredients="PEANUTS" if i == 7 else "SUGAR") for i in range(VECTOR_MIN_DOCS)]
+        fc.ingest(changed)
+        self.assertEqual(fc.get_relevant("peanuts", changed)[0].fdc_id, 7)
+
+    def assertScores(self, actual, expected):
+        self.assertEqual(len(actual), len(expected))
+        for a, e in zip(actual, expected):
+            self.assertAlmostEqual(a, e, places=12)
+
+
+class TestTopK(unittest.TestCase):
+
+    def test_matches_a_stable_sort(self):
+        rng = random.Random(5)
+        scores = [rng.choice([0.0, 0.5, 1.0, 2.5]) for _ in range(500)]
+        expected = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+        self.assertEqual(top_k(scores, 20), expected[:20])
+        self.assertEqual(len(top_k(scores[:3], 20)), 3)
+
+    def test_results_are_built_on_access(self):
+        created = []
+        results = RankedResults(["a", "b", "c"], lambda food: created.append(food) or food.upper())
+        self.assertEqual(len(results), 3)
+        self.assertEqual(created, [])
+        self.assertEqual(results[1], "B")
+        self.assertEqual(results[1], "B")
+        self.assertEqual(results[:2], ["A", "B"])
+        self.assertEqual(created, ["b", "a"])
+        self.assertEqual(list(results), ["A", "B", "C"])
+
+
+class TestGetRelevant(unittest.TestCase):
+
+    def test_best_match_first(self):
+        fc = FCManager(url="http://stand-in/fdc/v1", rate_limiter=None, prefetch_top=0)
+        results = [make_food(1, "COOKIES", ingredients="SUGAR, FLOUR, BUTTER"), make_food(2, "PEANUT BUTTER", ingredients="PEANUTS, SALT"),
+                   make_food(3, "PEANUT BUTTER COOKIES", ingredients="PEANUTS, SUGAR, FLOUR, BUTTER, EGGS, VANILLA, SALT")]
+        ranked = fc.get_relevant("peanut butter", results)
+        self.assertIsInstance(ranked, RankedResults)
+        self.assertEqual([item.fdc_id for item in ranked], [2, 3, 1])
+        self.assertGreater(results[1]["relScore"], results[2]["relScore"])
+        self.assertEqual(fc.ranker.stats.doc_count, 3)
+
+        fc.get_relevant("peanut butter", results) #same foods again: statistics unchanged
+        self.assertEqual(fc.ranker.stats.doc_count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
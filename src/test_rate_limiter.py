@@ -0,0 +1,88 @@
+# --------------------------------------------------
+# === Unit tests for RateLimiter ===
+# --------------------------------------------------
+
+import unittest
+from unittest.mock import MagicMock, patch
+
+from foodcentral_manager import FCManager
+from rate_limiter import RateLimiter
+
+
+class FakeClock:
+    """Clock whose sleep just advances time"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.limiter = RateLimiter(10, period=10.0, clock=self.clock, sleep=self.clock.sleep)
+
+    def test_burst_then_paced(self):
+        for _ in range(10):
+            self.assertEqual(self.limiter.acquire(), 0.0)
+        self.assertAlmostEqual(self.limiter.acquire(), 1.0)
+        self.assertAlmostEqual(self.clock.now, 1.0)
+
+    def test_remaining_header_drains_bucket(self):
+        self.limiter.update({"X-RateLimit-Limit": "10", "X-RateLimit-Remaining": "0"})
+        self.assertAlmostEqual(self.limiter.acquire(), 1.0)
+
+    def test_for_key_quota(self):
+        self.assertEqual(RateLimiter.for_key("DEMO_KEY").capacity, RateLimiter.DEMO_KEY_PER_HOUR)
+        self.assertEqual(RateLimiter.for_key("personal").capacity, RateLimiter.KEY_PER_HOUR)
+
+    def test_key_change_keeps_configured_limiter(self):
+        fc = FCManager(url="http://stand-in/fdc/v1", rate_limiter=self.limiter)
+        fc.key = "DEMO_KEY"
+        fc.key = "MY_KEY"
+        self.assertIs(fc.rate_limiter, self.limiter)
+        self.assertEqual(self.limiter.capacity, 10)
+
+    def test_key_change_resizes_own_limiter_without_refill(self):
+        fc = FCManager(url="http://stand-in/fdc/v1", key="MY_KEY")
+        limiter = fc.rate_limiter
+        limiter.update({"X-RateLimit-Remaining": "970"})
+        fc.key = "MY_KEY"
+        self.assertIs(fc.rate_limiter, limiter)
+        self.assertLess(limiter.tokens, 971)
+        fc.key = "DEMO_KEY"
+        self.assertIs(fc.rate_limiter, limiter)
+        self.assertEqual(limiter.capacity, RateLimiter.DEMO_KEY_PER_HOUR)
+        self.assertLessEqual(limiter.tokens, RateLimiter.DEMO_KEY_PER_HOUR)
+
+    def test_resize_keeps_spent_tokens(self):
+        for _ in range(8):
+            self.limiter.acquire()
+        self.limiter.resize(100)
+        self.assertEqual(self.limiter.capacity, 100)
+        self.assertAlmostEqual(self.limiter.tokens, 2.0)
+        self.limiter.resize(1)
+        self.assertAlmostEqual(self.limiter.tokens, 1.0)
+        with self.assertRaises(ValueError):
+            self.limiter.resize(0)
+
+    def test_429_is_retried_after_backoff(self):
+        throttled = MagicMock(status_code=429, headers={"Retry-After": "2"})
+        ok = MagicMock(status_code=200, headers={})
+        fc = FCManager(url="http://stand-in/fdc/v1", rate_limiter=self.limiter)
+        with patch.object(fc.session, "get", side_effect=[throttled, ok]) as get:
+            response = fc._get("/food/1")
+        self.assertIs(response, ok)
+        self.assertEqual(get.call_count, 2)
+        self.assertEqual(self.limiter.throttled, 1)
+        self.assertGreaterEqual(self.clock.now, 2.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
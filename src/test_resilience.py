@@ -0,0 +1,89 @@
+# --------------------------------------------------
+# === Unit tests for Resilience / CircuitBreaker ===
+# --------------------------------------------------
+
+import unittest
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from foodcentral_manager import FCManager
+from resilience import Resilience, CircuitBreaker, CircuitOpenError, DeadlineExceeded, endpoint_name
+from test_rate_limiter import FakeClock
+
+
+def status(code):
+    return MagicMock(status_code=code, headers={})
+
+
+class TestResilience(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.resilience = Resilience(max_retries=2, failure_threshold=2, reset_timeout=30.0,
+                                     clock=self.clock, sleep=self.clock.sleep)
+
+    def test_5xx_is_retried(self):
+        func = MagicMock(side_effect=[status(503), requests.ConnectionError("reset"), status(200)])
+        self.assertEqual(self.resilience.call("api/food", func).status_code, 200)
+        self.assertEqual(func.call_count, 3)
+        self.assertEqual(self.resilience.stats()["retries"], 2)
+
+    def test_gives_up_after_max_retries(self):
+        func = MagicMock(side_effect=requests.ConnectionError("down"))
+        with self.assertRaises(requests.ConnectionError):
+            self.resilience.call("api/food", func)
+        self.assertEqual(func.call_count, 3)
+
+    def test_4xx_is_not_retried(self):
+        func = MagicMock(return_value=status(404))
+        self.assertEqual(self.resilience.call("api/food", func).status_code, 404)
+        self.assertEqual(func.call_count, 1)
+
+    def test_open_circuit_fails_fast_then_probes(self):
+        func = MagicMock(return_value=status(500))
+        self.resilience.call("api/food", func)
+        self.assertEqual(self.resilience.breaker("api/food").state, CircuitBreaker.CLOSED)
+        self.resilience.call("api/food", func)
+        self.assertEqual(self.resilience.breaker("api/food").state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError):
+            self.resilience.call("api/food", func)
+        self.assertEqual(func.call_count, 6)
+        self.assertEqual(self.resilience.breaker("api/other").state, CircuitBreaker.CLOSED)
+
+        self.clock.now += 30
+        func.return_value = status(200)
+        self.assertEqual(self.resilience.call("api/food", func).status_code, 200)
+        self.assertEqual(self.resilience.breaker("api/food").state, CircuitBreaker.CLOSED)
+        self.assertEqual(self.resilience.stats()["short_circuited"], 1)
+
+    def test_deadline_stops_retries(self):
+        self.resilience.deadline = 0.001
+        func = MagicMock(side_effect=requests.ConnectionError("down"))
+        with self.assertRaises(DeadlineExceeded):
+            self.resilience.call("api/food", func, timeout=(3.05, 15))
+        self.assertEqual(func.call_count, 1)
+        self.assertLessEqual(func.call_args.kwargs["timeout"][1], 0.001)
+
+    def test_endpoint_name_groups_ids(self):
+        self.assertEqual(endpoint_name("https://api.nal.usda.gov/fdc/v1/food/534358?api_key=x"), "api.nal.usda.gov/fdc/v1/food/{id}")
+        self.assertEqual(endpoint_name("https://world.openfoodfacts.org/api/v0/product/0123.json"),
+                         "world.openfoodfacts.org/api/v0/product/{id}.json")
+
+
+class TestFCManagerResilience(unittest.TestCase):
+
+    def test_open_circuit_skips_network(self):
+        clock = FakeClock()
+        resilience = Resilience(max_retries=0, failure_threshold=2, clock=clock, sleep=clock.sleep)
+        fc = FCManager(url="http://stand-in/fdc/v1", rate_limiter=None, resilience=resilience)
+        with patch.object(fc.session, "get", return_value=status(503)) as get:
+            self.assertIsNone(fc.get_item(1))
+            self.assertIsNone(fc.get_item(2))
+            self.assertIsNone(fc.get_item(3))
+        self.assertEqual(get.call_count, 2)
+        self.assertEqual(resilience.breaker("stand-in/fdc/v1/food/{id}").state, CircuitBreaker.OPEN)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+# --------------------------------------------------
+# === Unit tests for ResponseCache ===
+# --------------------------------------------------
+
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+import requests
+
+from foodcentral_manager import FCManager
+from response_cache import ResponseCache
+from test_foodcentral_manager import make_food, make_response
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "cache.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_key_ignores_api_key_and_query_case(self):
+        a = ResponseCache.make_key("/foods/search", {"api_key": "A", "query": "Kit  Kat "})
+        b = ResponseCache.make_key("/foods/search", {"query": "kit kat", "api_key": "B"})
+        self.assertEqual(a, b)
+
+    def test_ttl_expiry(self):
+        cache = ResponseCache(self.path)
+        cache.put("k", b"body", ttl=-1)
+        self.assertIsNone(cache.get("k"))
+        self.assertEqual(cache.get("k", allow_stale=True), b"body")
+
+    def test_lru_eviction_by_size(self):
+        cache = ResponseCache(self.path, max_bytes=10)
+        cache.put("a", b"aaaa")
+        time.sleep(0.001)
+        cache.put("b", b"bbbb")
+        time.sleep(0.001)
+        cache.get("a")  # b is now least recently used
+        cache.put("c", b"cccc")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), b"aaaa")
+        self.assertEqual(cache.evictions, 1)
+        self.assertLessEqual(cache.size, 10)
+
+    def test_persists_between_instances(self):
+        cache = ResponseCache(self.path)
+        cache.put("k", b"body")
+        cache.close()
+        self.assertEqual(ResponseCache(self.path).get("k"), b"body")
+
+    def test_refresh_keeps_body_and_validators(self):
+        cache = ResponseCache(self.path)
+        cache.put("k", b"body", ttl=-1, etag='"v1"', last_modified="Mon, 05 Oct 2026 00:00:00 GMT")
+        self.assertEqual(cache.validators("k"), {"If-None-Match": '"v1"', "If-Modified-Since": "Mon, 05 Oct 2026 00:00:00 GMT"})
+        self.assertTrue(cache.refresh("k"))
+        self.assertEqual(cache.get("k"), b"body")
+        self.assertFalse(cache.refresh("missing"))
+        self.assertEqual(cache.validators("missing"), {})
+
+    def test_adds_validator_columns_to_old_cache_file(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE responses (key TEXT PRIMARY KEY, body BLOB NOT NULL, size INTEGER NOT NULL, "
+                     "expires REAL NOT NULL, last_access REAL NOT NULL)")
+        conn.execute("INSERT INTO responses VALUES ('k', x'00', 1, 0, 0)")
+        conn.commit()
+        conn.close()
+        cache = ResponseCache(self.path)
+        self.assertEqual(cache.validators("k"), {})
+        cache.put("k", b"new", etag='"v2"')
+        self.assertEqual(cache.validators("k"), {"If-None-Match": '"v2"'})
+
+
+class TestCachedFCManager(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ResponseCache(":memory:")
+        self.fc = FCManager(url="http://stand-in/fdc/v1", cache=self.cache)
+
+    def test_repeat_lookup_skips_network(self):
+        with patch.object(self.fc, "_get", return_value=make_response(make_food(1))) as get:
+            self.fc.get_item(1)
+            self.assertEqual(self.fc.get_item(1), make_food(1))
+        self.assertEqual(get.call_count, 1)
+
+    def test_offline_serves_only_from_cache(self):
+        self.cache.put(ResponseCache.make_key("/food/1"), b'{"fdcId": 1}', ttl=-1)
+        self.cache.offline = True
+        with patch.object(self.fc, "_get") as get:
+            self.assertEqual(self.fc.get_item(1), {"fdcId": 1})
+            self.assertIsNone(self.fc.get_item(2))
+        get.assert_not_called()
+
+    def test_expired_entry_revalidated_with_etag(self):
+        self.cache.put(ResponseCache.make_key("/food/1"), b'{"fdcId": 1}', ttl=-1, etag='"v1"')
+        with patch.object(self.fc, "_get", return_value=make_response(None, status=304)) as get:
+            self.assertEqual(self.fc.get_item(1), {"fdcId": 1})
+            self.assertEqual(self.fc.get_item(1), {"fdcId": 1})
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(get.call_args.kwargs["headers"], {"If-None-Match": '"v1"'})
+        self.assertEqual(self.cache.revalidations, 1)
+
+    def test_refresh_items_does_not_decode(self):
+        for fdc_id in (1, 2):
+            self.cache.put(ResponseCache.make_key(f"/food/{fdc_id}"), b'{"fdcId": %d}' % fdc_id, etag=f'"v{fdc_id}"')
+        changed = make_response(make_food(2))
+        changed.headers = {"ETag": '"v3"'}
+
+        def fake_get(path, params=None, **kwargs):
+            return changed if path == "/food/2" else make_response(None, status=304)
+
+        with patch.object(self.fc, "_get", side_effect=fake_get), patch("json.loads") as loads:
+            self.assertEqual(self.fc.refresh_items([1, 2]), 2)
+        loads.assert_not_called()
+        self.assertEqual(self.cache.validators(ResponseCache.make_key("/food/2")), {"If-None-Match": '"v3"'})
+
+    def test_stale_entry_served_during_outage(self):
+        self.cache.put(ResponseCache.make_key("/food/1"), b'{"fdcId": 1}', ttl=-1)
+        with patch.object(self.fc, "_get", side_effect=requests.ConnectionError("down")):
+            self.assertEqual(self.fc.get_item(1), {"fdcId": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
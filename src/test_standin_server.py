@@ -0,0 +1,130 @@
+# --------------------------------------------------
+# === Unit tests for the benchmark stand-in server ===
+# --------------------------------------------------
+
+import sys
+import time
+import unittest
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "benchmarks"))
+
+from standin_server import FixtureCorpus, StandInConfig, start_server
+
+
+class StandInTestCase(unittest.TestCase):
+    """Starts one stand-in server with config for the tests of a class"""
+
+    config = StandInConfig()
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server, cls.fdc_url = start_server(config=cls.config)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.session = requests.Session()
+
+    def tearDown(self):
+        self.session.close()
+
+    def fdc(self, path, **params):
+        return self.session.get(f"{self.fdc_url}{path}", params=params, timeout=5)
+
+    def off(self, path, **params):
+        return self.session.get(f"{self.server.off_url}{path}", params=params, timeout=5)
+
+
+class TestFixtureRoutes(StandInTestCase):
+
+    config = StandInConfig(synthesize_missing=False)
+
+    def test_food(self):
+        full = self.fdc("/food/2056470", api_key="DEMO_KEY")
+        self.assertEqual(full.status_code, 200)
+        self.assertEqual(full.json()["description"], "KIT KAT, CRISP WAFERS IN MILK CHOCOLATE")
+        abridged = self.fdc("/food/2056470", format="abridged", nutrients="203,204").json()
+        self.assertEqual({n["number"] for n in abridged["foodNutrients"]}, {"203", "204"})
+        self.assertNotIn("foodPortions", abridged)
+        self.assertEqual(self.fdc("/food/1").status_code, 404)
+        self.assertEqual(self.fdc("/nowhere").status_code, 404)
+
+    def test_foods_and_search(self):
+        foods = self.fdc("/foods", fdcIds="2056470,1,1951279").json()
+        self.assertEqual([food["fdcId"] for food in foods], [2056470, 1951279])
+        search = self.fdc("/foods/search", query="kit kat", pageSize=5).json()
+        self.assertEqual((search["totalHits"], search["foods"][0]["fdcId"]), (1, 2056470))
+        everything = self.fdc("/foods/search", query="*", pageSize=5, pageNumber=3).json()
+        self.assertEqual((everything["totalHits"], everything["totalPages"], len(everything["foods"])), (13, 3, 3))
+
+    def test_openfoodfacts(self):
+        product = self.off("/api/v0/product/034000002405.json").json()
+        self.assertEqual((product["status"], product["product"]["brands"]), (1, "The Hershey"))
+        self.assertEqual(self.off("/api/v0/product/000.json").json()["status"], 0)
+        results = self.off("/cgi/search.pl", search_terms="cheerios", page_size=5).json()
+        self.assertEqual([p["code"] for p in results["products"]], ["016000275287"])
+
+    def test_conditional_requests(self):
+        first = self.fdc("/food/2056470")
+        etag = self.session.get(f"{self.fdc_url}/food/2056470", headers={"If-None-Match": first.headers["ETag"]}, timeout=5)
+        since = self.session.get(f"{self.fdc_url}/food/2056470", headers={"If-Modified-Since": first.headers["Last-Modified"]}, timeout=5)
+        self.assertEqual((etag.status_code, since.status_code, etag.content), (304, 304, b""))
+        self.assertEqual(self.server.not_modified, 2)
+
+
+class TestSyntheticFoods(StandInTestCase):
+
+    config = StandInConfig(synthetic=20)
+
+    def test_missing_ids_and_synthetic_corpus(self):
+        self.assertEqual(self.fdc("/food/1").json()["fdcId"], 1)
+        search = self.fdc("/foods/search", query="*", pageSize=50).json()
+        self.assertEqual(search["totalHits"], 13 + 20)
+        self.assertIn(FixtureCorpus.SYNTHETIC_BASE, [food["fdcId"] for food in search["foods"]])
+
+
+class TestInjectedErrors(StandInTestCase):
+
+    config = StandInConfig(error_rate=1.0, error_status=502, seed=1)
+
+    def test_every_route_fails(self):
+        self.assertEqual(self.fdc("/food/2056470").status_code, 502)
+        self.assertEqual(self.off("/api/v0/product/034000002405.json").json(), {"error": "injected failure"})
+
+
+class TestLatency(StandInTestCase):
+
+    config = StandInConfig(latency=0.05, jitter=0.05, seed=1)
+
+    def test_responses_are_delayed(self):
+        start = time.perf_counter()
+        self.assertEqual(self.fdc("/food/2056470").status_code, 200)
+        self.assertGreaterEqual(time.perf_counter() - start, 0.05)
+
+
+class TestRateLimit(StandInTestCase):
+
+    config = StandInConfig(rate_limit=2)
+
+    def test_quota_per_key(self):
+        responses = [self.fdc("/food/2056470", api_key="A") for _ in range(3)]
+        self.assertEqual([r.status_code for r in responses], [200, 200, 429])
+        self.assertEqual([r.headers["X-RateLimit-Remaining"] for r in responses], ["1", "0", "0"])
+        self.assertEqual(responses[0].headers["X-RateLimit-Limit"], "2")
+        self.assertGreaterEqual(int(responses[2].headers["Retry-After"]), 3600)
+        self.assertEqual(self.fdc("/food/2056470", api_key="B").status_code, 200)
+
+    def test_openfoodfacts_is_not_limited(self):
+        responses = [self.off("/api/v0/product/034000002405.json") for _ in range(3)]
+        self.assertEqual([r.status_code for r in responses], [200] * 3)
+        self.assertNotIn("X-RateLimit-Limit", responses[0].headers)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+# --------------------------------------------
+# === Unit tests for TextAnalyzer ===
+# --------------------------------------------
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from food_index import FoodIndex
+from foodcentral_manager import FCManager
+from text_analyzer import TextAnalyzer, light_stem
+
+
+class TestTextAnalyzer(unittest.TestCase):
+
+    def test_folds_splits_and_drops_stop_words(self):
+        analyzer = TextAnalyzer(stemmer=None)
+        self.assertEqual(analyzer.analyze("Crème Brûlée (with Caramel), 4.5oz"), ("creme", "brulee", "caramel", "4", "5oz"))
+
+    def test_light_stem(self):
+        self.assertEqual([light_stem(w) for w in ("berries", "tomatoes", "peanuts", "peaches", "glasses", "hummus", "oats", "rice")],
+                         ["berry", "tomato", "peanut", "peach", "glass", "hummus", "oat", "rice"])
+        for singular in ("cookie", "brownie", "smoothie", "pie", "veggie"):
+            self.assertEqual((light_stem(singular), light_stem(singular + "s")), (singular, singular), singular)
+        self.assertEqual((light_stem("fries"), light_stem("fry")), ("fry", "fry"))
+
+    def test_each_text_is_tokenized_once(self):
+        analyzer = TextAnalyzer()
+        with patch.object(analyzer, "analyze", wraps=analyzer.analyze) as analyze:
+            first = analyzer.food_tokens({"description": "PEANUT BUTTER", "ingredients": "PEANUTS, SALT"})
+            second = analyzer.food_tokens({"description": "PEANUT BUTTER", "ingredients": "PEANUTS, SALT"})
+        self.assertEqual(first, ("peanut", "butter", "peanut", "salt"))
+        self.assertIs(first, second)
+        self.assertEqual(analyze.call_count, 1)
+
+    def test_manager_tokenize(self):
+        fc = FCManager(url="http://stand-in/fdc/v1", rate_limiter=None)
+        self.assertEqual(fc.tokenize("The Cookies, in a Jar."), ["cookie", "jar"])
+
+    def test_index_is_retokenized_for_a_new_analyzer(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "index.db")
+            index = FoodIndex(path, analyzer=TextAnalyzer(stemmer=None))
+            index.add({"fdcId": 1, "description": "ROASTED PEANUTS"})
+            self.assertEqual(index.search_ids("peanut"), [])
+            index.close()
+
+            index = FoodIndex(path)
+            self.assertEqual(index.search_ids("peanut"), [1])
+            self.assertEqual(index.doc_freqs(["peanut", "peanuts"]), {"peanut": 1, "peanuts": 0})
+            index.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
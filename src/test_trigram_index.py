@@ -0,0 +1,110 @@
+# --------------------------------------------
+# === Unit tests for TrigramIndex ===
+# --------------------------------------------
+
+import threading
+import unittest
+from unittest.mock import patch
+
+import trigram_index
+from food_index import FoodIndex
+from foodcentral_manager import FCManager
+from test_foodcentral_manager import make_food
+from trigram_index import TrigramIndex, similarity, trigrams, word_similarity
+
+
+class TestTrigramIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = TrigramIndex()
+        self.index.add_many([(1, "KIT KAT Hershey"), (2, "CHEERIOS General Mills"), (3, "GREEK YOGURT Chobani"),
+                             (4, "KIT KAT MINIS WAFER BARS Hershey"), (5, "Crème Brûlée")])
+
+    def test_trigrams(self):
+        self.assertEqual(len(trigrams("Kit-Kat!")), len(trigrams("kit kat")))
+        self.assertEqual(trigrams("a"), {trigram_index.ALPHABET.index(" ") * trigram_index.BASE ** 2
+                                         + trigram_index.ALPHABET.index("a") * trigram_index.BASE
+                                         + trigram_index.ALPHABET.index(" ")})
+        self.assertEqual(similarity("cheerio", "CHEERIOS"), 6 / 7)
+        self.assertEqual(word_similarity("kitkat", "KIT KAT"), 1.0)
+        self.assertEqual(word_similarity("apple pie", "APPLE JUICE"), 0.0)
+
+    def test_misspellings_are_found(self):
+        self.assertEqual(self.index.search_ids("kitkat"), [1, 4]) #shorter text first on a tie
+        self.assertEqual(self.index.search_ids("cheerio"), [2])
+        self.assertEqual(self.index.search_ids("yoghurt"), [3])
+        self.assertEqual(self.index.search_ids("creme brulee"), [5])
+        self.assertEqual(self.index.search_ids("quinoa"), [])
+        self.assertEqual(self.index.search_ids("kitkat", limit=1), [1])
+
+    def test_readded_foods_replace_old_text(self):
+        self.index.add(1, "PEANUT BRITTLE")
+        self.assertEqual(self.index.search_ids("kitkat"), [4])
+        self.assertEqual(self.index.search_ids("peanut britle"), [1])
+        self.assertEqual(len(self.index), 5)
+
+    def test_segments_are_merged(self):
+        for i in range(trigram_index.MAX_SEGMENTS + 2):
+            self.index.add(100 + i, f"SNACK MIX {i}")
+            self.assertEqual(self.index.search_ids(f"snak mix {i}", limit=1), [100 + i])
+        self.assertLessEqual(len(self.index._segments), trigram_index.MAX_SEGMENTS)
+        self.assertEqual(self.index.search_ids("cheerio"), [2])
+
+    def test_from_food_index(self):
+        foods = FoodIndex(":memory:")
+        foods.add_many([make_food(1, "KIT KAT"), make_food(2, "CHEERIOS")])
+        self.assertEqual(TrigramIndex.from_food_index(foods).search_ids("cheerio"), [2])
+
+    def test_background_load_keeps_newer_foods(self):
+        foods = FoodIndex(":memory:")
+        foods.add_many([make_food(1, "KIT KAT"), make_food(2, "CHEERIOS")])
+        with patch.object(threading.Thread, "start"): #fill by hand below
+            index = TrigramIndex.from_food_index(foods, background=True)
+        self.assertFalse(index.wait_loaded(0))
+        index.add(2, "PEANUT BRITTLE") #ingested while loading
+        index._fill([(1, "KIT KAT Test Brand"), (2, "CHEERIOS Test Brand")], batch=1)
+        self.assertTrue(index.wait_loaded(0))
+        self.assertEqual((index.search_ids("kitkat"), index.search_ids("cheerio"), index.search_ids("brittle")), ([1], [], [2]))
+
+
+class TestFuzzySearch(unittest.TestCase):
+
+    def setUp(self):
+        self.index = FoodIndex(":memory:")
+        self.fc = FCManager(url="http://stand-in/fdc/v1", rate_limiter=None, index=self.index, fuzzy=TrigramIndex(), prefetch_top=0)
+        self.fc.ingest([make_food(1, "KIT KAT"), make_food(2, "KIT KAT MINIS"), make_food(3, "CHEERIOS"),
+                        make_food(4, "APPLE JUICE"), make_food(5, "APPLE SAUCE")])
+
+    def test_misspelling_is_answered_locally(self):
+        with patch.object(self.fc, "_get") as get:
+            result = self.fc.searchDB("kitkat")
+            single = self.fc.searchDB("cheerio")
+        get.assert_not_called()
+        self.assertEqual([item.fdc_id for item in result], [1, 2])
+        self.assertEqual(single.fdc_id, 3)
+
+    def test_no_close_match_goes_to_the_api(self):
+        with patch.object(self.fc, "_get_json", return_value={"totalHits": 0, "foods": []}) as get:
+            self.assertIsNone(self.fc.searchDB("quinoa"))
+        get.assert_called_once()
+
+    def test_loose_matches_wait_for_the_api(self):
+        pie = make_food(6, "APPLE PIE")
+        with patch.object(self.fc, "_get_json", return_value={"totalHits": 1, "foods": [pie]}) as get:
+            self.assertEqual(self.fc.searchDB("apple pie").fdc_id, 6)
+        get.assert_called_once()
+
+    def test_loose_matches_answer_an_api_miss(self):
+        with patch.object(self.fc, "_get_json", return_value={"totalHits": 0, "foods": []}):
+            result = self.fc.searchDB("apple pye")
+        self.assertEqual(sorted(item.fdc_id for item in result), [4, 5])
+
+    def test_loose_matches_after_a_failure_are_not_cached(self):
+        with patch.object(self.fc, "_get_json", return_value=None) as get:
+            self.assertEqual(sorted(item.fdc_id for item in self.fc.searchDB("apple pie")), [4, 5])
+            self.fc.searchDB("apple pie")
+        self.assertEqual(get.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+"""
+text_analyzer.py
+Text analysis shared by indexing and querying: Unicode folding, compiled-regex
+tokenization, stop words and optional stemming, with token streams memoized per document.
+"""
+
+import hashlib
+import re
+import sys
+import unicodedata
+
+from lru_cache import LRUCache
+
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOP_WORDS = frozenset(("a", "an", "and", "as", "at", "by", "for", "from", "in", "is", "of", "on", "or", "the", "to", "with"))
+INDEXED_FIELDS = ("description", "ingredients", "brandedFoodCategory", "brandOwner", "gtinUpc")
+#singulars ending in -ie, whose plurals are not -y words ("cookies" -> "cookie", not "cooky")
+IE_WORDS = frozenset(("cookie", "brownie", "smoothie", "veggie", "calorie", "hoagie", "goodie", "cutie", "pierogie", "rotisserie",
+                      "patisserie", "charcuterie", "auntie", "sweetie", "birdie", "beanie", "movie", "zombie"))
+
+
+def food_text(food: dict) -> str:
+    """Returns the searchable text of a food record (the fields get_relevant ranks on, plus the UPC)"""
+    return " ".join(str(food[field]) for field in INDEXED_FIELDS if food.get(field))
+
+
+def fold(text: str) -> str:
+    """Returns text lower-cased with accents removed ("Crème Brûlée" -> "creme brulee")"""
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+
+def light_stem(token: str) -> str:
+    """
+    Strips English plural endings so singular and plural forms match
+    ("berries" -> "berry", "cookies" -> "cookie", "tomatoes" -> "tomato", "peanuts" -> "peanut").
+    Short tokens and words ending in ss/us/is are left alone.
+    """
+    if len(token) <= 3 or token.isdigit():
+        return token
+    if token.endswith("ies") and len(token) > 4:
+        return token[:-1] if token[:-1] in IE_WORDS else token[:-3] + "y"
+    if token.endswith(("oes", "ches", "shes", "xes", "zes", "sses")):
+        return token[:-2]
+    if token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+light_stem.version = 2 #bumped when stems change, so indexes built with older stems are rebuilt
+
+
+class TextAnalyzer:
+    """
+    Turns text into index/query tokens: fold -> TOKEN_RE -> drop stop words -> stem.
+
+    tokens() memoizes the token stream of each distinct text, keyed by a 16-byte
+    digest, so a food record that is indexed, then ranked, is tokenized only once.
+    Tokens are interned, so repeated words share one string.
+    """
+
+    def __init__(self, stop_words = STOP_WORDS, stemmer = light_stem, fold_unicode = True, cache_size = 65536):
+        """
+        Args:
+            stop_words (iterable): Tokens dropped from every stream.
+            stemmer (callable): Maps a token to its stem, None to keep tokens as they are.
+            fold_unicode (bool): Strip accents before tokenizing (otherwise only lower-case).
+            cache_size (int): Token streams memoized (0 disables memoization).
+        """
+        self._stop_words = frozenset(stop_words or ())
+        self._stemmer = stemmer
+        self._fold = fold if fold_unicode else str.lower
+        self._cache = LRUCache(max_entries=cache_size, max_bytes=cache_size * 1024, sizeof=sys.getsizeof) if cache_size > 0 else None
+
+    @property
+    def signature(self) -> str:
+        """Describes the token stream, so an index can tell it was built by a different analyzer"""
+        stem = getattr(self._stemmer, "__name__", repr(self._stemmer)) if self._stemmer else "none"
+        if hasattr(self._stemmer, "version"):
+            stem += f"/{self._stemmer.version}"
+        stop = hashlib.sha1(" ".join(sorted(self._stop_words)).encode()).hexdigest()[:8]
+        return f"fold={self._fold is fold} stop={stop} stem={stem}"
+
+    @property
+    def cache(self) -> LRUCache:
+        return self._cache
+
+    def analyze(self, text: str) -> tuple:
+        """Returns the tokens of text, without memoization"""
+        tokens = TOKEN_RE.findall(self._fold(text))
+        if self._stop_words:
+            tokens = [token for token in tokens if token not in self._stop_words]
+        if self._stemmer is not None:
+            tokens = map(self._stemmer, tokens)
+        return tuple(map(sys.intern, tokens))
+
+    def tokens(self, text: str) -> tuple:
+        """Returns the tokens of text, memoized per distinct text"""
+        if self._cache is None:
+            return self.analyze(text)
+        key = hashlib.blake2b(text.encode(), digest_size=16).digest()
+        tokens = self._cache.get(key)
+        if tokens is None:
+            tokens = self.analyze(text)
+            self._cache.put(key, tokens)
+        return tokens
+
+    def food_tokens(self, food: dict) -> tuple:
+        """Returns the tokens of a food record's searchable text"""
+        return self.tokens(food_text(food))
+
+    def __repr__(self):
+        return f"TextAnalyzer({self.signature})"
+
+
+ANALYZER = TextAnalyzer() #shared default, so the index and the ranker agree on tokens
+
+
+def tokenize(text: str) -> list:
+    """Returns the tokens of text as the default analyzer produces them"""
+    return list(ANALYZER.tokens(text))
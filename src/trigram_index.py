@@ -0,0 +1,231 @@
+"""
+trigram_index.py
+Character-trigram index over food descriptions and brand owners for typo-tolerant search
+("kitkat" -> KIT KAT, "cheerio" -> CHEERIOS, "yoghurt" -> YOGURT).
+"""
+
+import math
+import re
+import threading
+
+import numpy as np
+
+from text_analyzer import fold
+
+
+NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+ALPHABET = "abcdefghijklmnopqrstuvwxyz0123456789 "
+SEPARATOR = len(ALPHABET) #code between two documents; trigrams containing it are dropped
+BASE = len(ALPHABET) + 1
+TRIGRAMS = BASE ** 3
+FUZZY_FIELDS = ("description", "brandOwner")
+MAX_SEGMENTS = 8 #segments merged into one past this count
+
+_CODES = np.full(256, SEPARATOR, dtype=np.int64)
+_CODES[np.frombuffer(ALPHABET.encode(), dtype=np.uint8)] = np.arange(len(ALPHABET))
+
+
+def normalize(text: str) -> str:
+    """Returns text folded to lower-case ASCII words separated by single spaces, padded with a space"""
+    return f" {NON_ALNUM_RE.sub(' ', fold(text)).strip()} "
+
+
+def trigrams(text: str) -> set:
+    """Returns the distinct trigram ids of text ("kit kat" -> " ki", "kit", "it ", "t k", ...)"""
+    codes = [ALPHABET.index(ch) for ch in normalize(text)]
+    return {codes[i] * BASE * BASE + codes[i + 1] * BASE + codes[i + 2] for i in range(len(codes) - 2)}
+
+
+def similarity(query: str, text: str) -> float:
+    """Returns the share of the query's trigrams that also occur in text (0 to 1)"""
+    wanted = trigrams(query)
+    return len(wanted & trigrams(text)) / len(wanted) if wanted else 0.0
+
+
+def word_similarity(query: str, text: str) -> float:
+    """
+    Returns the lowest share of a query word's trigrams found in text, its words also read run
+    together ("kitkat" ~ "KIT KAT"): every word of the query must be close for a high value.
+    """
+    found = trigrams(text) | trigrams(normalize(text).replace(" ", ""))
+    words = [trigrams(word) for word in normalize(query).split()]
+    return min((len(word & found) / len(word) for word in words), default=0.0)
+
+
+def fuzzy_text(food: dict) -> str:
+    """Returns the text of a food record the trigram index matches against"""
+    return " ".join(str(food[field]) for field in FUZZY_FIELDS if food.get(field))
+
+
+class _Segment:
+    """Immutable CSR postings (trigram -> rows) for a contiguous block of rows"""
+
+    def __init__(self, first_row, indptr, indices):
+        self.first_row = first_row
+        self.indptr = indptr
+        self.indices = indices #global rows, int32
+
+    @classmethod
+    def build(cls, first_row, texts):
+        """Builds the postings of normalized texts with array operations only"""
+        joined = np.frombuffer("\n".join(texts).encode("ascii"), dtype=np.uint8)
+        codes = _CODES[joined]
+        rows = np.repeat(np.arange(len(texts), dtype=np.int64), [len(text) + 1 for text in texts])[:len(codes)]
+        if len(codes) < 3:
+            return cls(first_row, np.zeros(TRIGRAMS + 1, dtype=np.int64), np.zeros(0, dtype=np.int32))
+        ids = codes[:-2] * BASE * BASE + codes[1:-1] * BASE + codes[2:]
+        valid = (codes[:-2] != SEPARATOR) & (codes[1:-1] != SEPARATOR) & (codes[2:] != SEPARATOR)
+        return cls.from_pairs(first_row, ids[valid], rows[:-2][valid] + first_row)
+
+    @classmethod
+    def from_pairs(cls, first_row, trigram_ids, rows):
+        """Builds postings from (trigram id, global row) pairs, duplicates removed"""
+        keys = np.sort(trigram_ids * (1 << 32) + rows)
+        keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))] #dedupe; np.unique is far slower on 10^7+ keys
+        trigram_ids, rows = keys >> 32, keys & 0xFFFFFFFF
+        indptr = np.zeros(TRIGRAMS + 1, dtype=np.int64)
+        np.cumsum(np.bincount(trigram_ids, minlength=TRIGRAMS), out=indptr[1:])
+        return cls(first_row, indptr, rows.astype(np.int32))
+
+    def pairs(self):
+        """Returns the (trigram id, global row) pairs of the segment"""
+        return np.repeat(np.arange(TRIGRAMS, dtype=np.int64), np.diff(self.indptr)), self.indices.astype(np.int64)
+
+    def postings(self, trigram_id):
+        return self.indices[self.indptr[trigram_id]:self.indptr[trigram_id + 1]]
+
+
+class TrigramIndex:
+    """
+    In-memory inverted index from character trigrams to foods.
+
+    A lookup concatenates the postings of the query's trigrams and counts each food's
+    shared trigrams with one np.bincount, so its cost follows the postings read, not a
+    scan of every food. Foods are ranked by the share of query trigrams they contain,
+    then by how few trigrams they have (closer matches are shorter).
+
+    Added foods are buffered and indexed as a new segment on the next search; past
+    MAX_SEGMENTS segments they are merged. Re-adding an fdcId replaces the old entry.
+    An index loaded in the background answers searches once the load is done.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = [] #row -> fdcId
+        self._rows = {} #fdcId -> current row
+        self._sizes = np.zeros(0, dtype=np.int64) #distinct trigrams per row
+        self._dead = [] #rows replaced by a later copy
+        self._segments = []
+        self._pending = [] #normalized texts of rows not yet in a segment
+        self._loaded = threading.Event()
+        self._loaded.set()
+        self.hits = 0 #searches with at least one match
+        self.misses = 0
+
+    @classmethod
+    def from_food_index(cls, index, background = False):
+        """
+        Returns a TrigramIndex over every food stored in a FoodIndex. With background, it is
+        returned at once and filled by a daemon thread; searches wait for the fill to finish.
+        """
+        trigram_index = cls()
+        entries = ((fdc_id, " ".join(filter(None, values))) for fdc_id, *values in index.iter_field_values(*FUZZY_FIELDS))
+        if background:
+            trigram_index._loaded.clear()
+            threading.Thread(target=trigram_index._fill, args=(entries,), name="trigram-load", daemon=True).start()
+        else:
+            trigram_index.add_many(entries)
+        return trigram_index
+
+    def _fill(self, entries, batch = 50000):
+        """Adds the entries of foods not added meanwhile (those are newer), then marks the index loaded"""
+        try:
+            chunk = []
+            for entry in entries:
+                chunk.append(entry)
+                if len(chunk) >= batch:
+                    self.add_many(chunk, replace=False)
+                    chunk = []
+            self.add_many(chunk, replace=False)
+        finally:
+            self._loaded.set()
+
+    def wait_loaded(self, timeout = None) -> bool:
+        """Blocks until a background load is done. Returns False on timeout."""
+        return self._loaded.wait(timeout)
+
+    def add(self, fdc_id, text: str):
+        self.add_many([(fdc_id, text)])
+
+    def add_many(self, entries, replace = True) -> int:
+        """Buffers (fdcId, text) pairs for indexing (replace=False skips fdcIds already added). Returns the number added."""
+        count = 0
+        with self._lock:
+            for fdc_id, text in entries:
+                if fdc_id in self._rows:
+                    if not replace:
+                        continue
+                    self._dead.append(self._rows[fdc_id])
+                self._rows[fdc_id] = len(self._ids)
+                self._ids.append(fdc_id)
+                self._pending.append(normalize(text or ""))
+                count += 1
+        return count
+
+    def add_foods(self, foods) -> int:
+        """Buffers food records (description and brand owner) for indexing"""
+        return self.add_many((food["fdcId"], fuzzy_text(food)) for food in foods if isinstance(food, dict) and food.get("fdcId") is not None)
+
+    def _flush(self):
+        """Indexes the pending texts as a new segment, merging segments past MAX_SEGMENTS. Caller holds the lock."""
+        if not self._pending:
+            return
+        first_row = len(self._ids) - len(self._pending)
+        segment = _Segment.build(first_row, self._pending)
+        sizes = np.bincount(segment.indices - first_row, minlength=len(self._pending))
+        self._sizes = np.concatenate((self._sizes, sizes))
+        self._segments.append(segment)
+        self._pending = []
+        if len(self._segments) > MAX_SEGMENTS:
+            pairs = [segment.pairs() for segment in self._segments]
+            self._segments = [_Segment.from_pairs(0, np.concatenate([p[0] for p in pairs]), np.concatenate([p[1] for p in pairs]))]
+
+    def search_ids(self, query: str, limit = 10, min_similarity = 0.5) -> list:
+        """
+        Returns up to limit fdcIds whose text shares at least min_similarity of the query's
+        trigrams, best first.
+        """
+        return [fdc_id for fdc_id, _ in self.search(query, limit, min_similarity)]
+
+    def search(self, query: str, limit = 10, min_similarity = 0.5) -> list:
+        """Returns up to limit (fdcId, similarity) pairs, best first"""
+        wanted = sorted(trigrams(query))
+        if not wanted:
+            return []
+        self._loaded.wait()
+        with self._lock:
+            self._flush()
+            postings = [segment.postings(t) for segment in self._segments for t in wanted]
+            counts = np.bincount(np.concatenate(postings), minlength=len(self._ids)) if postings else np.zeros(len(self._ids), dtype=np.int64)
+            if self._dead:
+                counts[self._dead] = 0
+            candidates = np.flatnonzero(counts >= max(1, math.ceil(min_similarity * len(wanted))))
+            if len(candidates) > limit:
+                rank = counts[candidates] * (1 << 20) - self._sizes[candidates] #more shared trigrams, then shorter text
+                candidates = candidates[np.argpartition(-rank, limit - 1)[:limit]]
+            order = np.lexsort((self._sizes[candidates], -counts[candidates]))
+            matches = [(self._ids[row], int(counts[row]) / len(wanted)) for row in candidates[order].tolist()]
+            if matches:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return matches
+
+    def __contains__(self, fdc_id):
+        return fdc_id in self._rows
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __repr__(self):
+        return f"TrigramIndex(foods={len(self._rows)}, segments={len(self._segments)})"